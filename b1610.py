@@ -0,0 +1,2004 @@
+"""
+Elexon B1610 Actual Generation Retrieval
+
+Reusable retriever for half-hourly actual generation (B1610) of any list of BM units
+over any date span, usable as a library (B1610Retriever) or from the command line:
+
+    python b1610.py --units T_SEAB-1 T_SEAB-2 --from 2024-01-01 --to 2024-12-31
+
+The retriever handles:
+- Settlement periods per day derived from the Europe/London zone rules, so clock
+  change days get 46 or 50 periods in any year
+- Whole-day (or multi-day) window requests via the B1610 stream endpoint, falling
+  back to per-period requests only for periods a window did not return
+- Batching of BM units, so a request covers up to units_per_request units and a
+  large fleet does not multiply the request count per unit
+- A lazy work producer feeding a bounded queue drained by a fixed pool of workers,
+  so memory does not grow with the length of the requested period
+- Adaptive rate limiting (token bucket with AIMD rate and concurrency) that
+  backs off on 429/5xx responses, Retry-After headers and slow responses
+- Error handling and recovery: an append-only completion journal records every
+  (unit, date, settlement period) fetched, so an interrupted or partly failed run
+  resumes with exactly the missing periods and never repeats a successful request
+- A persistent, compressed response cache (data/.cache/b1610/): settled dates are
+  served from disk forever and recent ones after a TTL, so repeat runs and widened
+  date ranges only hit the network for genuinely new periods
+- Columnar decoding: each response body is parsed by Polars' native JSON reader
+  against a fixed schema straight into a typed frame, without per-record dicts
+- Streaming output: records are written in batches, as they arrive, to a Parquet
+  dataset partitioned by BM unit and month
+- Metrics: request latency histogram, in-flight requests, retries by cause, empty
+  responses, bytes received and rows per second, exported every few seconds as
+  _metrics.json and _metrics.prom (Prometheus text format) next to the dataset and
+  summarised at the end of the run
+- Sharded backfills: a long span can be split into date shards retrieved in parallel
+  worker processes (--shards N) or on separate machines (--shard I/N), each into its
+  own dataset and journal; a merge step (--merge) checks that every expected (unit,
+  date, settlement period) was fetched and dedupes overlapping records
+"""
+
+import argparse
+import asyncio
+import bisect
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import time
+import uuid
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import UTC, date, datetime, timedelta
+from datetime import time as dtime
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import duckdb
+import httpx
+import polars as pl
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://data.elexon.co.uk/bmrs/api/v1/datasets/B1610"
+DEFAULT_OUTPUT_DIR = "data/b1610"
+CACHE_DIR = "data/.cache/b1610"
+UNITS_PER_REQUEST = 20  # BM units per request; keeps request URLs a sensible length
+METRICS_INTERVAL = 10.0  # Seconds between metrics exports
+INITIAL_RATE = 10.0  # Requests per second a run starts at, before the limiter adapts
+SHARDS_SUFFIX = ".shards"  # Shard datasets live in <output_dir>.shards/<first>_<last>/
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LONDON = ZoneInfo("Europe/London")
+
+# Fields of a B1610 record as sent by the API; anything else is ignored
+RAW_SCHEMA = {
+    "dataset": pl.String,
+    "psrType": pl.String,
+    "bmUnit": pl.String,
+    "nationalGridBmUnitId": pl.String,
+    "settlementDate": pl.String,
+    "settlementPeriod": pl.Int32,
+    "halfHourEndTime": pl.String,
+    "quantity": pl.Float64,
+}
+# The same fields once decoded, as stored in the dataset
+RECORD_SCHEMA = {
+    **RAW_SCHEMA,
+    "settlementDate": pl.Date,
+    "halfHourEndTime": pl.Datetime("us", "UTC"),
+}
+RECORD_KEY = ["bmUnit", "settlementDate", "settlementPeriod"]
+# Files the retriever writes next to its hive partitions in an output directory
+DATASET_FILES = ["_manifest.json", "_metrics.json", "_metrics.prom"]
+
+
+def settlement_period_count(settlement_date: date) -> int:
+    """
+    Number of settlement periods in a settlement day.
+
+    Settlement days run from local midnight to local midnight in Europe/London, so
+    the day the clocks go forward has 46 half-hours, the day they go back has 50 and
+    every other day has 48.
+    """
+    start = datetime.combine(settlement_date, dtime(0), LONDON).astimezone(UTC)
+    end = datetime.combine(
+        settlement_date + timedelta(days=1), dtime(0), LONDON
+    ).astimezone(UTC)
+    return (end - start) // timedelta(minutes=30)
+
+
+def empty_records() -> pl.DataFrame:
+    """A frame with no records, typed like decode_records output."""
+    return pl.DataFrame(schema=RECORD_SCHEMA)
+
+
+def decode_records(content: bytes) -> pl.DataFrame:
+    """
+    Decode a B1610 response body straight into a typed frame.
+
+    The body is parsed by Polars' native JSON reader against RAW_SCHEMA, so no Python
+    object is created per record, and dates and timestamps are parsed per response
+    with vectorised expressions. Accepts both the bare JSON array of the stream
+    endpoint and the wrapped {"data": [...]} response of the dataset endpoint.
+    Raises a polars.exceptions.PolarsError if the body is not valid B1610 JSON.
+    """
+    if content.lstrip()[:1] == b"{":
+        wrapped = pl.read_json(
+            io.BytesIO(content), schema={"data": pl.List(pl.Struct(RAW_SCHEMA))}
+        )
+        data = wrapped.get_column("data")[0] if wrapped.height else None
+        frame = (
+            data.struct.unnest()
+            if data is not None
+            else pl.DataFrame(schema=RAW_SCHEMA)
+        )
+    else:
+        frame = pl.read_json(io.BytesIO(content), schema=RAW_SCHEMA)
+
+    return frame.with_columns(
+        pl.col("settlementDate").str.to_date("%Y-%m-%d"),
+        pl.col("halfHourEndTime")
+        .str.strip_suffix("Z")
+        .str.to_datetime("%Y-%m-%dT%H:%M:%S", time_unit="us")
+        .dt.replace_time_zone("UTC"),
+    )
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket limiter whose request rate and concurrency adapt to the server.
+
+    Both follow additive-increase/multiplicative-decrease (AIMD): every successful
+    request nudges them up (by about `increase` per second and per round trip
+    respectively), while a 429, a run of errors or a response slower than
+    `latency_target` cuts them by `decrease`. A Retry-After header also pauses all
+    requests until the server asks us to come back.
+
+    Usage:
+        async with limiter:
+            response = await client.get(url)
+        limiter.on_success(latency)  # or on_throttle(retry_after) / on_error()
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = 10.0,
+        min_rate: float = 0.5,
+        max_rate: float = 200.0,
+        initial_concurrency: int = 10,
+        max_concurrency: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        latency_target: float = 5.0,
+        error_threshold: float = 0.2,
+        cooldown: float = 1.0,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+    ):
+        self.rate = initial_rate  # Tokens (requests) per second
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = float(initial_concurrency)  # Allowed requests in flight
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown  # Minimum seconds between two decreases
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self.tokens = 1.0
+        self.in_flight = 0
+        self.error_rate = 0.0  # Exponentially weighted share of failed requests
+        self.latency: float | None = None  # Exponentially weighted latency
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    def _refill(self, now: float):
+        """Add the tokens accrued since the last refill, up to one second's worth."""
+        self.tokens = min(
+            max(self.rate, 1.0), self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def __aenter__(self):
+        """Wait for a free concurrency slot and a token."""
+        async with self._condition:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= max(1, int(self.concurrency)):
+                    wait = None  # Until a request finishes
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return self
+                # A timeout in this task (unlike wait_for) keeps the lock handling in
+                # Condition.wait intact when the waiting request is cancelled
+                try:
+                    async with asyncio.timeout(wait):
+                        await self._condition.wait()
+                except TimeoutError:
+                    pass
+
+    async def __aexit__(self, *exc_info):
+        """Free the concurrency slot."""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _cut(self):
+        """Multiplicatively decrease rate and concurrency, at most once per cooldown."""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.concurrency = max(1.0, self.concurrency * self.decrease)
+        logger.info(f"Rate limiter backing off: {self.describe()}")
+
+    def on_success(self, latency: float):
+        """Record a successful request and its latency in seconds."""
+        self.error_rate *= 0.9
+        self.latency = (
+            latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        )
+        if self.latency > self.latency_target:
+            self._cut()
+            return
+        self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0))
+        self.concurrency = min(
+            self.max_concurrency, self.concurrency + self.increase / self.concurrency
+        )
+
+    def on_throttle(self, retry_after: float | None = None):
+        """Record a 429 response, pausing all requests for `retry_after` seconds."""
+        self.throttled += 1
+        self.error_rate = 0.9 * self.error_rate + 0.1
+        self._cut()
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def on_error(self):
+        """Record a failed request (5xx, connection error or unreadable response)."""
+        self.error_rate = 0.9 * self.error_rate + 0.1
+        if self.error_rate > self.error_threshold:
+            self._cut()
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before retry `attempt` (0-based), with full jitter."""
+        if retry_after:
+            return retry_after + random.uniform(0, self.backoff_base)  # noqa: S311
+        cap = min(self.backoff_cap, self.backoff_base * 2**attempt)
+        return random.uniform(0, cap)  # noqa: S311 - jitter, not cryptography
+
+    def describe(self) -> str:
+        """Current limiter state as a short log-friendly string."""
+        latency = f"{self.latency:.2f}s" if self.latency is not None else "n/a"
+        return (
+            f"rate {self.rate:.1f} req/s, concurrency {self.concurrency:.1f}, "
+            f"in flight {self.in_flight}, latency {latency}, "
+            f"error rate {self.error_rate:.0%}, throttled {self.throttled}"
+        )
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Convert a Retry-After header (seconds or an HTTP date) to seconds from now."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(retry_at.tzinfo)).total_seconds())
+
+
+class ParquetSink:
+    """
+    Writes B1610 records to a Parquet dataset in batches as they arrive.
+
+    Decoded frames are buffered until `batch_rows` records have accumulated, then
+    concatenated (without copying) and written as new files under hive-style
+    bmUnit=<unit>/month=<yyyy-mm> partitions, so peak memory is bounded by the batch
+    size rather than the length of the run. The journal entries of the work items
+    behind a batch are committed right after the batch is written. A small
+    `_manifest.json` listing the dataset's files is rewritten on close; the ETL uses
+    it to notice when the dataset has changed.
+    """
+
+    def __init__(
+        self, output_dir: str, journal: "CompletionJournal", batch_rows: int = 10_000
+    ):
+        self.output_dir = Path(output_dir)
+        self.journal = journal
+        self.batch_rows = batch_rows
+        self.buffer: list[pl.DataFrame] = []
+        self.buffered_rows = 0
+        self.entries: list[tuple[str, date, int, str, int]] = []
+        self.rows_written = 0
+
+    def add(
+        self, records: pl.DataFrame, entries: list[tuple[str, date, int, str, int]]
+    ):
+        """Buffer records and journal entries; write a batch once enough accumulate."""
+        if records.height:
+            self.buffer.append(records)
+            self.buffered_rows += records.height
+        self.entries.extend(entries)
+        if self.buffered_rows >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records as new partition files, then journal them."""
+        if self.buffer:
+            # writtenAt lets readers keep the newest copy of a period written twice
+            df = pl.concat(self.buffer, rechunk=False).with_columns(
+                month=pl.col("settlementDate").dt.strftime("%Y-%m"),
+                writtenAt=pl.lit(datetime.now(UTC)),
+            )
+
+            ds.write_dataset(
+                df.to_arrow(),
+                self.output_dir,
+                format="parquet",
+                partitioning=["bmUnit", "month"],
+                partitioning_flavor="hive",
+                basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+            )
+            self.rows_written += df.height
+            self.buffer = []
+            self.buffered_rows = 0
+
+        # Journal only once the records are on disk, so "done" always means stored
+        self.journal.append(self.entries)
+        self.entries = []
+
+    def close(self):
+        """Write any remaining records and refresh the dataset manifest."""
+        self.flush()
+        if self.output_dir.exists():
+            write_manifest(self.output_dir)
+
+
+def write_manifest(output_dir: Path):
+    """Write the `_manifest.json` listing a dataset's Parquet files and their sizes."""
+    files = {
+        path.relative_to(output_dir).as_posix(): path.stat().st_size
+        for path in sorted(output_dir.glob("*/*/*.parquet"))
+    }
+    manifest = {"updated_at": datetime.now().isoformat(), "files": files}
+    with open(output_dir / "_manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def backfill_written_at(output_dir: Path) -> int:
+    """
+    Add a NULL writtenAt column to the Parquet files of a dataset written before
+    records carried one, so that readers can order on writtenAt in every file. Each
+    file is rewritten once, in place; returns the number of files rewritten.
+    """
+    backfilled = 0
+    for path in sorted(output_dir.glob("*/*/*.parquet")):
+        if "writtenAt" in pq.read_schema(path).names:
+            continue
+        table = pq.ParquetFile(path).read()
+        table = table.append_column(
+            "writtenAt", pa.nulls(table.num_rows, pa.timestamp("us", tz="UTC"))
+        )
+        staged = path.with_suffix(".backfill")
+        pq.write_table(table, staged)
+        os.replace(staged, path)
+        backfilled += 1
+    if backfilled:
+        logger.info(f"Added writtenAt to {backfilled} older files in {output_dir}")
+    return backfilled
+
+
+def remove_dataset(output_dir: Path):
+    """
+    Remove the files a retriever writes to output_dir: its bmUnit=<unit> partitions
+    and the manifest and metrics files. Anything else in the directory is left alone,
+    so pointing --output at an existing folder never deletes unrelated data.
+    """
+    if not output_dir.is_dir():
+        return
+    removed = 0
+    for partition in output_dir.glob("bmUnit=*"):
+        if partition.is_dir():
+            shutil.rmtree(partition)
+            removed += 1
+    for name in DATASET_FILES:
+        if (output_dir / name).exists():
+            (output_dir / name).unlink()
+            removed += 1
+    if removed:
+        logger.info(f"Removed previous output without a journal in {output_dir}")
+
+
+class ResponseCache:
+    """
+    On-disk cache of B1610 responses, keyed by the normalised request.
+
+    The key is a hash of the endpoint and its sorted query parameters (dates, SPs, BM
+    units, format), so the same request always maps to the same file whatever order
+    its parameters were written in. Each file holds the decoded records as a
+    zstd-compressed Parquet file, with the fetch time in its metadata. Settled data
+    does not change, so a response is kept forever when every date it covers was at
+    least `final_after` old when it was fetched; responses for more recent dates
+    expire after `ttl`. Failed requests are never cached.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        final_after: timedelta = timedelta(days=28),
+        ttl: timedelta = timedelta(hours=6),
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.final_after = final_after
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def normalise(self, url: str) -> str:
+        """Render a request as its endpoint plus sorted query parameters."""
+        parsed = httpx.URL(url)
+        return json.dumps(
+            [parsed.host, parsed.path, sorted(parsed.params.multi_items())]
+        )
+
+    def path_for(self, url: str) -> Path:
+        digest = hashlib.sha256(self.normalise(url).encode()).hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}.parquet"
+
+    def is_final(self, last_date: date, fetched_at: datetime) -> bool:
+        """Whether a response covering dates to last_date was settled when fetched."""
+        return last_date <= fetched_at.date() - self.final_after
+
+    def get(self, url: str, last_date: date) -> pl.DataFrame | None:
+        """Return the cached records for a request, or None if missing or expired."""
+        try:
+            table = pq.read_table(self.path_for(url))
+            fetched_at = datetime.fromisoformat(
+                table.schema.metadata[b"fetched_at"].decode()
+            )
+        except (OSError, KeyError, TypeError, ValueError):
+            self.misses += 1
+            return None
+
+        if (
+            not self.is_final(last_date, fetched_at)
+            and datetime.now() - fetched_at > self.ttl
+        ):
+            self.misses += 1
+            self.expired += 1
+            return None
+
+        self.hits += 1
+        return pl.from_arrow(table)
+
+    def put(self, url: str, last_date: date, records: pl.DataFrame):
+        """Store the records returned for a request."""
+        path = self.path_for(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fetched_at = datetime.now()
+        table = records.to_arrow()
+        table = table.replace_schema_metadata(
+            {
+                "request": self.normalise(url),
+                "fetched_at": fetched_at.isoformat(),
+                "final": str(self.is_final(last_date, fetched_at)),
+            }
+        )
+        # Write to a unique temporary name first so readers never see a partial file
+        partial = path.with_suffix(f".{uuid.uuid4().hex[:8]}.partial")
+        pq.write_table(table, partial, compression="zstd")
+        os.replace(partial, path)
+
+    def describe(self) -> str:
+        lookups = self.hits + self.misses
+        ratio = self.hits / lookups if lookups else 0.0
+        return (
+            f"cache: {self.hits} hits, {self.misses} misses "
+            f"({self.expired} expired), hit ratio {ratio:.1%}"
+        )
+
+
+class RetrieverMetrics:
+    """
+    Counters, gauges and a request latency histogram for one retrieval run.
+
+    Requests are counted by outcome (ok, empty, cached or failed) and every attempt
+    that is retried is counted by its cause (http_<status>, request_error or
+    decode_error). Each response adds its latency to a histogram with fixed
+    LATENCY_BUCKETS, so percentiles can be estimated and the histogram exported in
+    Prometheus format without keeping every sample. `export` writes a JSON snapshot
+    and a Prometheus text file (for node_exporter's textfile collector or a quick
+    look) and is called periodically during the run.
+    """
+
+    def __init__(self, limiter: AdaptiveRateLimiter, cache: ResponseCache | None):
+        self.limiter = limiter
+        self.cache = cache
+        self.started = time.monotonic()
+        self.stopped: float | None = None
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)  # Last bucket is +Inf
+        self.latency_sum = 0.0
+        self.outcomes: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self.retries: Counter = Counter()
+        self.bytes_received = 0
+        self.rows = 0
+        self.max_in_flight = 0
+
+    def start(self):
+        """Restart the clock used for rates."""
+        self.started = time.monotonic()
+        self.stopped = None
+
+    def stop(self):
+        """Freeze the clock used for rates at the end of the run."""
+        self.stopped = time.monotonic()
+
+    def observe_in_flight(self, in_flight: int):
+        self.max_in_flight = max(self.max_in_flight, in_flight)
+
+    def observe_response(self, status: int, latency: float, size: int):
+        """Record one HTTP response."""
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        self.latency_sum += latency
+        self.statuses[str(status)] += 1
+        self.bytes_received += size
+
+    def observe_outcome(self, outcome: str):
+        self.outcomes[outcome] += 1
+
+    def observe_retry(self, cause: str):
+        self.retries[cause] += 1
+
+    def observe_rows(self, rows: int):
+        self.rows += rows
+
+    def latency_quantile(self, q: float) -> float | None:
+        """Estimate a latency quantile by interpolating within its histogram bucket."""
+        total = sum(self.bucket_counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(self.bucket_counts):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return LATENCY_BUCKETS[-1]
+
+    def snapshot(self) -> dict:
+        """The current metrics as a JSON-serialisable dictionary."""
+        elapsed = (self.stopped or time.monotonic()) - self.started
+        cumulative, buckets = 0, {}
+        for bound, count in zip(
+            [*LATENCY_BUCKETS, "+Inf"], self.bucket_counts, strict=True
+        ):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "elapsed_seconds": round(elapsed, 3),
+            "requests": dict(self.outcomes),
+            "responses_by_status": dict(self.statuses),
+            "retries_by_cause": dict(self.retries),
+            "empty_responses": self.outcomes["empty"],
+            "bytes_received": self.bytes_received,
+            "rows": self.rows,
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "in_flight": self.limiter.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rate_limit": round(self.limiter.rate, 2),
+            "concurrency_limit": round(self.limiter.concurrency, 2),
+            "latency_seconds": {
+                "count": sum(self.bucket_counts),
+                "sum": round(self.latency_sum, 3),
+                "p50": self.latency_quantile(0.5),
+                "p95": self.latency_quantile(0.95),
+                "p99": self.latency_quantile(0.99),
+                "buckets": buckets,
+            },
+            "cache": {
+                "hits": self.cache.hits,
+                "misses": self.cache.misses,
+                "expired": self.cache.expired,
+            }
+            if self.cache is not None
+            else None,
+        }
+
+    def prometheus(self) -> str:
+        """The current metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: dict[str, float]):
+            lines.append(f"# HELP b1610_{name} {help_text}")
+            lines.append(f"# TYPE b1610_{name} {kind}")
+            for labels, value in samples.items():
+                lines.append(f"b1610_{name}{labels} {value}")
+
+        latency = snapshot["latency_seconds"]
+        metric(
+            "request_duration_seconds",
+            "histogram",
+            "Latency of B1610 API requests.",
+            {
+                **{
+                    f'_bucket{{le="{bound}"}}': count
+                    for bound, count in latency["buckets"].items()
+                },
+                "_sum": latency["sum"],
+                "_count": latency["count"],
+            },
+        )
+        metric(
+            "requests_total",
+            "counter",
+            "Requests by outcome (ok, empty, cached, failed).",
+            {f'{{outcome="{k}"}}': v for k, v in sorted(self.outcomes.items())},
+        )
+        metric(
+            "responses_total",
+            "counter",
+            "HTTP responses by status code.",
+            {f'{{status="{k}"}}': v for k, v in sorted(self.statuses.items())},
+        )
+        metric(
+            "retries_total",
+            "counter",
+            "Retried attempts by cause.",
+            {f'{{cause="{k}"}}': v for k, v in sorted(self.retries.items())},
+        )
+        metric(
+            "received_bytes_total",
+            "counter",
+            "Response bytes received.",
+            {"": self.bytes_received},
+        )
+        metric("rows_total", "counter", "Records received.", {"": self.rows})
+        metric(
+            "rows_per_second",
+            "gauge",
+            "Records received per second since the run started.",
+            {"": snapshot["rows_per_second"]},
+        )
+        metric(
+            "in_flight_requests",
+            "gauge",
+            "Requests currently in flight.",
+            {"": snapshot["in_flight"]},
+        )
+        metric(
+            "max_in_flight_requests",
+            "gauge",
+            "Most requests in flight at once.",
+            {"": self.max_in_flight},
+        )
+        metric(
+            "rate_limit",
+            "gauge",
+            "Current request rate limit (req/s).",
+            {"": snapshot["rate_limit"]},
+        )
+        metric(
+            "concurrency_limit",
+            "gauge",
+            "Current concurrency limit.",
+            {"": snapshot["concurrency_limit"]},
+        )
+        if self.cache is not None:
+            metric(
+                "cache_lookups_total",
+                "counter",
+                "Response cache lookups by result.",
+                {
+                    '{result="hit"}': self.cache.hits,
+                    '{result="miss"}': self.cache.misses,
+                },
+            )
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: str):
+        """Write _metrics.json and _metrics.prom into directory, replacing old ones."""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        for name, text in [
+            ("_metrics.json", json.dumps(self.snapshot(), indent=2)),
+            ("_metrics.prom", self.prometheus()),
+        ]:
+            partial = path / f"{name}.{uuid.uuid4().hex[:8]}.partial"
+            partial.write_text(text)
+            os.replace(partial, path / name)
+
+    def summary(self) -> list[str]:
+        """End-of-run summary as log lines."""
+        snapshot = self.snapshot()
+        latency = snapshot["latency_seconds"]
+
+        def seconds(value: float | None) -> str:
+            return f"{value:.2f}s" if value is not None else "n/a"
+
+        retries = (
+            ", ".join(f"{k} {v}" for k, v in sorted(self.retries.items())) or "none"
+        )
+        outcomes = (
+            ", ".join(f"{k} {v}" for k, v in sorted(self.outcomes.items())) or "none"
+        )
+        return [
+            f"  Requests: {sum(self.outcomes.values())} ({outcomes})",
+            f"  Latency: p50 {seconds(latency['p50'])}, p95 {seconds(latency['p95'])}, "
+            f"p99 {seconds(latency['p99'])} over {latency['count']} responses",
+            f"  Retries by cause: {retries}",
+            f"  Empty responses: {snapshot['empty_responses']}",
+            f"  Received: {self.bytes_received / 1048576:.1f} MB, {self.rows} rows "
+            f"({snapshot['rows_per_second']} rows/s)",
+            f"  Max in flight: {self.max_in_flight}",
+        ]
+
+
+class CompletionJournal:
+    """
+    Append-only record of the (BM unit, date, settlement period) keys fetched so far.
+
+    Each finished work item appends one row per key it covered, with its status
+    ("done" or "failed") and the number of records stored for it. Rows are never
+    updated: a key counts as fetched once any row marks it done, so the work still
+    missing after a crash or a partly failed run is simply every expected key without
+    a "done" row, and previously failed keys are requested again while successful
+    ones never are. The journal is a small DuckDB database kept next to the dataset
+    it describes.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = duckdb.connect(str(self.path))
+        self.con.execute("""
+            CREATE TABLE IF NOT EXISTS journal (
+                bm_unit VARCHAR,
+                settlement_date DATE,
+                settlement_period INTEGER,
+                status VARCHAR,
+                row_count INTEGER,
+                recorded_at TIMESTAMP
+            )
+        """)
+
+    def append(self, entries: list[tuple[str, date, int, str, int]]):
+        """Append (unit, date, SP, status, row count) entries in a single insert."""
+        if not entries:
+            return
+        batch = pl.DataFrame(
+            entries,
+            schema=[
+                "bm_unit",
+                "settlement_date",
+                "settlement_period",
+                "status",
+                "row_count",
+            ],
+            orient="row",
+        )
+        self.con.register("batch", batch)
+        self.con.execute(
+            "INSERT INTO journal SELECT *, current_localtimestamp() FROM batch"
+        )
+        self.con.unregister("batch")
+
+    def done_counts(
+        self, bm_units: list[str], start_date: date, end_date: date
+    ) -> dict[tuple[date, str], int]:
+        """Count the periods already fetched per (date, unit) for units and dates."""
+        rows = self.con.execute(
+            """
+            SELECT settlement_date, bm_unit, count(DISTINCT settlement_period)
+            FROM journal
+            WHERE status = 'done' AND list_contains(?, bm_unit)
+                AND settlement_date BETWEEN ? AND ?
+            GROUP BY settlement_date, bm_unit
+        """,
+            [bm_units, start_date, end_date],
+        ).fetchall()
+        return {(settlement_date, unit): count for settlement_date, unit, count in rows}
+
+    def done_keys(self, settlement_date: date) -> set[tuple[str, int]]:
+        """Return the (unit, SP) keys already fetched for one date."""
+        rows = self.con.execute(
+            """
+            SELECT DISTINCT bm_unit, settlement_period
+            FROM journal
+            WHERE status = 'done' AND settlement_date = ?
+        """,
+            [settlement_date],
+        ).fetchall()
+        return set(rows)
+
+    def outstanding_failures(self, bm_units: list[str]) -> int:
+        """Count the keys that have failed and not been fetched since."""
+        return self.con.execute(
+            """
+            SELECT count(*) FROM (
+                SELECT bm_unit, settlement_date, settlement_period
+                FROM journal
+                WHERE list_contains(?, bm_unit)
+                GROUP BY ALL
+                HAVING NOT bool_or(status = 'done')
+            )
+        """,
+            [bm_units],
+        ).fetchone()[0]
+
+    def close(self):
+        """Close the journal database."""
+        self.con.close()
+
+
+class B1610Retriever:
+    """
+    Retrieves B1610 actual generation for a set of BM units over a date span.
+
+    Work is planned across units and days in one shared pipeline: units are split
+    into batches of up to units_per_request, each batch is requested window by window
+    (or period by period), and every request feeds the same rate limiter, worker
+    pool, journal and Parquet dataset.
+    """
+
+    def __init__(
+        self,
+        bm_units: list[str],
+        start_date: date,
+        end_date: date,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        fetch_mode: str = "window",
+        window_days: int = 1,
+        units_per_request: int = UNITS_PER_REQUEST,
+        num_workers: int = 32,
+        cache_dir: str | None = CACHE_DIR,
+        metrics_interval: float = METRICS_INTERVAL,
+        initial_rate: float = INITIAL_RATE,
+        base_url: str = BASE_URL,
+    ):
+        if not bm_units:
+            raise ValueError("At least one BM unit is required")
+        if start_date > end_date:
+            raise ValueError(f"Start date {start_date} is after end date {end_date}")
+        if fetch_mode not in ("window", "period"):
+            raise ValueError(f"Unknown fetch mode '{fetch_mode}'")
+
+        self.base_url = base_url
+        self.stream_url = self.base_url + "/stream"
+        # "window" fetches whole days per request from the stream endpoint,
+        # "period" makes one request per settlement period
+        self.fetch_mode = fetch_mode
+        self.window_days = window_days  # Days covered by each window request
+        self.bm_units = list(dict.fromkeys(bm_units))  # Drop duplicates, keep order
+        self.units_per_request = units_per_request
+        self.start_date = start_date
+        self.end_date = end_date
+        # Adapts request rate and concurrency to how the API is responding
+        self.limiter = AdaptiveRateLimiter(
+            initial_rate=initial_rate, initial_concurrency=10
+        )
+        self.max_retries = 3
+        self.num_workers = num_workers  # Worker tasks draining the work queue
+        self.queue_size = 100  # Work items buffered ahead of the workers
+        self.output_dir = output_dir  # Parquet dataset, partitioned by unit and month
+        self.batch_rows = 10_000  # Records buffered before each Parquet write
+        # Responses are cached on disk; settled dates never need fetching twice
+        self.cache: ResponseCache | None = (
+            ResponseCache(cache_dir) if cache_dir else None
+        )
+        # Exported to output_dir every metrics_interval seconds
+        self.metrics = RetrieverMetrics(self.limiter, self.cache)
+        self.metrics_interval = metrics_interval
+
+        # HTTP client and journal will be set during execution
+        self.client: httpx.AsyncClient | None = None
+        self.journal: CompletionJournal | None = None
+
+    def iter_dates(self) -> Iterator[date]:
+        """Lazily yield every date from start_date to end_date."""
+        current_date = self.start_date
+        while current_date <= self.end_date:
+            yield current_date
+            current_date += timedelta(days=1)
+
+    def get_settlement_periods(self, settlement_date: date) -> list[int]:
+        """
+        Get settlement periods for a given date.
+        - Short days (clocks spring forward): 1-46
+        - Normal days: 1-48
+        - Long days (clocks fall back): 1-50
+        """
+        return list(range(1, settlement_period_count(settlement_date) + 1))
+
+    def unit_batches(self) -> list[tuple[str, ...]]:
+        """Split the BM units into the groups requested together."""
+        size = max(1, self.units_per_request)
+        return [
+            tuple(self.bm_units[i : i + size])
+            for i in range(0, len(self.bm_units), size)
+        ]
+
+    def build_request_url(
+        self, units: Iterable[str], settlement_date: date, settlement_period: int
+    ) -> str:
+        """Build the API request URL with parameters."""
+        date_str = settlement_date.strftime("%Y-%m-%d")
+
+        # Build URL with multiple bmUnit parameters
+        url_parts = [self.base_url + "?"]
+        url_parts.append(f"settlementDate={date_str}")
+        url_parts.append(f"&settlementPeriod={settlement_period}")
+
+        for unit in units:
+            url_parts.append(f"&bmUnit={unit}")
+
+        url_parts.append("&format=json")
+
+        return "".join(url_parts)
+
+    def build_window_url(
+        self, units: Iterable[str], start_date: date, end_date: date
+    ) -> str:
+        """Build a stream API URL covering every period from start_date to end_date."""
+        url_parts = [self.stream_url + "?"]
+        url_parts.append(f"from={start_date.strftime('%Y-%m-%d')}")
+        url_parts.append(f"&to={end_date.strftime('%Y-%m-%d')}")
+        url_parts.append("&settlementPeriodFrom=1")
+        url_parts.append("&settlementPeriodTo=50")
+
+        for unit in units:
+            url_parts.append(f"&bmUnit={unit}")
+
+        return "".join(url_parts)
+
+    def iter_work_items(
+        self, done_counts: dict[tuple[date, str], int]
+    ) -> Iterator[tuple]:
+        """
+        Lazily yield one work item per request still needed, given how many periods
+        the journal already holds for each (date, unit).
+
+        Items are ("window", units, start, end) for runs of up to window_days
+        consecutive dates on which nothing has been fetched yet for those units of a
+        batch (window mode only), and ("period", units, date, SP) for the units and
+        periods still missing on partly fetched dates, or on every date in period mode.
+        Keys already journaled are never requested again.
+        """
+        for batch in self.unit_batches():
+            window: list[date] = []
+            window_units: tuple[str, ...] = ()
+            for settlement_date in self.iter_dates():
+                periods = self.get_settlement_periods(settlement_date)
+                counts = {
+                    unit: done_counts.get((settlement_date, unit), 0) for unit in batch
+                }
+                fresh = (
+                    tuple(unit for unit in batch if not counts[unit])
+                    if self.fetch_mode == "window"
+                    else ()
+                )
+
+                # Windows only cover consecutive dates with the same units to fetch
+                if window and (
+                    fresh != window_units or len(window) == self.window_days
+                ):
+                    yield "window", window_units, window[0], window[-1]
+                    window = []
+                if fresh:
+                    window.append(settlement_date)
+                    window_units = fresh
+
+                partial = [
+                    unit
+                    for unit in batch
+                    if unit not in fresh and counts[unit] < len(periods)
+                ]
+                if not partial:
+                    continue
+                done_keys = (
+                    self.journal.done_keys(settlement_date)
+                    if any(counts[u] for u in partial)
+                    else set()
+                )
+                for settlement_period in periods:
+                    missing = tuple(
+                        unit
+                        for unit in partial
+                        if (unit, settlement_period) not in done_keys
+                    )
+                    if missing:
+                        yield "period", missing, settlement_date, settlement_period
+
+            if window:
+                yield "window", window_units, window[0], window[-1]
+
+    def journal_entries(
+        self,
+        records: pl.DataFrame,
+        units: Iterable[str],
+        periods: Iterable[tuple[date, int]],
+        status: str,
+    ) -> list[tuple[str, date, int, str, int]]:
+        """Build one journal entry per unit for each (date, SP) a work item covered."""
+        counts = {
+            (unit, settlement_date, settlement_period): count
+            for unit, settlement_date, settlement_period, count in records.group_by(
+                RECORD_KEY
+            )
+            .len()
+            .iter_rows()
+        }
+        return [
+            (
+                unit,
+                settlement_date,
+                settlement_period,
+                status,
+                counts.get((unit, settlement_date, settlement_period), 0),
+            )
+            for settlement_date, settlement_period in periods
+            for unit in units
+        ]
+
+    async def fetch_records(
+        self, url: str, label: str, last_date: date
+    ) -> pl.DataFrame | None:
+        """
+        Fetch one URL with error handling and retries, via the response cache.
+
+        Returns the decoded records as a typed frame. last_date is the latest
+        settlement date the request covers, which decides how long its response may be
+        cached. Returns None if every attempt failed.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(url, last_date)
+            if cached is not None:
+                self.metrics.observe_outcome("cached")
+                return cached
+
+        records = await self.request_records(url, label)
+        if records is not None and self.cache is not None:
+            self.cache.put(url, last_date, records)
+        return records
+
+    async def request_records(self, url: str, label: str) -> pl.DataFrame | None:
+        """Request one URL from the API, retrying under the rate limiter."""
+        if self.client is None:
+            raise RuntimeError("HTTP client not initialized")
+
+        for attempt in range(self.max_retries):
+            retry_after = None
+            try:
+                async with self.limiter:
+                    self.metrics.observe_in_flight(self.limiter.in_flight)
+                    started = time.perf_counter()
+                    response = await self.client.get(url, timeout=30.0)
+                    latency = time.perf_counter() - started
+                self.metrics.observe_response(
+                    response.status_code, latency, len(response.content)
+                )
+                response.raise_for_status()
+
+                records = decode_records(response.content)
+                self.limiter.on_success(latency)
+                if records.height:
+                    self.metrics.observe_outcome("ok")
+                    return records
+                else:
+                    # Counted in the metrics; too frequent to be worth a warning each
+                    self.metrics.observe_outcome("empty")
+                    logger.debug(f"No data returned for {label}")
+                    return records
+
+            except httpx.HTTPStatusError as e:
+                cause = f"http_{e.response.status_code}"
+                if e.response.status_code == 404:
+                    self.limiter.on_success(latency)
+                    self.metrics.observe_outcome("empty")
+                    logger.debug(f"No data available for {label}")
+                    return empty_records()
+                elif e.response.status_code == 429:
+                    retry_after = parse_retry_after(
+                        e.response.headers.get("retry-after")
+                    )
+                    self.limiter.on_throttle(retry_after)
+                    logger.warning(
+                        f"Throttled (429) for {label}, attempt {attempt + 1}; "
+                        f"{self.limiter.describe()}"
+                    )
+                else:
+                    self.limiter.on_error()
+                    logger.error(
+                        f"HTTP error {e.response.status_code} for {label}, "
+                        f"attempt {attempt + 1}"
+                    )
+
+            except httpx.RequestError as e:
+                cause = "request_error"
+                self.limiter.on_error()
+                logger.error(f"Request error for {label}, attempt {attempt + 1}: {e}")
+
+            except pl.exceptions.PolarsError as e:
+                cause = "decode_error"
+                self.limiter.on_error()
+                logger.error(
+                    f"JSON decode error for {label}, attempt {attempt + 1}: {e}"
+                )
+
+            # Jittered exponential backoff (or the server's Retry-After) between retries
+            if attempt < self.max_retries - 1:
+                self.metrics.observe_retry(cause)
+                await asyncio.sleep(self.limiter.backoff(attempt, retry_after))
+
+        self.metrics.observe_outcome("failed")
+        logger.error(
+            f"Failed to retrieve data for {label} after {self.max_retries} attempts"
+        )
+        return None
+
+    async def make_api_request(
+        self, units: tuple[str, ...], settlement_date: date, settlement_period: int
+    ) -> pl.DataFrame | None:
+        """Make a single API request with error handling and retries."""
+        url = self.build_request_url(units, settlement_date, settlement_period)
+        return await self.fetch_records(
+            url, f"{settlement_date} SP{settlement_period}", settlement_date
+        )
+
+    def split_window_records(
+        self,
+        records: pl.DataFrame,
+        units: Iterable[str],
+        start_date: date,
+        end_date: date,
+    ) -> tuple[pl.DataFrame, list[tuple[date, int]]]:
+        """
+        Reduce the rows of a window response to one record per (date, SP, unit).
+
+        Rows outside the window or for other units are dropped and duplicates are
+        collapsed. Returns the records and the (date, SP) pairs for which at least
+        one unit is missing, so that only those periods need to be re-requested.
+        """
+        units = list(units)
+        records = records.filter(
+            pl.col("bmUnit").is_in(units),
+            pl.col("settlementDate").is_between(start_date, end_date),
+        ).unique(RECORD_KEY, keep="last", maintain_order=True)
+
+        units_present = {
+            (settlement_date, settlement_period): count
+            for settlement_date, settlement_period, count in records.group_by(
+                "settlementDate", "settlementPeriod"
+            )
+            .len()
+            .iter_rows()
+        }
+        missing = []
+        current_date = start_date
+        while current_date <= end_date:
+            for settlement_period in self.get_settlement_periods(current_date):
+                if units_present.get((current_date, settlement_period), 0) < len(units):
+                    missing.append((current_date, settlement_period))
+            current_date += timedelta(days=1)
+
+        return records, missing
+
+    async def fetch_window(
+        self, units: tuple[str, ...], start_date: date, end_date: date
+    ) -> tuple[pl.DataFrame, list[tuple[date, int]]]:
+        """
+        Fetch every settlement period from start_date to end_date in one request.
+
+        Periods the window did not fully return (or all of them, if the window request
+        failed) are fetched one by one. Returns the records and the (date, SP) pairs
+        that could not be retrieved at all.
+        """
+        label = f"{start_date} to {end_date}"
+        records = await self.fetch_records(
+            self.build_window_url(units, start_date, end_date), label, end_date
+        )
+        if records is None:
+            records = empty_records()
+        records, missing = self.split_window_records(
+            records, units, start_date, end_date
+        )
+
+        if missing:
+            logger.info(
+                f"Window {label} incomplete, "
+                f"fetching {len(missing)} periods individually"
+            )
+
+        failed = []
+        for settlement_date, settlement_period in missing:
+            data = await self.make_api_request(
+                units, settlement_date, settlement_period
+            )
+            if data is None:
+                failed.append((settlement_date, settlement_period))
+                continue
+            # Keep rows from the window that the per-period response does not replace
+            records = pl.concat([records.join(data, on=RECORD_KEY, how="anti"), data])
+
+        return records, failed
+
+    async def retrieve_all_data(self) -> tuple[int, bool]:
+        """
+        Retrieve generation data for every unit and date using concurrent requests.
+
+        The completion journal decides what is still missing: a producer lazily
+        generates work items for just those keys into a bounded queue that a fixed pool
+        of workers drains, so the number of pending coroutines stays constant however
+        long the requested period is. Records are streamed to the Parquet dataset in
+        output_dir as they arrive. Returns the number of records written and whether
+        every request succeeded.
+        """
+        journal_path = Path(self.output_dir) / "_journal.duckdb"
+
+        # Output without a journal cannot be resumed, so it is replaced
+        if not journal_path.exists():
+            remove_dataset(Path(self.output_dir))
+        backfill_written_at(Path(self.output_dir))
+        self.journal = CompletionJournal(str(journal_path))
+        sink = ParquetSink(self.output_dir, self.journal, self.batch_rows)
+
+        # Work out exactly which keys are still missing
+        done_counts = self.journal.done_counts(
+            self.bm_units, self.start_date, self.end_date
+        )
+        if done_counts:
+            done_keys = sum(done_counts.values())
+            logger.info(
+                f"Resuming: {done_keys} unit/period keys already fetched, skipping them"
+            )
+        total_requests = sum(1 for _ in self.iter_work_items(done_counts))
+        logger.info(
+            f"Starting data retrieval: {total_requests} API requests "
+            f"({self.fetch_mode} mode, "
+            f"{len(self.unit_batches())} unit batches)"
+        )
+
+        # Track all requests and failures
+        all_requests_succeeded = True
+        completed_requests = 0
+
+        # Concurrency and request rate are controlled by self.limiter
+        async def fetch_period_task(
+            units: tuple[str, ...], settlement_date: date, settlement_period: int
+        ) -> tuple[pl.DataFrame, list[tuple]]:
+            """Fetch one settlement period for a unit batch and its journal entries."""
+            nonlocal completed_requests, all_requests_succeeded
+
+            data = await self.make_api_request(
+                units, settlement_date, settlement_period
+            )
+            completed_requests += 1
+
+            if data is None:
+                all_requests_succeeded = False
+                return empty_records(), self.journal_entries(
+                    empty_records(),
+                    units,
+                    [(settlement_date, settlement_period)],
+                    "failed",
+                )
+
+            return data, self.journal_entries(
+                data, units, [(settlement_date, settlement_period)], "done"
+            )
+
+        async def fetch_window_task(
+            units: tuple[str, ...], start_date: date, end_date: date
+        ) -> tuple[pl.DataFrame, list[tuple]]:
+            """Fetch one window for a unit batch and journal every period it covered."""
+            nonlocal completed_requests, all_requests_succeeded
+
+            data, failed = await self.fetch_window(units, start_date, end_date)
+            completed_requests += 1
+
+            covered = []
+            current_date = start_date
+            while current_date <= end_date:
+                covered.extend(
+                    (current_date, sp)
+                    for sp in self.get_settlement_periods(current_date)
+                )
+                current_date += timedelta(days=1)
+
+            if failed:
+                all_requests_succeeded = False
+                failed_set = set(failed)
+                covered = [pair for pair in covered if pair not in failed_set]
+
+            entries = self.journal_entries(data, units, covered, "done")
+            entries += self.journal_entries(empty_records(), units, failed, "failed")
+            return data, entries
+
+        def handle_result(data: pl.DataFrame, entries: list[tuple]):
+            """Stream a finished work item to the sink and log progress."""
+            sink.add(data, entries)
+            self.metrics.observe_rows(data.height)
+
+            # Progress logging every 1000 requests
+            if completed_requests % 1000 == 1 or completed_requests == total_requests:
+                progress = (completed_requests / total_requests) * 100
+                cache_stats = (
+                    f", {self.cache.describe()}" if self.cache is not None else ""
+                )
+                logger.info(
+                    f"Progress: {completed_requests}/{total_requests} "
+                    f"({progress:.1f}%) - {self.limiter.describe()}{cache_stats}"
+                )
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        async def producer():
+            """Feed work items into the queue, blocking while it is full."""
+            for item in self.iter_work_items(done_counts):
+                await queue.put(item)
+            # One stop marker per worker
+            for _ in range(self.num_workers):
+                await queue.put(None)
+
+        async def worker():
+            """Process work items until a stop marker arrives."""
+            nonlocal all_requests_succeeded
+            fetch = {"window": fetch_window_task, "period": fetch_period_task}
+            while (item := await queue.get()) is not None:
+                try:
+                    handle_result(*await fetch[item[0]](*item[1:]))
+                except Exception as e:
+                    logger.error(f"Unexpected error in task execution: {e}")
+                    all_requests_succeeded = False
+
+        async def report_metrics():
+            """Export the metrics every metrics_interval seconds."""
+            while True:
+                await asyncio.sleep(self.metrics_interval)
+                self.metrics.export(self.output_dir)
+
+        logger.info(f"Starting {self.num_workers} workers")
+        self.metrics.start()
+
+        # Execute work items with progress tracking
+        workers = [asyncio.create_task(worker()) for _ in range(self.num_workers)]
+        reporter = asyncio.create_task(report_metrics())
+        try:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                # Store client reference for make_api_request
+                self.client = client
+                await asyncio.gather(producer(), *workers)
+
+            sink.close()
+            logger.info(
+                f"Data retrieval complete. Wrote {sink.rows_written} records "
+                f"to {self.output_dir}"
+            )
+            if self.cache is not None:
+                logger.info(f"Response {self.cache.describe()}")
+
+            if not all_requests_succeeded:
+                failures = self.journal.outstanding_failures(self.bm_units)
+                logger.warning(
+                    f"Some requests failed. {failures} unit/period keys are still "
+                    "missing; re-run to fetch just those."
+                )
+        finally:
+            # Stop any workers still running before closing the journal, so none can
+            # write a batch to the dataset without journaling it
+            for task in [*workers, reporter]:
+                task.cancel()
+            await asyncio.gather(*workers, reporter, return_exceptions=True)
+            self.journal.close()
+            self.metrics.stop()
+            self.metrics.export(self.output_dir)
+
+        return sink.rows_written, all_requests_succeeded
+
+    async def run(self) -> bool:
+        """Main execution method. Returns whether every request succeeded."""
+        logger.info(
+            f"Starting B1610 retrieval for {len(self.bm_units)} BM units, "
+            f"{self.start_date} to {self.end_date}"
+        )
+        start_time = time.time()
+
+        try:
+            rows_written, succeeded = await self.retrieve_all_data()
+
+            if rows_written:
+                # Log summary statistics from the dataset, without loading it whole
+                df = (
+                    pl.scan_parquet(
+                        f"{self.output_dir}/*/*/*.parquet",
+                        hive_partitioning=True,
+                        extra_columns="ignore",
+                    )
+                    .select(
+                        pl.len().alias("records"),
+                        pl.col("settlementDate").min().alias("first_date"),
+                        pl.col("settlementDate").max().alias("last_date"),
+                        pl.col("bmUnit").unique().sort().str.join(", ").alias("units"),
+                        pl.col("quantity").sum().alias("total_generation"),
+                    )
+                    .collect()
+                )
+
+                logger.info("Summary statistics:")
+                logger.info(f"  Total records: {df['records'][0]}")
+                logger.info(
+                    f"  Date range: {df['first_date'][0]} to {df['last_date'][0]}"
+                )
+                logger.info(f"  Units: {df['units'][0]}")
+                total_generation = df["total_generation"][0] or 0
+                logger.info(f"  Total generation (MWh): {total_generation:.2f}")
+
+            logger.info("Request metrics:")
+            for line in self.metrics.summary():
+                logger.info(line)
+
+            elapsed_time = time.time() - start_time
+            logger.info(f"Retrieval completed in {elapsed_time:.2f} seconds")
+            return succeeded
+
+        except Exception as e:
+            logger.error(f"Retrieval failed with error: {e}")
+            raise
+
+
+def split_span(
+    start_date: date, end_date: date, shards: int
+) -> list[tuple[date, date]]:
+    """Split a date span into up to `shards` contiguous spans of near-equal length."""
+    days = (end_date - start_date).days + 1
+    shards = max(1, min(shards, days))
+    bounds = [
+        start_date + timedelta(days=days * i // shards) for i in range(shards + 1)
+    ]
+    return [(bounds[i], bounds[i + 1] - timedelta(days=1)) for i in range(shards)]
+
+
+def shard_dir(output_dir: str, start_date: date, end_date: date) -> str:
+    """Directory of the dataset written by the shard from start_date to end_date."""
+    return f"{output_dir}{SHARDS_SUFFIX}/{start_date:%Y%m%d}_{end_date:%Y%m%d}"
+
+
+def run_shard(
+    bm_units: list[str],
+    start_date: date,
+    end_date: date,
+    output_dir: str,
+    options: dict,
+) -> tuple[str, int, bool]:
+    """
+    Retrieve one shard of a backfill into its own dataset, with its own journal.
+
+    Runs a complete B1610Retriever (event loop, workers, sink) in the calling process,
+    so shards can run side by side in worker processes or on separate machines. The
+    shared response cache is safe to use from several processes, as entries are
+    written atomically. Returns the shard directory, the records written and whether
+    every request succeeded.
+    """
+    if not logging.getLogger().handlers:
+        # Worker processes start without the parent's logging configuration
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - "
+            f"[{start_date}..{end_date}] %(message)s",
+        )
+    retriever = B1610Retriever(
+        bm_units,
+        start_date,
+        end_date,
+        output_dir=shard_dir(output_dir, start_date, end_date),
+        **options,
+    )
+    rows_written, succeeded = asyncio.run(retriever.retrieve_all_data())
+    return retriever.output_dir, rows_written, succeeded
+
+
+def backfill(
+    bm_units: list[str],
+    start_date: date,
+    end_date: date,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    shards: int = 4,
+    processes: int | None = None,
+    allow_gaps: bool = False,
+    **options,
+) -> dict:
+    """
+    Retrieve a long date span as shards in parallel worker processes, then merge them.
+
+    A single retriever is limited by its one event loop (JSON decoding, journaling and
+    Parquet writes all share a core), so the span is split into `shards` date ranges,
+    each retrieved by its own process into its own dataset under <output_dir>.shards/.
+    Each process starts at an equal share of the initial request rate, so the shards
+    together open at the rate one retriever would. Once every shard has finished,
+    `merge_shards` checks coverage and publishes the combined dataset to output_dir.
+    Remaining keyword arguments are passed on to each shard's B1610Retriever.
+    """
+    check_merge_target(Path(output_dir))  # Before fetching anything, not after
+    spans = split_span(start_date, end_date, shards)
+    processes = min(processes or os.cpu_count() or 1, len(spans))
+    options.setdefault("initial_rate", max(1.0, INITIAL_RATE / processes))
+    logger.info(
+        f"Backfilling {start_date} to {end_date} as {len(spans)} shards "
+        f"in {processes} processes"
+    )
+
+    # Spawned rather than forked, so no process inherits another's DuckDB or event
+    # loop state
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        futures = {
+            pool.submit(run_shard, bm_units, first, last, output_dir, options): (
+                first,
+                last,
+            )
+            for first, last in spans
+        }
+        for future in as_completed(futures):
+            first, last = futures[future]
+            try:
+                path, rows_written, succeeded = future.result()
+            except Exception as e:
+                logger.error(f"Shard {first} to {last} failed: {e}")
+                continue
+            status = (
+                "complete"
+                if succeeded
+                else "incomplete, re-run to fetch the missing keys"
+            )
+            logger.info(
+                f"Shard {first} to {last}: {rows_written} records written to {path} "
+                f"({status})"
+            )
+
+    return merge_shards(
+        bm_units, start_date, end_date, output_dir, allow_gaps=allow_gaps
+    )
+
+
+def check_merge_target(output: Path):
+    """Refuse to merge into a directory with files but no journal (not a dataset)."""
+    if (
+        not (output / "_journal.duckdb").exists()
+        and output.exists()
+        and any(output.iterdir())
+    ):
+        raise FileExistsError(
+            f"{output} exists but has no journal, so it cannot be merged "
+            f"into; move it aside or choose another --output"
+        )
+
+
+def merge_shards(
+    bm_units: list[str],
+    start_date: date,
+    end_date: date,
+    output_dir: str = DEFAULT_OUTPUT_DIR,
+    allow_gaps: bool = False,
+) -> dict:
+    """
+    Merge the shard datasets under <output_dir>.shards/ into the dataset in output_dir.
+
+    The shards (and any dataset already in output_dir) are combined in one DuckDB pass:
+    - Coverage: every expected (unit, date, settlement period) key of the span must be
+      marked done in one of the journals. Keys the API had no data for count as
+      covered; keys never fetched are reported and, unless allow_gaps is set, nothing
+      is published so the shards can be re-run first.
+    - Overlaps: records for the same key from several sources are deduplicated,
+      keeping the copy from the latest shard.
+    The merged records, a combined journal and a new manifest are written to a
+    temporary directory that then replaces output_dir, and the merged shards are
+    removed. A merge interrupted at any point can simply be run again. An
+    output_dir that holds files but no journal was not written by a retriever, so
+    its contents cannot be merged and the merge is refused rather than replacing it.
+    Returns a report with the key and record counts.
+    """
+    output = Path(output_dir)
+    previous = Path(f"{output_dir}.replaced")
+    if previous.exists():
+        # Left behind by a merge interrupted while swapping directories: before the
+        # merged dataset was moved into place it is still the published dataset,
+        # afterwards it is already part of output_dir
+        if output.exists():
+            shutil.rmtree(previous)
+        else:
+            os.replace(previous, output)
+    shards_root = Path(f"{output_dir}{SHARDS_SUFFIX}")
+    sources = sorted(path.parent for path in shards_root.glob("*/_journal.duckdb"))
+    if (output / "_journal.duckdb").exists():
+        sources.insert(0, output)  # Lowest priority: shards hold the newer data
+    else:
+        check_merge_target(output)
+    if not sources:
+        raise FileNotFoundError(f"No shard datasets found in {shards_root}")
+
+    def literal(path: Path) -> str:
+        return "'" + path.as_posix().replace("'", "''") + "'"
+
+    con = duckdb.connect()
+    try:
+        for i, source in enumerate(sources):
+            con.execute(
+                f"ATTACH {literal(source / '_journal.duckdb')} AS j{i} (READ_ONLY)"
+            )
+        journals = " UNION ALL ".join(
+            f"SELECT * FROM j{i}.journal"  # noqa: S608
+            for i in range(len(sources))
+        )
+        con.execute(f"CREATE TEMP VIEW journals AS {journals}")
+
+        # Expected keys: every unit for every settlement period of every date
+        days = (end_date - start_date).days + 1
+        dates = [start_date + timedelta(days=i) for i in range(days)]
+        con.register(
+            "days",
+            pl.DataFrame(
+                {
+                    "settlement_date": dates,
+                    "periods": [settlement_period_count(d) for d in dates],
+                }
+            ),
+        )
+        con.register("units", pl.DataFrame({"bm_unit": list(dict.fromkeys(bm_units))}))
+        con.execute("""
+            CREATE TEMP TABLE coverage AS
+            WITH expected AS (
+                SELECT
+                    bm_unit,
+                    settlement_date,
+                    unnest(range(1, periods + 1)) AS settlement_period
+                FROM units, days
+            ), fetched AS (
+                SELECT
+                    bm_unit,
+                    settlement_date,
+                    settlement_period,
+                    max(row_count) AS row_count
+                FROM journals
+                WHERE status = 'done'
+                GROUP BY ALL
+            )
+            SELECT e.*, f.row_count
+            FROM expected e
+            LEFT JOIN fetched f USING (bm_unit, settlement_date, settlement_period)
+        """)
+        expected, missing, empty = con.execute("""
+            SELECT
+                count(*),
+                count(*) FILTER (row_count IS NULL),
+                count(*) FILTER (row_count = 0)
+            FROM coverage
+        """).fetchone()
+        report = {
+            "sources": len(sources),
+            "expected_keys": expected,
+            "missing_keys": missing,
+            "empty_keys": empty,
+            "records": 0,
+            "duplicates_dropped": 0,
+            "published": False,
+        }
+
+        logger.info(
+            f"Coverage of {len(sources)} datasets: "
+            f"{expected - missing}/{expected} keys fetched "
+            f"({empty} with no data from the API), {missing} missing"
+        )
+        if missing:
+            sample = con.execute("""
+                SELECT
+                    bm_unit,
+                    settlement_date,
+                    min(settlement_period),
+                    max(settlement_period),
+                    count(*)
+                FROM coverage WHERE row_count IS NULL
+                GROUP BY bm_unit, settlement_date
+                ORDER BY settlement_date, bm_unit
+                LIMIT 10
+            """).fetchall()
+            for unit, settlement_date, first_sp, last_sp, count in sample:
+                logger.warning(
+                    f"  Missing {unit} {settlement_date}: {count} periods "
+                    f"between SP {first_sp} and {last_sp}"
+                )
+            if not allow_gaps:
+                logger.error(
+                    "Coverage incomplete; re-run the affected shards before merging, "
+                    "or merge with allow_gaps to publish anyway"
+                )
+                return report
+
+        # Records from every source, ranked so the newest copy of a key wins
+        for source in sources:
+            backfill_written_at(source)
+        scans = [
+            f"SELECT *, {i} AS source "  # noqa: S608
+            f"FROM read_parquet({literal(source / '*/*/*.parquet')}, "
+            "hive_partitioning = true, union_by_name = true, "
+            "hive_types = {'bmUnit': VARCHAR, 'month': VARCHAR})"
+            for i, source in enumerate(sources)
+            if any(source.glob("*/*/*.parquet"))
+        ]
+
+        staging = Path(f"{output_dir}.merging")
+        if staging.exists():
+            shutil.rmtree(staging)  # Left behind by an interrupted merge
+        staging.mkdir(parents=True)
+
+        if scans:
+            con.execute(
+                f"CREATE TEMP VIEW records AS {' UNION ALL BY NAME '.join(scans)}"
+            )
+            total = con.execute("SELECT count(*) FROM records").fetchone()[0]
+            con.execute(f"""
+                COPY (
+                    SELECT * EXCLUDE (source)
+                    FROM records
+                    QUALIFY row_number() OVER (
+                        PARTITION BY bmUnit, settlementDate, settlementPeriod
+                        ORDER BY source DESC, writtenAt DESC NULLS LAST
+                    ) = 1
+                ) TO {literal(staging)} (
+                    FORMAT parquet, COMPRESSION zstd, PARTITION_BY (bmUnit, month),
+                    FILENAME_PATTERN 'part-{{uuid}}'
+                )
+            """)  # noqa: S608
+            merged_files = literal(staging / "*/*/*.parquet")
+            report["records"] = con.execute(
+                f"SELECT count(*) FROM read_parquet({merged_files})"  # noqa: S608
+            ).fetchone()[0]
+            report["duplicates_dropped"] = total - report["records"]
+
+        con.execute(f"ATTACH {literal(staging / '_journal.duckdb')} AS merged")
+        con.execute("CREATE TABLE merged.journal AS SELECT * FROM journals")
+        con.execute("DETACH merged")
+    finally:
+        con.close()
+
+    write_manifest(staging)
+
+    # Swap the merged dataset into place, then drop the shards it was built from
+    if output.exists():
+        os.replace(output, previous)
+    os.replace(staging, output)
+    if output in sources:
+        # Its records and journal are part of the merged dataset
+        shutil.rmtree(previous)
+    elif previous.exists():
+        previous.rmdir()  # An empty directory; anything else was refused above
+    for source in sources:
+        if source.parent == shards_root:
+            shutil.rmtree(source)
+    if shards_root.exists() and not any(shards_root.iterdir()):
+        shards_root.rmdir()
+
+    report["published"] = True
+    logger.info(
+        f"Merged {report['records']} records into {output_dir} "
+        f"({report['duplicates_dropped']} overlapping duplicates dropped)"
+    )
+    return report
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Download Elexon B1610 actual generation for BM units "
+        "over a date span."
+    )
+    parser.add_argument(
+        "--units",
+        nargs="+",
+        required=True,
+        metavar="BM_UNIT",
+        help="BM unit IDs to retrieve, e.g. T_SEAB-1 T_SEAB-2.",
+    )
+    parser.add_argument(
+        "--from",
+        dest="start_date",
+        type=date.fromisoformat,
+        required=True,
+        help="First settlement date (YYYY-MM-DD).",
+    )
+    parser.add_argument(
+        "--to",
+        dest="end_date",
+        type=date.fromisoformat,
+        required=True,
+        help="Last settlement date (YYYY-MM-DD), inclusive.",
+    )
+    parser.add_argument(
+        "--output",
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"Directory of the Parquet dataset (default: {DEFAULT_OUTPUT_DIR}).",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["window", "period"],
+        default="window",
+        help="Request whole days from the stream endpoint, or one settlement period "
+        "at a time.",
+    )
+    parser.add_argument(
+        "--window-days",
+        type=int,
+        default=1,
+        help="Days covered by each window request (default: 1).",
+    )
+    parser.add_argument(
+        "--units-per-request",
+        type=int,
+        default=UNITS_PER_REQUEST,
+        help=f"BM units requested together (default: {UNITS_PER_REQUEST}).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=32,
+        help="Worker tasks making requests (default: 32).",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=METRICS_INTERVAL,
+        help="Seconds between exports of _metrics.json and _metrics.prom "
+        f"(default: {METRICS_INTERVAL:g}).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Do not read or write the response cache in {CACHE_DIR}.",
+    )
+
+    sharding = parser.add_argument_group(
+        "backfill",
+        "Split a long span into date shards, each retrieved into its own dataset "
+        f"under <output>{SHARDS_SUFFIX}/ and then merged into <output> with a "
+        "coverage check.",
+    )
+    sharding.add_argument(
+        "--shards",
+        type=int,
+        help="Retrieve the span as this many shards in parallel worker processes, "
+        "then merge.",
+    )
+    sharding.add_argument(
+        "--processes",
+        type=int,
+        help="Worker processes for --shards (default: one per CPU, at most one per "
+        "shard).",
+    )
+    sharding.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="Retrieve only shard I of N (1-based), e.g. one per machine; merge "
+        "later with --merge.",
+    )
+    sharding.add_argument(
+        "--merge",
+        action="store_true",
+        help=f"Merge the shard datasets in <output>{SHARDS_SUFFIX}/ into <output>.",
+    )
+    sharding.add_argument(
+        "--allow-gaps",
+        action="store_true",
+        help="Publish a merge even if some expected unit/period keys were never "
+        "fetched.",
+    )
+    args = parser.parse_args(argv)
+
+    if sum(bool(option) for option in (args.shards, args.shard, args.merge)) > 1:
+        parser.error("--shards, --shard and --merge cannot be combined")
+    if args.shard:
+        try:
+            index, count = (int(part) for part in args.shard.split("/"))
+        except ValueError:
+            parser.error(f"--shard must look like I/N, not '{args.shard}'")
+        if not 1 <= index <= count:
+            parser.error(f"--shard {args.shard} is out of range")
+        args.shard = (index, count)
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Command line entry point; returns the process exit code."""
+    args = parse_args(argv)
+    if args.merge:
+        report = merge_shards(
+            args.units,
+            args.start_date,
+            args.end_date,
+            args.output,
+            allow_gaps=args.allow_gaps,
+        )
+        return 0 if report["published"] else 1
+
+    options = {
+        "fetch_mode": args.mode,
+        "window_days": args.window_days,
+        "units_per_request": args.units_per_request,
+        "num_workers": args.workers,
+        "cache_dir": None if args.no_cache else CACHE_DIR,
+        "metrics_interval": args.metrics_interval,
+    }
+    if args.shards:
+        report = backfill(
+            args.units,
+            args.start_date,
+            args.end_date,
+            args.output,
+            shards=args.shards,
+            processes=args.processes,
+            allow_gaps=args.allow_gaps,
+            **options,
+        )
+        return 0 if report["published"] else 1
+    if args.shard:
+        index, count = args.shard
+        spans = split_span(args.start_date, args.end_date, count)
+        if index > len(spans):
+            logger.info(
+                f"Shard {index}/{count} is empty: the span only has {len(spans)} days"
+            )
+            return 0
+        first, last = spans[index - 1]
+        path, rows_written, succeeded = run_shard(
+            args.units, first, last, args.output, options
+        )
+        logger.info(
+            f"Shard {index}/{count} ({first} to {last}): {rows_written} records "
+            f"written to {path}; collect every shard directory in "
+            f"{args.output}{SHARDS_SUFFIX}/ and run --merge"
+        )
+        return 0 if succeeded else 1
+
+    retriever = B1610Retriever(
+        args.units, args.start_date, args.end_date, output_dir=args.output, **options
+    )
+    succeeded = asyncio.run(retriever.run())
+    return 0 if succeeded else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    raise SystemExit(main())
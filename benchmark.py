@@ -0,0 +1,906 @@
+# benchmark.py
+
+"""
+Offline scaling benchmarks for the ETL.
+
+`python benchmark.py scaling` generates synthetic source files with the
+layouts of the real government datasets at several multiples of their real
+size, then times the `utils.concat_*` sheet-family helpers (with a cold and
+a warm staging cache) and the full `main.py` build against them. Throughput
+and peak DuckDB memory for every step are printed per scale and saved as
+JSON under `data/.bench/`, so scaling can be checked before new releases of
+the source datasets grow.
+
+The helpers read fixed cell ranges, so workbooks are scaled by their number
+of year sheets. The vehicle licensing CSVs are scaled by their number of
+LSOA rows.
+
+`python benchmark.py renewables` runs the DuckDB and Polars backends of
+`renewables.py` head to head on the real or a synthetic renewables workbook,
+each in a fresh process, and reports wall time, peak RSS and whether their
+outputs are identical.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import statistics
+import sys
+import time
+import zipfile
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import duckdb
+import polars as pl
+
+import main
+import renewables
+from extensions import EXTENSION_DIR, configure_extensions
+from spatial_cache import SPATIAL_CACHE_DIR
+from staging import STAGE_DIR
+from telemetry import RunLog
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+BENCH_DIR = "data/.bench"
+DEFAULT_SCALES = [1, 10, 100]
+
+# Share of cells holding a suppression marker such as '[x]' or '[c]'
+SUPPRESSED_SHARE = 0.02
+
+# --- Real layouts of the spreadsheet sources ---
+ELECTRICITY_LAYOUT = {
+    "path": "data/Subnational_electricity_consumption_statistics_2005-2023.xlsx",
+    "first_year": 2012,
+    "years": 12,
+    "header_row": 5,  # A5:X374
+    "rows": 369,
+    "id_columns": ["Country or region", "Local authority", "Code"],
+    "value_columns": [
+        f"{measure}: {sector}"
+        for measure in [
+            "Number of meters (thousands)",
+            "Total consumption (GWh)",
+            "Mean consumption (kWh per meter)",
+            "Median consumption (kWh per meter)",
+            "Economy 7 meters (thousands)",
+            "Economy 7 consumption (GWh)",
+            "Half-hourly consumption (GWh)",
+        ]
+        for sector in ["Domestic", "Non-domestic", "All meters"]
+    ],
+}
+
+ENERGY_LAYOUT = {
+    "path": "data/Subnational_total_final_energy_consumption_2005_2023.xlsx",
+    "first_year": 2005,
+    "years": 19,
+    "header_row": 6,  # A6:AJ391
+    "rows": 385,
+    "id_columns": ["Country or region", "Local authority", "Code"],
+    "value_columns": [
+        f"{fuel}: {sector}"
+        for fuel, sectors in {
+            "Coal": [
+                "Industrial",
+                "Commercial",
+                "Domestic",
+                "Rail",
+                "Public Sector",
+                "Agriculture",
+                "Total",
+            ],
+            "Manufactured fuels": ["Industrial", "Domestic", "Total"],
+            "Petroleum": [
+                "Industrial",
+                "Commercial",
+                "Domestic",
+                "Road transport [note 5]",
+                "Rail",
+                "Public Sector",
+                "Agriculture",
+                "Total",
+            ],
+            "Gas": ["Domestic", "Industrial & Commercial", "Total"],
+            "Electricity": ["Domestic", "Industrial & Commercial", "Total"],
+            "Bioenergy & wastes": [
+                "Domestic",
+                "Industrial & Commercial",
+                "Road transport [note 6]",
+                "Total",
+            ],
+            "Total": ["Industrial & Commercial", "Domestic", "Transport", "Total"],
+        }.items()
+        for sector in sectors
+    ]
+    + ["Notes"],
+}
+
+RENEWABLE_LAYOUT = {
+    "path": "data/Renewable_electricity_by_local_authority_2014_-_2024.xlsx",
+    "first_year": 2014,
+    "years": 11,
+    "types": ["Generation", "Capacity", "Sites"],
+    "header_row": {"Generation": 5, "Capacity": 4, "Sites": 4},  # A5/A4:R500
+    "rows": 391,
+    "id_columns": [
+        "Local Authority Code [note 1]",
+        "Local Authority Name",
+        "Estimated number of households [note 2]",
+        "Region",
+        "Country",
+    ],
+    "value_columns": [
+        "Photovoltaics",
+        "Onshore Wind",
+        "Offshore Wind",
+        "Hydro",
+        "Wave/Tidal",
+        "Anaerobic Digestion",
+        "Sewage Gas",
+        "Landfill Gas",
+        "Municipal Solid Waste [note 3]",
+        "Animal Biomass",
+        "Plant Biomass [note 4]",
+        "Cofiring",
+        "Total",
+    ],
+}
+
+# --- Real layouts of the vehicle licensing CSVs ---
+LSOA_COUNT = 34_753  # LSOA 2011 areas in England and Wales
+
+VEHICLE_LAYOUTS = [
+    {
+        "path": "data/df_VEH0135.csv",
+        "first_quarter": (2009, 4),
+        "categories": {
+            "Fuel": [
+                "Battery electric",
+                "Diesel",
+                "Hybrid electric (diesel)",
+                "Hybrid electric (petrol)",
+                "Other fuels",
+                "Petrol",
+                "Plug-in hybrid electric (diesel)",
+                "Plug-in hybrid electric (petrol)",
+                "Range extended electric",
+                "Total",
+            ]
+        },
+    },
+    {
+        "path": "data/df_VEH0145.csv",
+        "first_quarter": (2011, 4),
+        "categories": {
+            "Fuel": [
+                "Battery electric",
+                "Fuel cell electric",
+                "Plug-in hybrid electric (diesel)",
+                "Plug-in hybrid electric (petrol)",
+                "Range extended electric",
+                "Total",
+            ]
+        },
+    },
+    {
+        "path": "data/df_VEH0125.csv",
+        "first_quarter": (2009, 4),
+        "categories": {
+            "BodyType": [
+                "Cars",
+                "Motorcycles",
+                "Light goods vehicles",
+                "Heavy goods vehicles",
+                "Buses and coaches",
+                "Total",
+            ],
+            "Keepership": ["Company", "Private", "Total"],
+            "LicenceStatus": ["Licensed", "SORN"],
+        },
+    },
+]
+LAST_QUARTER = (2025, 1)
+
+
+# --- Synthetic workbooks ---
+def _column_letter(index: int) -> str:
+    """Returns the spreadsheet column letter for a zero-based column index."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cell(ref: str, value: str | int | float | None) -> str:
+    """Renders one worksheet cell, using inline strings for text."""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return f'<c r="{ref}" t="inlineStr"><is><t>{escape(value)}</t></is></c>'
+    return f'<c r="{ref}"><v>{value}</v></c>'
+
+
+def write_xlsx(path: str, sheets: Iterable[tuple[str, int, list[list]]]) -> None:
+    """
+    Writes a minimal XLSX workbook without any third-party dependency.
+
+    Each sheet gets a title in A1 followed by its rows starting at
+    `first_row`, which mirrors the title blocks above the tables in the
+    government workbooks.
+
+    Args:
+        path: The file path to write the workbook to.
+        sheets: (sheet name, first row number, rows) for every sheet. The
+                first of the rows is the header.
+    """
+    names = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for number, (name, first_row, rows) in enumerate(sheets, start=1):
+            names.append(name)
+            last_row = first_row + len(rows) - 1
+            last_column = _column_letter(max(len(row) for row in rows) - 1)
+            with zf.open(f"xl/worksheets/sheet{number}.xml", "w") as f:
+                f.write(
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/'
+                    'spreadsheetml/2006/main">'
+                    f'<dimension ref="A1:{last_column}{last_row}"/><sheetData>'
+                    f'<row r="1">{_cell("A1", f"{name} (synthetic)")}</row>'.encode()
+                )
+                for r, row in enumerate(rows, start=first_row):
+                    cells = "".join(
+                        _cell(f"{_column_letter(c)}{r}", value)
+                        for c, value in enumerate(row)
+                    )
+                    f.write(f'<row r="{r}">{cells}</row>'.encode())
+                f.write(b"</sheetData></worksheet>")
+
+        main_ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+        rel_ns = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+        pkg_ns = "http://schemas.openxmlformats.org/package/2006"
+        sheet_type = f"{rel_ns}/worksheet"
+        zf.writestr(
+            "[Content_Types].xml",
+            f'<Types xmlns="{pkg_ns}/content-types">'
+            '<Default Extension="rels" ContentType="application/'
+            'vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + "".join(
+                f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                'ContentType="application/'
+                'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for n in range(1, len(names) + 1)
+            )
+            + "</Types>",
+        )
+        zf.writestr(
+            "_rels/.rels",
+            f'<Relationships xmlns="{pkg_ns}/relationships">'
+            f'<Relationship Id="rId1" Type="{rel_ns}/officeDocument" '
+            'Target="xl/workbook.xml"/></Relationships>',
+        )
+        zf.writestr(
+            "xl/workbook.xml",
+            f'<workbook xmlns="{main_ns}" xmlns:r="{rel_ns}"><sheets>'
+            + "".join(
+                f'<sheet name="{escape(name, {chr(34): "&quot;"})}" '
+                f'sheetId="{n}" r:id="rId{n}"/>'
+                for n, name in enumerate(names, start=1)
+            )
+            + "</sheets></workbook>",
+        )
+        zf.writestr(
+            "xl/_rels/workbook.xml.rels",
+            f'<Relationships xmlns="{pkg_ns}/relationships">'
+            + "".join(
+                f'<Relationship Id="rId{n}" Type="{sheet_type}" '
+                f'Target="worksheets/sheet{n}.xml"/>'
+                for n in range(1, len(names) + 1)
+            )
+            + "</Relationships>",
+        )
+
+
+def _area(i: int) -> tuple[str, str, str]:
+    """Returns a synthetic (code, name, country) for the i-th area of a sheet."""
+    # Roughly four in five rows are English local authorities, the rest are
+    # Welsh and Scottish authorities that the ETL filters out
+    prefix, country = [
+        ("E06", "England"),
+        ("E07", "England"),
+        ("E08", "England"),
+        ("E09", "England"),
+        ("E07", "England"),
+        ("E06", "England"),
+        ("E08", "England"),
+        ("E07", "England"),
+        ("W06", "Wales"),
+        ("S12", "Scotland"),
+    ][i % 10]
+    return f"{prefix}{i:06d}", f"Synthetic authority {i}", country
+
+
+def _value(rng: random.Random, marker: str = "[x]") -> str | float:
+    """Returns a synthetic measurement or, occasionally, a suppression marker."""
+    if rng.random() < SUPPRESSED_SHARE:
+        return marker
+    return round(rng.uniform(0, 5000), 3)
+
+
+def _sheet_rows(layout: dict, rng: random.Random) -> list[list]:
+    """Generates the header and data rows of one electricity or energy sheet."""
+    rows = [layout["id_columns"] + layout["value_columns"]]
+    for i in range(layout["rows"]):
+        code, name, country = _area(i)
+        values = [_value(rng) for _ in layout["value_columns"]]
+        if layout["value_columns"][-1] == "Notes":
+            values[-1] = None
+        rows.append([country, name, code] + values)
+    return rows
+
+
+def _renewable_rows(layout: dict, rng: random.Random) -> list[list]:
+    """Generates the header and data rows of one renewable sheet."""
+    rows = [layout["id_columns"] + layout["value_columns"]]
+    for i in range(layout["rows"]):
+        code, name, country = _area(i)
+        households = rng.randint(20_000, 500_000)
+        values = [_value(rng) for _ in layout["value_columns"]]
+        rows.append([code, name, households, "Synthetic region", country] + values)
+    return rows
+
+
+def write_workbooks(data_dir: Path, scale: int, seed: int = 0) -> dict[str, list]:
+    """
+    Writes the three sheet-family workbooks with `scale` times the real
+    number of year sheets.
+
+    Returns:
+        The years written to each workbook, keyed by workbook path.
+    """
+    rng = random.Random(seed)  # noqa: S311 - synthetic data only
+    years = {}
+
+    for layout in (ELECTRICITY_LAYOUT, ENERGY_LAYOUT):
+        yrs = list(
+            range(layout["first_year"], layout["first_year"] + layout["years"] * scale)
+        )
+        write_xlsx(
+            data_dir / Path(layout["path"]).name,
+            ((str(yr), layout["header_row"], _sheet_rows(layout, rng)) for yr in yrs),
+        )
+        years[layout["path"]] = yrs
+
+    years[RENEWABLE_LAYOUT["path"]] = write_renewable_workbook(data_dir, scale, rng)
+    return years
+
+
+def write_renewable_workbook(
+    data_dir: Path, scale: int, rng: random.Random
+) -> list[int]:
+    """
+    Writes the renewables workbook with `scale` times the real number of
+    year sheets.
+
+    Returns:
+        The years written.
+    """
+    layout = RENEWABLE_LAYOUT
+    yrs = list(
+        range(layout["first_year"], layout["first_year"] + layout["years"] * scale)
+    )
+    write_xlsx(
+        data_dir / Path(layout["path"]).name,
+        (
+            (
+                f"LA - {energy_type}{' ' if energy_type == 'Sites' else ', '}{yr}",
+                layout["header_row"][energy_type],
+                _renewable_rows(layout, rng),
+            )
+            for yr in yrs
+            for energy_type in layout["types"]
+        ),
+    )
+    return yrs
+
+
+# --- Synthetic CSVs ---
+def _quarters(first: tuple[int, int], last: tuple[int, int]) -> list[str]:
+    """Returns quarter column names from newest to oldest, e.g. '2025 Q1'."""
+    quarters = []
+    year, quarter = last
+    while (year, quarter) >= first:
+        quarters.append(f"{year} Q{quarter}")
+        year, quarter = (year, quarter - 1) if quarter > 1 else (year - 1, 4)
+    return quarters
+
+
+def write_vehicle_csvs(
+    con: duckdb.DuckDBPyConnection, data_dir: Path, scale: int
+) -> None:
+    """
+    Writes VEH0125/0135/0145-shaped CSVs with `scale` times the real number
+    of LSOAs, including '[c]' suppression markers.
+    """
+    for layout in VEHICLE_LAYOUTS:
+        categories = layout["categories"]
+        joins = " CROSS JOIN ".join(
+            f"(SELECT unnest(?) AS {column})" for column in categories
+        )
+        quarter_columns = ", ".join(
+            f"""CASE WHEN hash(l, {", ".join(categories)}, {i}) % 50 = 0
+                THEN '[c]'
+                ELSE (hash(l, {", ".join(categories)}, {i}) % 2000)::VARCHAR
+                END AS "{quarter}" """
+            for i, quarter in enumerate(
+                _quarters(layout["first_quarter"], LAST_QUARTER)
+            )
+        )
+        target = (data_dir / Path(layout["path"]).name).as_posix()
+        con.execute(
+            f"""
+            COPY (
+                SELECT
+                    if(l % 18 = 0, 'W01', 'E01') || lpad(l::VARCHAR, 6, '0')
+                        AS LSOA11CD,
+                    'Synthetic LSOA ' || l AS LSOA11NM,
+                    {", ".join(categories)},
+                    {quarter_columns}
+                FROM range(?) AS lsoas(l) CROSS JOIN {joins}
+                ORDER BY l
+            ) TO '{target}' (HEADER)
+            """,  # noqa: S608
+            [LSOA_COUNT * scale, *categories.values()],
+        )
+
+
+# --- Benchmarks ---
+def _link_shared_files(scale_dir: Path, source_dir: Path) -> list[str]:
+    """
+    Links the source files that are not synthesised, plus the extension and
+    spatial caches, into a scale directory.
+
+    Returns:
+        The REQUIRED_FILES that are still missing.
+    """
+    for shared in (EXTENSION_DIR, SPATIAL_CACHE_DIR):
+        target = scale_dir / shared
+        if Path(shared).exists() and not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.symlink_to(Path(shared).resolve(), target_is_directory=True)
+
+    missing = []
+    for required in main.REQUIRED_FILES:
+        target = scale_dir / required
+        if target.exists():
+            continue
+        source = source_dir / Path(required).name
+        if source.exists():
+            target.symlink_to(source.resolve())
+        else:
+            missing.append(required)
+    return missing
+
+
+def _scaled_families(years: dict[str, list]) -> list[dict]:
+    """Returns main.SHEET_FAMILY_TABLES with the synthetic workbooks' years."""
+    return [
+        table | {"params": table["params"] | {"yrs": years[table["path"]]}}
+        for table in main.SHEET_FAMILY_TABLES
+    ]
+
+
+def _result(scale: int, suite: str, record: dict) -> dict:
+    """Turns a telemetry record into a benchmark result with throughputs."""
+    wall = record["wall_seconds"] or float("nan")
+    return {
+        "scale": scale,
+        "suite": suite,
+        "step": record["step"],
+        "status": record["status"],
+        "wall_seconds": record["wall_seconds"],
+        "rows": record["rows"],
+        "rows_per_second": (record["rows"] or 0) / wall,
+        "input_bytes": record["input_bytes"],
+        "mb_per_second": record["input_bytes"] / 1_048_576 / wall,
+        "peak_memory_bytes": record["peak_memory_bytes"],
+    }
+
+
+def bench_helpers(scale: int, families: list[dict]) -> list[dict]:
+    """
+    Times the sheet-family helpers, first with an empty staging cache and
+    then again once every sheet has been staged.
+
+    Must be run from inside the scale directory.
+    """
+    results = []
+    con = duckdb.connect()
+    try:
+        configure_extensions(con)
+        for suite in ("helpers-cold", "helpers-warm"):
+            run_log = RunLog(con)
+            run_log.start()
+            try:
+                measured = run_log.measure(main.run_step)
+                for table in families:
+                    step = {
+                        "name": table["name"],
+                        "kind": "sheet_family",
+                        "builder": table["builder"],
+                        "path": table["path"],
+                        "params": table["params"],
+                        "input_fingerprints": [
+                            {"size": os.path.getsize(table["path"])}
+                        ],
+                    }
+                    measured(con, step)
+            finally:
+                run_log.stop()
+            results += [_result(scale, suite, r) for r in run_log.records]
+    finally:
+        con.close()
+    return results
+
+
+def bench_build(scale: int, families: list[dict], workers: int) -> list[dict]:
+    """
+    Runs the full `main.py` build from scratch and reads its step telemetry
+    back from the run log. Must be run from inside the scale directory.
+    """
+    original = list(main.SHEET_FAMILY_TABLES)
+    main.SHEET_FAMILY_TABLES[:] = families
+    argv = sys.argv
+    sys.argv = ["main.py", "--full", "--workers", str(workers)]
+    try:
+        started = time.perf_counter()
+        main.main()
+        wall = time.perf_counter() - started
+    except SystemExit as e:
+        print(f"  - ⚠️  Full build failed at scale {scale}x: {e}")
+        return []
+    finally:
+        main.SHEET_FAMILY_TABLES[:] = original
+        sys.argv = argv
+
+    with duckdb.connect(main.DB_FILE, read_only=True) as con:
+        columns = [
+            "step",
+            "status",
+            "wall_seconds",
+            "rows",
+            "input_bytes",
+            "peak_memory_bytes",
+        ]
+        records = con.execute(
+            f"""
+            SELECT {", ".join(columns)} FROM etl_run_log
+            WHERE run_id = (SELECT max(run_id) FROM etl_run_log)
+            """  # noqa: S608
+        ).fetchall()
+    results = [
+        _result(scale, "build", dict(zip(columns, r, strict=True))) for r in records
+    ]
+    results.append(
+        {
+            "scale": scale,
+            "suite": "build",
+            "step": "(total)",
+            "status": "succeeded",
+            "wall_seconds": wall,
+            "rows": sum(r["rows"] or 0 for r in results),
+        }
+    )
+    return results
+
+
+def print_scaling(results: list[dict], scales: list[int]) -> None:
+    """Prints each step's wall time and peak memory at every scale."""
+    print("\n📈 Wall time (s) / peak DuckDB memory (MB) by scale:")
+    print(f"  {'suite':<13} {'step':<34}" + "".join(f"{f'{s}x':>18}" for s in scales))
+    keys = dict.fromkeys((r["suite"], r["step"]) for r in results)
+    for suite, step in keys:
+        cells = []
+        for scale in scales:
+            match = [
+                r
+                for r in results
+                if (r["suite"], r["step"], r["scale"]) == (suite, step, scale)
+            ]
+            if not match:
+                cells.append(f"{'-':>18}")
+                continue
+            memory = match[0].get("peak_memory_bytes")
+            memory = f"{memory / 1_048_576:.0f}" if memory else "-"
+            cells.append(f"{match[0]['wall_seconds']:>11.2f} / {memory:>4}")
+        print(f"  {suite:<13} {step:<34}" + "".join(cells))
+
+
+def run_scaling(args: argparse.Namespace) -> None:
+    """Generates the synthetic datasets and runs every benchmark suite."""
+    bench_dir = Path(args.bench_dir).resolve()
+    source_dir = Path(args.source_data).resolve()
+    home = Path.cwd()
+    results = []
+
+    for scale in args.scales:
+        scale_dir = bench_dir / f"x{scale}"
+        data_dir = scale_dir / "data"
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        print(f"\n🧪 Generating synthetic sources at {scale}x in '{scale_dir}'...")
+        started = time.perf_counter()
+        years = write_workbooks(data_dir, scale)
+        with duckdb.connect() as con:
+            write_vehicle_csvs(con, data_dir, scale)
+        print(f"  - Generated in {time.perf_counter() - started:.1f}s")
+        families = _scaled_families(years)
+        missing = _link_shared_files(scale_dir, source_dir)
+
+        os.chdir(scale_dir)
+        try:
+            for stage in Path("data/.stage").glob("*.parquet"):
+                stage.unlink()
+            print(f"\n⏱️  Benchmarking sheet-family helpers at {scale}x...")
+            results += bench_helpers(scale, families)
+
+            if args.skip_build:
+                pass
+            elif missing:
+                print(
+                    f"  - ⚠️  Skipping full build at {scale}x; no copy of: "
+                    + ", ".join(missing)
+                )
+            else:
+                print(f"\n⏱️  Benchmarking full build at {scale}x...")
+                results += bench_build(scale, families, args.workers)
+        finally:
+            os.chdir(home)
+
+    print_scaling(results, args.scales)
+    output = bench_dir / f"results-{datetime.now():%Y%m%dT%H%M%S}.json"
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\n✅ Benchmark results saved to '{output}'.")
+
+
+# --- Renewable backends head to head ---
+def _peak_rss_bytes() -> int | None:
+    """Returns this process's peak resident set size, where the OS reports it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports KiB
+
+
+def _run_renewables_backend(
+    workdir: str, backend: str, path: str, yrs: list[int], output: str
+) -> dict:
+    """
+    Reads the renewables workbook with one backend and saves the sorted
+    output for comparison. Runs in a fresh process, so the peak RSS is the
+    backend's own.
+    """
+    os.chdir(workdir)
+    started = time.perf_counter()
+    frame = renewables.read_renewables(
+        yrs, RENEWABLE_LAYOUT["types"], path, backend=backend
+    )
+    wall = time.perf_counter() - started
+    frame.sort(renewables.OUTPUT_KEY).write_parquet(output)
+    return {
+        "wall_seconds": wall,
+        "rows": frame.height,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def _compare_outputs(reference: pl.DataFrame, other: pl.DataFrame) -> str:
+    """Describes how a backend's output differs from the reference output."""
+    if reference.schema != other.schema:
+        return "different schema"
+    if reference.equals(other):
+        return "identical"
+    missing = reference.join(other, on=reference.columns, how="anti", nulls_equal=True)
+    extra = other.join(reference, on=reference.columns, how="anti", nulls_equal=True)
+    return f"differs ({missing.height} rows missing, {extra.height} extra)"
+
+
+def run_renewables(args: argparse.Namespace) -> None:
+    """Benchmarks the renewable ingestion backends against each other."""
+    bench_dir = (Path(args.bench_dir) / "renewables").resolve()
+    data_dir = bench_dir / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    extensions = bench_dir / EXTENSION_DIR
+    if Path(EXTENSION_DIR).exists() and not extensions.exists():
+        extensions.symlink_to(Path(EXTENSION_DIR).resolve(), target_is_directory=True)
+
+    if args.real:
+        path = (
+            Path(args.source_data) / Path(renewables.RENEWABLES_PATH).name
+        ).resolve()
+        if not path.exists():
+            print(f"❌ No copy of the renewables workbook at '{path}'.")
+            return
+        family = next(
+            t for t in main.SHEET_FAMILY_TABLES if t["name"] == "renewable_la_long_tbl"
+        )
+        yrs = family["params"]["yrs"]
+    else:
+        print(f"\n🧪 Generating a synthetic renewables workbook at {args.scale}x...")
+        yrs = write_renewable_workbook(data_dir, args.scale, random.Random(0))  # noqa: S311
+        path = data_dir / Path(renewables.RENEWABLES_PATH).name
+
+    sheets = len(renewables.renewable_sheets(yrs, RENEWABLE_LAYOUT["types"]))
+    print(
+        f"\n🏁 Renewable ingestion head to head: {sheets} sheets, "
+        f"{path.stat().st_size / 1_048_576:.1f} MB workbook, {args.repeat} runs each"
+    )
+
+    stage = bench_dir / STAGE_DIR
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in args.backends:
+        # "duckdb" parses every sheet; "duckdb-staged" reads the staged copies
+        backend = "duckdb" if name.startswith("duckdb") else name
+        runs = []
+        for run in range(args.repeat + (name == "duckdb-staged")):
+            if name == "duckdb":
+                shutil.rmtree(stage, ignore_errors=True)
+            output = bench_dir / f"{name}.parquet"
+            # A new process per run, so neither backend inherits the other's memory
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                try:
+                    record = pool.submit(
+                        _run_renewables_backend,
+                        str(bench_dir),
+                        backend,
+                        str(path),
+                        yrs,
+                        str(output),
+                    ).result()
+                except Exception as e:
+                    print(f"  - ⚠️  {name} failed: {e}")
+                    break
+            if name == "duckdb-staged" and run == 0:
+                continue  # Warm-up run that fills the staging cache
+            runs.append(record)
+        if runs:
+            results.append(
+                {
+                    "backend": name,
+                    "wall_seconds": statistics.median(r["wall_seconds"] for r in runs),
+                    "peak_rss_bytes": runs[0]["peak_rss_bytes"]
+                    and max(r["peak_rss_bytes"] for r in runs),
+                    "rows": runs[0]["rows"],
+                    "output": str(output),
+                }
+            )
+
+    if not results:
+        return
+    reference = pl.read_parquet(results[0]["output"])
+    print(
+        f"\n  {'backend':<15} {'wall (s)':>9} {'peak RSS (MB)':>14} "
+        f"{'rows':>10}  output"
+    )
+    for result in results:
+        result["output_equality"] = (
+            "reference"
+            if result is results[0]
+            else _compare_outputs(reference, pl.read_parquet(result["output"]))
+        )
+        rss = result["peak_rss_bytes"]
+        rss = f"{rss / 1_048_576:.0f}" if rss else "-"
+        print(
+            f"  {result['backend']:<15} {result['wall_seconds']:>9.2f} {rss:>14} "
+            f"{result['rows']:>10,}  {result['output_equality']}"
+        )
+
+    output = bench_dir / f"results-{datetime.now():%Y%m%dT%H%M%S}.json"
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\n✅ Benchmark results saved to '{output}'.")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the ETL offline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scaling = commands.add_parser(
+        "scaling",
+        help="Time the sheet helpers and the full build on synthetic data "
+        "at several multiples of the real dataset sizes.",
+    )
+    scaling.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SCALES,
+        help=f"Size multiples to benchmark (default: {DEFAULT_SCALES}).",
+    )
+    scaling.add_argument(
+        "--bench-dir",
+        default=BENCH_DIR,
+        help=f"Directory for the synthetic data and results (default: {BENCH_DIR}).",
+    )
+    scaling.add_argument(
+        "--source-data",
+        default="data",
+        help="Directory with real copies of the sources that are not "
+        "synthesised, needed for the full build (default: data).",
+    )
+    scaling.add_argument(
+        "--workers",
+        type=int,
+        default=main.DEFAULT_WORKERS,
+        help="Workers for the full build (default: %(default)s).",
+    )
+    scaling.add_argument(
+        "--skip-build",
+        action="store_true",
+        help="Only benchmark the sheet-family helpers.",
+    )
+    scaling.set_defaults(run=run_scaling)
+
+    head_to_head = commands.add_parser(
+        "renewables",
+        help="Run the DuckDB and Polars renewable ingestion backends head to "
+        "head, reporting wall time, peak RSS and output equality.",
+    )
+    head_to_head.add_argument(
+        "--backends",
+        nargs="+",
+        choices=["duckdb", "duckdb-staged", "polars"],
+        default=["duckdb", "duckdb-staged", "polars"],
+        help="Backends to run; the first is the reference for output equality. "
+        "'duckdb-staged' reads sheets from the staging cache (default: all).",
+    )
+    head_to_head.add_argument(
+        "--real",
+        action="store_true",
+        help="Use the real workbook from --source-data instead of a synthetic one.",
+    )
+    head_to_head.add_argument(
+        "--scale",
+        type=int,
+        default=1,
+        help="Multiple of the real number of year sheets in the synthetic "
+        "workbook (default: 1).",
+    )
+    head_to_head.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per backend; the median wall time is reported (default: 3).",
+    )
+    head_to_head.add_argument(
+        "--bench-dir",
+        default=BENCH_DIR,
+        help=f"Directory for the synthetic data and results (default: {BENCH_DIR}).",
+    )
+    head_to_head.add_argument(
+        "--source-data",
+        default="data",
+        help="Directory with the real workbook, for --real (default: data).",
+    )
+    head_to_head.set_defaults(run=run_renewables)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    args.run(args)
@@ -40,8 +40,8 @@ SELECT *,
     .ST_Transform('EPSG:27700', 'EPSG:4326', always_xy := true) geometry
 FROM read_csv('data/repd-q2-jul-2025.csv', normalize_names=true, ignore_errors=true);
 """
-con.sql(repd_sql)
-print(f"✅ Created table: repd_tbl with {con.table('repd_tbl').count()} records")
+repd_rows = con.execute(repd_sql).fetchone()[0]
+print(f"✅ Created table: repd_tbl with {repd_rows} records")
 
 
 # %% [markdown]
@@ -58,9 +58,9 @@ FROM read_xlsx('data/electric-vehicle-public-charging-infrastructure-statistics-
 sheet='1a', range = 'A3:Y436', normalize_names=true, ignore_errors=true)
 WHERE local_authority_region_code LIKE 'E0%' AND apr25 IS NOT NULL;
 """
-con.sql(ev_chargepoints_sql)
+ev_chargepoints_rows = con.execute(ev_chargepoints_sql).fetchone()[0]
 print(
-    f"✅ Created table: ev_chargepoints_all_speeds_uk_la_tbl with {con.table('ev_chargepoints_all_speeds_uk_la_tbl').count()} records"
+    f"✅ Created table: ev_chargepoints_all_speeds_uk_la_tbl with {ev_chargepoints_rows} records"
 )
 
 # %%
@@ -74,9 +74,9 @@ FROM read_xlsx('data/electric-vehicle-public-charging-infrastructure-statistics-
 sheet='2a', range = 'A3:Y436', normalize_names=true, ignore_errors=true)
 WHERE local_authority_region_code_note_5 LIKE 'E0%' AND apr25 IS NOT NULL;
 """
-con.sql(ev_chargepoints_per_cap_sql)
+ev_chargepoints_per_cap_rows = con.execute(ev_chargepoints_per_cap_sql).fetchone()[0]
 print(
-    f"✅ Created table: ev_chargepoints_all_speeds_uk_la_per_cap_tbl with {con.table('ev_chargepoints_all_speeds_uk_la_per_cap_tbl').count()} records"
+    f"✅ Created table: ev_chargepoints_all_speeds_uk_la_per_cap_tbl with {ev_chargepoints_per_cap_rows} records"
 )
 
 # %% [markdown]
@@ -89,8 +89,8 @@ sw_la_sql = """
 CREATE OR REPLACE TABLE sw_la_tbl AS
 FROM ST_Read('https://opendata.westofengland-ca.gov.uk/api/explore/v2.1/catalog/datasets/local-authorities-districts-south-west-england/exports/geojson?lang=en&timezone=Europe%2FLondon');
 """
-con.sql(sw_la_sql)
-print(f"✅ Created table: sw_la_tbl with {con.table('sw_la_tbl').count()} records")
+sw_la_rows = con.execute(sw_la_sql).fetchone()[0]
+print(f"✅ Created table: sw_la_tbl with {sw_la_rows} records")
 
 # %% [markdown]
 # ---
@@ -104,10 +104,8 @@ SELECT lsoa11cd, lsoa11nm, fuel, _2025_q1 AS q1_2025_count
 FROM read_csv('data/df_VEH0135.csv', normalize_names=true, ignore_errors=true)
 WHERE q1_2025_count != '[c]' AND (fuel = 'Battery electric' OR fuel LIKE 'Plug%');
 """
-con.sql(ev_reg_sql)
-print(
-    f"✅ Created table: ev_reg_lsoa11_all_tbl with {con.table('ev_reg_lsoa11_all_tbl').count()} records"
-)
+ev_reg_rows = con.execute(ev_reg_sql).fetchone()[0]
+print(f"✅ Created table: ev_reg_lsoa11_all_tbl with {ev_reg_rows} records")
 
 # %% [markdown]
 # ---
@@ -152,10 +150,10 @@ path = "data/Subnational_electricity_consumption_statistics_2005-2023.xlsx"
 
 # %%
 electricity_la_tbl = concat_sheets(yrs, path, con)
-electricity_la_tbl.create("electricity_la_tbl")
-print(
-    f"✅ Created table: electricity_la_tbl with {con.table('electricity_la_tbl').count()} records"
-)
+electricity_rows = con.execute(
+    f"CREATE TABLE electricity_la_tbl AS {electricity_la_tbl.sql_query()}"
+).fetchone()[0]
+print(f"✅ Created table: electricity_la_tbl with {electricity_rows} records")
 
 # %% [markdown]
 # ---
@@ -170,9 +168,9 @@ SELECT * FROM read_xlsx('data/Sub-regional_fuel_poverty_statistics_2023.xlsx',
                 sheet='Table 4',
                 normalize_names=true);
 """
-con.sql(fuel_poverty_sql)
+fuel_poverty_rows = con.execute(fuel_poverty_sql).fetchone()[0]
 print(
-    f"✅ Created table: fuel_poverty_2023_lsoa21_tbl with {con.table('fuel_poverty_2023_lsoa21_tbl').count()} records"
+    f"✅ Created table: fuel_poverty_2023_lsoa21_tbl with {fuel_poverty_rows} records"
 )
 
 
@@ -187,10 +185,8 @@ CREATE OR REPLACE TABLE lsoa11_la_lookup_tbls AS
 SELECT lsoa11cd, lsoa11nm, ctyua21cd AS lad_code, ctyua21nm AS lad_name
 FROM read_xlsx('data/LSOA11_UTLA21_EW_LU.xlsx', normalize_names=true);
 """
-con.sql(lsoa_lookup_sql)
-print(
-    f"✅ Created table: lsoa11_la_lookup_tbls with {con.table('lsoa11_la_lookup_tbls').count()} records"
-)
+lsoa_lookup_rows = con.execute(lsoa_lookup_sql).fetchone()[0]
+print(f"✅ Created table: lsoa11_la_lookup_tbls with {lsoa_lookup_rows} records")
 
 
 # %% [markdown]
@@ -221,19 +217,17 @@ lep_boundary_sql = """
 CREATE OR REPLACE TABLE lep_boundary_tbl AS
 FROM ST_Read('https://opendata.westofengland-ca.gov.uk/api/explore/v2.1/catalog/datasets/lep-boundary/exports/fgb?lang=en&timezone=Europe%2FLondon');
 """
-con.sql(lep_boundary_sql)
-print("✅ Created table: lep_boundary_tbl")
+lep_boundary_rows = con.execute(lep_boundary_sql).fetchone()[0]
+print(f"✅ Created table: lep_boundary_tbl with {lep_boundary_rows} records")
 
 # %%
 # Get renewables generation, capacity, and sites by LA
 uk_renewables_sql = """
 CREATE OR REPLACE TABLE uk_renewables_tbl AS
-FROM read_csv('data/all_renewables_tbl.csv');
+FROM read_parquet('data/all_renewables_tbl.parquet');
 """
-con.sql(uk_renewables_sql)
-print(
-    f"✅ Created table: uk_renewables_tbl with {con.table('uk_renewables_tbl').count()} records"
-)
+uk_renewables_rows = con.execute(uk_renewables_sql).fetchone()[0]
+print(f"✅ Created table: uk_renewables_tbl with {uk_renewables_rows} records")
 
 # %% [markdown]
 # ---
@@ -246,9 +240,9 @@ regional_carbon_sql = """
 CREATE OR REPLACE TABLE regional_carbon_intensity_tbl AS
 SELECT * FROM read_csv('data/regional_carbon_intensity.csv', normalize_names = true);
 """
-con.sql(regional_carbon_sql)
+regional_carbon_rows = con.execute(regional_carbon_sql).fetchone()[0]
 print(
-    f"✅ Created table: regional_carbon_intensity_tbl with {con.table('regional_carbon_intensity_tbl').count()} records"
+    f"✅ Created table: regional_carbon_intensity_tbl with {regional_carbon_rows} records"
 )
 
 # %%
@@ -258,9 +252,9 @@ CREATE OR REPLACE TABLE carbon_intensity_categories_tbl AS
 SELECT * EXCLUDE(very_high_upper_limit)
 FROM read_csv('data/carbon_intensity_categories.csv');
 """
-con.sql(carbon_categories_sql)
+carbon_categories_rows = con.execute(carbon_categories_sql).fetchone()[0]
 print(
-    f"✅ Created table: carbon_intensity_categories_tbl with {con.table('carbon_intensity_categories_tbl').count()} records"
+    f"✅ Created table: carbon_intensity_categories_tbl with {carbon_categories_rows} records"
 )
 
 
@@ -0,0 +1,98 @@
+# extensions.py
+
+"""
+Offline bootstrap and lazy loading of DuckDB extensions.
+
+Extension binaries are installed once into a local directory with
+`python main.py --bootstrap-extensions`. Normal builds point DuckDB at that
+directory, never install anything, and only LOAD an extension when the first
+step that needs it runs, so a partial build that touches no spreadsheets or
+spatial data starts without loading them at all.
+"""
+
+import threading
+
+import duckdb
+
+EXTENSION_DIR = "data/.extensions"
+
+# Extensions used by the ETL and the repository each one is installed from
+# (None for the core repository)
+EXTENSION_REPOSITORIES = {
+    "excel": None,
+    "spatial": None,
+    "rusty_sheet": "community",
+}
+
+_load_lock = threading.Lock()
+
+
+def configure_extensions(
+    con: duckdb.DuckDBPyConnection, extension_dir: str = EXTENSION_DIR
+) -> None:
+    """
+    Points a connection at the local extension directory and turns off
+    automatic installation, so a build never reaches out to the network.
+
+    Args:
+        con: An active DuckDB connection object.
+        extension_dir: The directory holding pre-installed extensions.
+    """
+    con.sql(f"SET extension_directory = '{extension_dir}';")
+    con.sql("SET autoinstall_known_extensions = false;")
+
+
+def bootstrap_extensions(
+    con: duckdb.DuckDBPyConnection, extension_dir: str = EXTENSION_DIR
+) -> None:
+    """
+    Installs every extension the ETL uses into the local extension directory.
+    This is the only step that needs network access.
+
+    Args:
+        con: An active DuckDB connection object.
+        extension_dir: The directory to install extensions into.
+    """
+    configure_extensions(con, extension_dir)
+    for name, repository in EXTENSION_REPOSITORIES.items():
+        source = f" FROM {repository}" if repository else ""
+        con.sql(f"FORCE INSTALL {name}{source};")
+        print(f"  - Installed extension: {name}")
+    print(f"✅ Extensions staged in '{extension_dir}'.")
+
+
+def ensure_loaded(con: duckdb.DuckDBPyConnection, names: list[str]) -> None:
+    """
+    Loads the given extensions into the database if they are not loaded yet.
+
+    Loaded extensions are shared by every cursor of a database, so each one
+    is only loaded by the first step that asks for it.
+
+    Args:
+        con: An active DuckDB connection object or cursor.
+        names: The extensions the caller is about to use.
+
+    Raises:
+        RuntimeError: If an extension has not been bootstrapped.
+    """
+    if not names:
+        return
+
+    with _load_lock:
+        loaded = {
+            row[0]
+            for row in con.execute(
+                "SELECT extension_name FROM duckdb_extensions() WHERE loaded"
+            ).fetchall()
+        }
+        for name in names:
+            if name in loaded:
+                continue
+            try:
+                con.sql(f"LOAD {name};")
+            except duckdb.IOException as e:
+                raise RuntimeError(
+                    f"Extension '{name}' is not installed locally. "
+                    "Run `python main.py --bootstrap-extensions` first."
+                ) from e
+            print(f"  - Loaded extension: {name}")
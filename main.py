@@ -1,22 +1,62 @@
 # main.py
 
+import argparse
+import inspect
 import os
+import shutil
 import sys
+from datetime import timedelta
 
 import duckdb
 
+import utils
+from extensions import (
+    EXTENSION_DIR,
+    bootstrap_extensions,
+    configure_extensions,
+    ensure_loaded,
+)
+from manifest import (
+    ensure_manifest_table,
+    existing_relations,
+    fingerprint_file,
+    load_manifest,
+    record_step,
+    stale_steps,
+    step_fingerprint,
+)
+from profiling import (
+    PROFILE_DIR,
+    print_hot_operators,
+    print_profile_diff,
+    profile_steps,
+)
 from queries import MACRO_DEFINITIONS, TABLE_CREATION_QUERIES
+from renewables import RENEWABLES_PATH, concat_renewable_sheets
+from scheduler import DEFAULT_WORKERS, run_steps
+from spatial_cache import DEFAULT_TTL, fetch_spatial
+from staging import sql_literal, staged_source
+from telemetry import (
+    BASELINE_FILE,
+    DEFAULT_TOLERANCE,
+    RunLog,
+    load_baseline,
+    print_comparison,
+)
 from utils import (
     check_source_data,
     concat_electricity_sheets,
     concat_energy_sheets,
-    concat_renewable_sheets,
 )
 
 # --- Configuration ---
 DB_FILE = "data/regional_energy.duckdb"
+BUILD_FILE = f"{DB_FILE}.building"  # Scratch copy the build runs against
 VEHICLE_DATA_TIME_PERIOD = "_2025_q1"  # Current time period for vehicle data
 
+# Values formatted into TABLE_CREATION_QUERIES entries that declare "params"
+QUERY_PARAMETERS = {"time_period": VEHICLE_DATA_TIME_PERIOD}
+
 REQUIRED_FILES = [
     "data/repd-q2-jul-2025.csv",
     "data/electric-vehicle-public-charging-infrastructure-statistics-april-2025.ods",
@@ -27,42 +67,276 @@ REQUIRED_FILES = [
     "data/Subnational_total_final_energy_consumption_2005_2023.xlsx",
     "data/Sub-regional_fuel_poverty_statistics_2023.xlsx",
     "data/LSOA11_UTLA21_EW_LU.xlsx",
-    "data/all_renewables_tbl.csv",
+    "data/all_renewables_tbl.parquet",
     "data/regional_carbon_intensity.csv",
     "data/carbon_intensity_categories.csv",
     "data/tra8901-miles-by-local-authority.xlsx",
     "data/Renewable_electricity_by_local_authority_2014_-_2024.xlsx",
 ]
 
+# Tables assembled from families of workbook sheets by the utils.concat_* helpers
+SHEET_FAMILY_TABLES = [
+    {
+        "name": "electricity_la_tbl",
+        "builder": concat_electricity_sheets,
+        "path": "data/Subnational_electricity_consumption_statistics_2005-2023.xlsx",
+        "params": {"yrs": list(range(2012, 2024))},
+    },
+    {
+        "name": "energy_la_long_tbl",
+        "builder": concat_energy_sheets,
+        "path": "data/Subnational_total_final_energy_consumption_2005_2023.xlsx",
+        "params": {"yrs": list(range(2005, 2024))},
+    },
+    {
+        "name": "renewable_la_long_tbl",
+        "builder": concat_renewable_sheets,
+        "path": RENEWABLES_PATH,
+        "params": {
+            "yrs": list(range(2014, 2025)),
+            "types": ["Generation", "Capacity", "Sites"],
+        },
+    },
+]
+
+
+def builder_source(builder) -> str:
+    """
+    Returns the source a sheet-family builder depends on: its whole defining
+    module, where the per-sheet SQL lives next to the builder, and the utils
+    module holding the shared sheet engine.
+    """
+    modules = dict.fromkeys([inspect.getmodule(builder), utils])
+    return "\n".join(inspect.getsource(module) for module in modules)
+
+
+def build_steps() -> list[dict]:
+    """
+    Collects every table and view built by the ETL as a list of steps in
+    build order: the sheet-family tables first, then TABLE_CREATION_QUERIES.
+
+    Returns:
+        A list of step dictionaries with the keys 'name', 'kind', 'sql',
+        'params', 'sheets', 'remote', 'extensions', 'inputs', 'depends_on'
+        and, for sheet families, 'builder' and 'path'. For sheet families
+        'sql' holds the source of the builder's module and of the utils
+        sheet engine (see `builder_source`), so that edits to the reshaping
+        SQL also trigger a rebuild. For queries it holds the SQL template,
+        which is only rendered with its params, staged sheets and cached
+        remote paths when the step runs.
+    """
+    steps = [
+        {
+            "name": table["name"],
+            "kind": "sheet_family",
+            "builder": table["builder"],
+            "path": table["path"],
+            "sql": builder_source(table["builder"]),
+            "params": table["params"],
+            "sheets": {},
+            "remote": {},
+            "extensions": [],
+            "inputs": [table["path"]],
+            "depends_on": [],
+        }
+        for table in SHEET_FAMILY_TABLES
+    ]
+
+    for query_info in TABLE_CREATION_QUERIES:
+        params = {p: QUERY_PARAMETERS[p] for p in query_info.get("params", [])}
+        steps.append(
+            {
+                "name": query_info["name"],
+                "kind": "query",
+                "sql": query_info["sql"],
+                "params": params,
+                "sheets": query_info.get("sheets", {}),
+                "remote": query_info.get("remote", {}),
+                "extensions": query_info.get("extensions", []),
+                "inputs": query_info.get("inputs", []),
+                "depends_on": query_info.get("depends_on", []),
+            }
+        )
+
+    return steps
+
+
+def run_step(con: duckdb.DuckDBPyConnection, step: dict) -> int | None:
+    """
+    Builds a single table or view described by `build_steps`.
+
+    Returns:
+        The number of rows written, as reported by the CREATE statement
+        itself, or None for views.
+    """
+    if step["kind"] == "sheet_family":
+        relation = step["builder"](path=step["path"], con=con, **step["params"])
+        # A stale table from the previous run is replaced, not appended to
+        rows = con.execute(
+            f"CREATE OR REPLACE TABLE {step['name']} AS {relation.sql_query()}"
+        ).fetchone()[0]
+        print(f"  - Successfully created table: {step['name']} ({rows:,} rows)")
+        return rows
+    else:
+        ensure_loaded(con, step["extensions"])
+        # Spreadsheet reads are swapped for scans of their staged Parquet
+        # copies, which are only re-parsed when the workbook has changed
+        values = dict(step["params"])
+        for name, sheet in step["sheets"].items():
+            # Column projections may name parameters, e.g. the current quarter
+            columns = {
+                column.format(**step["params"]): expression.format(**step["params"])
+                for column, expression in sheet.get("columns", {}).items()
+            }
+            values[name] = staged_source(
+                con, sheet["reader"], sheet["path"], sheet["options"], columns
+            )
+        for name, path in step["remote_paths"].items():
+            values[name] = sql_literal(path)
+        result = con.execute(
+            step["sql"].format(**values) if values else step["sql"]
+        ).fetchall()
+        rows = result[0][0] if result else None
+        print(f"  - Successfully executed query for table: {step['name']}")
+        return rows
+
+
+def step_spec(step: dict) -> dict:
+    """Returns everything besides SQL and input files that shapes a step."""
+    return step["params"] | step["sheets"] | step["remote"]
+
+
+def discard_build() -> None:
+    """Removes a partially built scratch database and its write-ahead log."""
+    for path in (BUILD_FILE, f"{BUILD_FILE}.wal"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Build the regional energy DuckDB database."
+    )
+    parser.add_argument(
+        "--bootstrap-extensions",
+        action="store_true",
+        help="Install the DuckDB extensions used by the ETL into "
+        f"'{EXTENSION_DIR}' and exit. Only this step needs network access.",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignore the existing database and rebuild every table.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Maximum number of tables to build at the same time "
+        f"(default: {DEFAULT_WORKERS}).",
+    )
+    parser.add_argument(
+        "--refresh-spatial",
+        action="store_true",
+        help="Re-download remote spatial datasets even if cached copies are valid.",
+    )
+    parser.add_argument(
+        "--spatial-ttl-days",
+        type=float,
+        default=DEFAULT_TTL.days,
+        help="Days before a cached spatial dataset is re-checked "
+        f"(default: {DEFAULT_TTL.days}).",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Save a DuckDB operator profile for every rebuilt step under "
+        f"'{PROFILE_DIR}/<run_id>/' and report the slowest operators.",
+    )
+    parser.add_argument(
+        "--diff-profiles",
+        nargs=2,
+        metavar=("RUN_A", "RUN_B"),
+        help="Compare the saved profiles of two runs operator by operator and exit.",
+    )
+    parser.add_argument(
+        "--compare-baseline",
+        action="store_true",
+        help="Rebuild every table one at a time and fail if any step's wall "
+        "time or peak memory regresses past --tolerance compared to --baseline.",
+    )
+    parser.add_argument(
+        "--write-baseline",
+        action="store_true",
+        help="Rebuild every table one at a time and save its step timings as "
+        "--baseline.",
+    )
+    parser.add_argument(
+        "--baseline",
+        default=BASELINE_FILE,
+        help=f"Performance baseline file (default: {BASELINE_FILE}).",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="Allowed fractional increase over the baseline before a step "
+        f"counts as a regression (default: {DEFAULT_TOLERANCE}).",
+    )
+    return parser.parse_args()
+
 
 # --- Main Execution ---
 def main():
     """Main function to run the ETL process."""
+    args = parse_args()
+
+    if args.bootstrap_extensions:
+        bootstrap_extensions(duckdb.connect())
+        return
+
+    if args.diff_profiles:
+        print_profile_diff(*args.diff_profiles)
+        return
+
+    # Baseline runs must time every step, not just the stale ones, and run
+    # them one at a time so that a step's timings do not depend on which
+    # others happened to overlap with it
+    if args.compare_baseline or args.write_baseline:
+        args.full = True
+        args.workers = 1
+    if args.compare_baseline:
+        if not os.path.exists(args.baseline):
+            sys.exit(
+                f"No performance baseline at '{args.baseline}'. "
+                "Create one with --write-baseline."
+            )
+        try:
+            load_baseline(args.baseline, args.workers)
+        except ValueError as e:
+            sys.exit(str(e))
+
     # 1. Check for source data before doing anything else
     if not check_source_data(REQUIRED_FILES):
         sys.exit("ETL process aborted due to missing files.")
 
-    # Clean up previous database file if it exists
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
-        print(f"🧹 Removed old database file: {DB_FILE}")
+    # Steps run in parallel and commit individually, so all work happens in
+    # a scratch copy of the database which only replaces DB_FILE once every
+    # step has succeeded. A full rebuild starts the scratch copy empty.
+    discard_build()
+    if not args.full and os.path.exists(DB_FILE):
+        shutil.copyfile(DB_FILE, BUILD_FILE)
+        print(f"📋 Copied existing database to scratch file: {BUILD_FILE}")
 
     con = None  # Initialize connection to None
     try:
-        # 2. Connect to DuckDB and start a transaction
-        con = duckdb.connect(DB_FILE)
-        print(f"✅ Successfully connected to DuckDB at '{DB_FILE}'")
-
-        # All subsequent operations are part of a single transaction
-        print("\n▶️  Starting transaction to create all tables...")
-        con.begin()
+        # 2. Connect to the scratch database
+        con = duckdb.connect(BUILD_FILE)
+        print(f"✅ Successfully connected to DuckDB at '{BUILD_FILE}'")
 
-        # Install and load required extensions
-        con.sql("INSTALL rusty_sheet FROM community;")
-        con.sql("LOAD HTTPFS;")
-        con.sql("LOAD SPATIAL;")
-        con.sql("LOAD rusty_sheet;")
-        print("✅ Installed and loaded HTTPFS, SPATIAL, and rusty_sheet extensions.")
+        # Extensions come from the local directory staged by
+        # --bootstrap-extensions and are loaded by the first step needing them
+        configure_extensions(con)
 
         # Create macros
         for macro_info in MACRO_DEFINITIONS:
@@ -70,77 +344,149 @@ def main():
             con.sql(macro_info["sql"])
             print(f"  - Successfully created macro: {macro_name}")
 
-        # 3. Handle special table creations
-        # Subnational electricity consumption
-        elec_yrs = list(range(2012, 2024))
-        elec_path = "data/Subnational_electricity_consumption_statistics_2005-2023.xlsx"
-        electricity_la_relation = concat_electricity_sheets(elec_yrs, elec_path, con)
-        electricity_la_relation.create("electricity_la_tbl")
-        print("  - Successfully created table: electricity_la_tbl")
-
-        # Subnational total final energy consumption
-        energy_yrs = list(range(2005, 2024))
-        energy_path = "data/Subnational_total_final_energy_consumption_2005_2023.xlsx"
-        energy_la_relation = concat_energy_sheets(energy_yrs, energy_path, con)
-        energy_la_relation.create("energy_la_long_tbl")
-        print("  - Successfully created table: energy_la_long_tbl")
-
-        # Renewable electricity by local authority
-        renewable_yrs = list(range(2014, 2025))
-        renewable_types = ["Generation", "Capacity", "Sites"]
-        renewable_path = (
-            "data/Renewable_electricity_by_local_authority_2014_-_2024.xlsx"
-        )
-        renewable_la_relation = concat_renewable_sheets(
-            renewable_yrs, renewable_types, renewable_path, con
-        )
-        renewable_la_relation.create("renewable_la_long_tbl")
-        print("  - Successfully created table: renewable_la_long_tbl")
-
-        # 4. Run the standard table creation queries including
-        #  the view creation which relies on special tables above
-        vehicle_table_names = {
-            "veh0135_latest_tbl",
-            "veh0145_latest_tbl",
-            "veh0125_latest_tbl",
+        # 3. Fingerprint every step and compare against the stored manifest
+        ensure_manifest_table(con)
+        manifest = load_manifest(con)
+        previous_inputs = {
+            i["path"]: i for entry in manifest.values() for i in entry["inputs"]
         }
-        for query_info in TABLE_CREATION_QUERIES:
-            table_name = query_info["name"]
-            sql_query = query_info["sql"]
+        steps = build_steps()
 
-            # Handle parameterized vehicle queries
-            if table_name in vehicle_table_names:
-                sql_query = sql_query.format(time_period=VEHICLE_DATA_TIME_PERIOD)
+        # Remote spatial sources are read from local cached copies, which
+        # also count as the step's inputs when deciding what to rebuild
+        for step in steps:
+            step["remote_paths"] = {
+                name: fetch_spatial(
+                    con,
+                    name,
+                    url,
+                    ttl=timedelta(days=args.spatial_ttl_days),
+                    refresh=args.refresh_spatial,
+                )
+                for name, url in step["remote"].items()
+            }
+            step["inputs"] = step["inputs"] + list(step["remote_paths"].values())
 
-            con.sql(sql_query)
-            print(f"  - Successfully executed query for table: {table_name}")
+        input_fingerprints = {
+            path: fingerprint_file(path, previous_inputs.get(path))
+            for path in {p for step in steps for p in step["inputs"]}
+        }
+        for step in steps:
+            step["input_fingerprints"] = [input_fingerprints[p] for p in step["inputs"]]
+            step["fingerprint"] = step_fingerprint(
+                step["sql"], step_spec(step), step["input_fingerprints"]
+            )
+
+        stale = stale_steps(
+            {step["name"]: step["fingerprint"] for step in steps},
+            {step["name"]: step["depends_on"] for step in steps},
+            manifest,
+            existing_relations(con),
+        )
+        print(f"🔎 {len(stale)} of {len(steps)} tables need rebuilding.")
+        for step in steps:
+            if step["name"] not in stale:
+                print(f"  - Unchanged, skipping: {step['name']}")
 
-        # 5. Commit the transaction if all steps succeed
+        if not stale:
+            con.close()
+            con = None
+            discard_build()
+            print(f"\n✅ '{DB_FILE}' is already up to date. Nothing to rebuild.")
+            return
+
+        # 4. Rebuild stale steps, running independent ones concurrently and
+        #  holding back views until the tables they rely on are built
+        stale_list = [step for step in steps if step["name"] in stale]
+        print(
+            f"\n▶️  Building {len(stale_list)} tables with up to "
+            f"{args.workers} workers..."
+        )
+        run_log = RunLog(con)
+        step_runner = run_step
+        if args.profile:
+            profile_dir = f"{PROFILE_DIR}/{run_log.run_id}"
+            step_runner = profile_steps(run_step, profile_dir)
+        run_log.start()
+        try:
+            run_steps(
+                con, stale_list, run_log.measure(step_runner), max_workers=args.workers
+            )
+        finally:
+            run_log.stop()
+        run_log.measure_table_sizes(con)
+
+        # 5. Record the rebuilt steps in the manifest and their telemetry in
+        #  the run log in one transaction
+        con.begin()
+        for step in stale_list:
+            record_step(
+                con,
+                step["name"],
+                step["fingerprint"],
+                step["sql"],
+                step_spec(step),
+                step["input_fingerprints"],
+            )
+        run_log.write(con)
         con.commit()
-        print("\n✅ Transaction committed successfully! All tables are created.")
+
+        print(f"\n⏱️  Step telemetry for run {run_log.run_id}:")
+        run_log.summary(con).show()
+        if args.profile:
+            print_hot_operators(profile_dir)
 
         # Final verification
         print("\nFinal list of tables in the database:")
         con.sql("SHOW TABLES;").show()
 
+        # 6. Publish the scratch database now that every step has succeeded
+        con.close()
+        con = None
+        os.replace(BUILD_FILE, DB_FILE)
+        print(
+            f"\n✅ Build published successfully to '{DB_FILE}'! All tables are created."
+        )
+
+        # 7. Save or check the performance baseline
+        if args.write_baseline:
+            run_log.write_baseline(args.workers, args.baseline)
+            print(f"📏 Performance baseline saved to '{args.baseline}'.")
+        if args.compare_baseline:
+            comparison = run_log.compare_to_baseline(
+                args.workers, args.baseline, args.tolerance
+            )
+            print_comparison(comparison, args.tolerance)
+            regressed = {row["step"] for row in comparison if row["regressed"]}
+            if regressed:
+                sys.exit(
+                    f"Performance regression in {len(regressed)} steps: "
+                    + ", ".join(sorted(regressed))
+                )
+            print("✅ No step regressed past the baseline tolerance.")
+
     except duckdb.Error as e:
         print(f"\n❌ DATABASE ERROR: {e}")
         if con:
-            print("▶️  Rolling back transaction...")
-            con.rollback()
-            print("🛑 Transaction has been rolled back. No changes were saved.")
+            con.close()
+            con = None
+        print("▶️  Discarding scratch database...")
+        discard_build()
+        print(f"🛑 Build discarded. '{DB_FILE}' was not changed.")
         sys.exit("ETL process failed.")
 
     except Exception as e:
         print(f"\n❌ AN UNEXPECTED ERROR OCCURRED: {e}")
         if con:
-            print("▶️  Rolling back transaction due to unexpected error...")
-            con.rollback()
-            print("🛑 Transaction has been rolled back.")
+            con.close()
+            con = None
+        print("▶️  Discarding scratch database due to unexpected error...")
+        discard_build()
+        print(f"🛑 Build discarded. '{DB_FILE}' was not changed.")
         sys.exit("ETL process failed.")
 
     finally:
-        # 6. Close the database connection
+        # 8. Close the database connection
         if con:
             con.close()
             print("\n🛑 Database connection closed.")
@@ -0,0 +1,211 @@
+# manifest.py
+
+"""
+Source-file manifest used to rebuild only the parts of the regional energy
+database whose inputs have changed since the previous run.
+
+Each build step (a table or view) is fingerprinted from its input files
+(size, mtime and content hash), its SQL text and any parameters used to
+render it. Fingerprints are stored in the `etl_manifest` table inside the
+database itself, so they are committed or rolled back together with the
+tables they describe.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import duckdb
+
+MANIFEST_TABLE = "etl_manifest"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """
+    Computes the SHA-256 content hash of a file, reading it in chunks.
+
+    Args:
+        path: The file path to hash.
+
+    Returns:
+        The hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint_file(path: str, previous: dict | None = None) -> dict:
+    """
+    Records the size, mtime and content hash of a single input file.
+
+    Hashing large workbooks is not free, so the hash recorded on a previous
+    run is reused when the file's size and mtime are unchanged.
+
+    Args:
+        path: The file path to fingerprint.
+        previous: The fingerprint recorded for this path on the last run,
+                  if any.
+
+    Returns:
+        A dictionary with the keys 'path', 'size', 'mtime' and 'sha256'.
+    """
+    stat = os.stat(path)
+    if (
+        previous
+        and previous.get("size") == stat.st_size
+        and previous.get("mtime") == stat.st_mtime
+    ):
+        sha256 = previous["sha256"]
+    else:
+        sha256 = hash_file(path)
+    return {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": sha256,
+    }
+
+
+def step_fingerprint(sql: str, params: dict, inputs: list[dict]) -> str:
+    """
+    Combines a step's SQL text, parameters and input hashes into one digest.
+
+    Args:
+        sql: The rendered SQL text (or a description of the build for
+             steps created through the relational API).
+        params: Parameters used to render or drive the step.
+        inputs: File fingerprints as returned by `fingerprint_file`.
+
+    Returns:
+        The hex digest identifying this exact version of the step.
+    """
+    payload = json.dumps(
+        {
+            "sql": sql,
+            "params": params,
+            "inputs": {i["path"]: i["sha256"] for i in inputs},
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def ensure_manifest_table(con: duckdb.DuckDBPyConnection) -> None:
+    """Creates the manifest table if it does not already exist."""
+    con.sql(f"""
+        CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+            name VARCHAR PRIMARY KEY,
+            fingerprint VARCHAR NOT NULL,
+            sql_text VARCHAR,
+            params JSON,
+            inputs JSON,
+            built_at TIMESTAMP
+        );
+    """)
+
+
+def load_manifest(con: duckdb.DuckDBPyConnection) -> dict[str, dict]:
+    """
+    Reads the manifest recorded by the previous successful run.
+
+    Args:
+        con: An active DuckDB connection object.
+
+    Returns:
+        A dictionary keyed by step name. Each value holds the step's
+        'fingerprint' and its 'inputs' (a list of file fingerprints).
+    """
+    rows = con.execute(
+        f"SELECT name, fingerprint, inputs FROM {MANIFEST_TABLE}"  # noqa: S608
+    ).fetchall()
+    return {
+        name: {"fingerprint": fingerprint, "inputs": json.loads(inputs or "[]")}
+        for name, fingerprint, inputs in rows
+    }
+
+
+def record_step(
+    con: duckdb.DuckDBPyConnection,
+    name: str,
+    fingerprint: str,
+    sql: str,
+    params: dict,
+    inputs: list[dict],
+) -> None:
+    """
+    Upserts the manifest entry for a step that has just been (re)built.
+
+    Args:
+        con: An active DuckDB connection object.
+        name: The table or view name.
+        fingerprint: The digest returned by `step_fingerprint`.
+        sql: The SQL text that built the step.
+        params: Parameters used to render or drive the step.
+        inputs: File fingerprints as returned by `fingerprint_file`.
+    """
+    con.execute(
+        f"INSERT OR REPLACE INTO {MANIFEST_TABLE} VALUES (?, ?, ?, ?, ?, ?)",  # noqa: S608
+        [
+            name,
+            fingerprint,
+            sql,
+            json.dumps(params, default=str),
+            json.dumps(inputs),
+            datetime.now(),
+        ],
+    )
+
+
+def existing_relations(con: duckdb.DuckDBPyConnection) -> set[str]:
+    """Returns the names of all tables and views in the main schema."""
+    rows = con.execute("""
+        SELECT table_name FROM information_schema.tables
+        WHERE table_schema = 'main'
+    """).fetchall()
+    return {row[0] for row in rows}
+
+
+def stale_steps(
+    fingerprints: dict[str, str],
+    dependencies: dict[str, list[str]],
+    manifest: dict[str, dict],
+    existing: set[str],
+) -> set[str]:
+    """
+    Works out which steps must be rebuilt on this run.
+
+    A step is stale when it is missing from the database, has no manifest
+    entry, or its fingerprint has changed. Any step that depends (directly
+    or transitively) on a stale step is stale as well.
+
+    Args:
+        fingerprints: The current fingerprint of every step, keyed by name.
+        dependencies: The names each step depends on, keyed by step name.
+        manifest: The manifest loaded by `load_manifest`.
+        existing: Table and view names present in the database.
+
+    Returns:
+        The set of step names to rebuild.
+    """
+    stale = {
+        name
+        for name, fingerprint in fingerprints.items()
+        if name not in existing
+        or manifest.get(name, {}).get("fingerprint") != fingerprint
+    }
+
+    changed = True
+    while changed:
+        changed = False
+        for name, deps in dependencies.items():
+            if name not in stale and stale.intersection(deps):
+                stale.add(name)
+                changed = True
+
+    return stale
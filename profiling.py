@@ -0,0 +1,243 @@
+# profiling.py
+
+"""
+Opt-in operator-level query profiling for ETL runs.
+
+With `python main.py --profile` every build step runs with DuckDB's JSON
+profiler switched on, and the profile of the statement that builds the table
+is saved as `data/.profiles/<run_id>/<step>.json`. Work a step hands to
+other cursors or statements gets its own file next to it: each sheet a
+sheet-family step parses is saved as `<step>.<sheet>.json`, and each staging
+COPY as `<...>.stage-<source>.json`. The run id matches the one in
+`etl_run_log`. At the end of the run the operators that took the most
+time across all steps (sheet scans, unpivots, projections full of casts and
+regexes, ...) are listed, and `python main.py --diff-profiles RUN_A RUN_B`
+compares two saved runs operator by operator, so a slowdown after upgrading
+DuckDB or receiving new source files can be pinned to the operator causing
+it.
+"""
+
+import json
+import re
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import duckdb
+
+PROFILE_DIR = "data/.profiles"
+TOP_OPERATORS = 15
+
+
+def enable_profiling(con: duckdb.DuckDBPyConnection, output: str) -> None:
+    """Switches on detailed JSON profiling for a cursor, writing to `output`."""
+    con.sql("PRAGMA enable_profiling = 'json';")
+    con.sql("SET profiling_mode = 'detailed';")
+    con.execute("SET profiling_output = ?;", [output])
+
+
+def profiling_output(con: duckdb.DuckDBPyConnection) -> str | None:
+    """Returns the file a cursor writes its profiles to, or None if not profiled."""
+    enabled, output = con.sql(
+        "SELECT current_setting('enable_profiling'), "
+        "current_setting('profiling_output')"
+    ).fetchone()
+    return output if enabled and output else None
+
+
+def part_output(output: str, label: str) -> str:
+    """Returns the profile file for one part of the work profiled into `output`."""
+    path = Path(output)
+    part = re.sub(r"[^\w-]+", "_", label).strip("_")
+    return path.with_name(f"{path.stem}.{part}.json").as_posix()
+
+
+@contextmanager
+def profiled_as(con: duckdb.DuckDBPyConnection, label: str) -> Iterator[None]:
+    """
+    Saves the profiles of the statements run inside the block to their own
+    file, so that a later statement on the same cursor does not overwrite
+    them. Does nothing if the cursor is not being profiled.
+
+    Args:
+        con: The cursor the statements run on.
+        label: The name of the part, added to the cursor's profile file name.
+    """
+    output = profiling_output(con)
+    if output is None:
+        yield
+        return
+    con.execute("SET profiling_output = ?;", [part_output(output, label)])
+    try:
+        yield
+    finally:
+        con.execute("SET profiling_output = ?;", [output])
+
+
+def profile_steps(
+    run_step: Callable[[duckdb.DuckDBPyConnection, dict], int | None],
+    run_dir: str,
+) -> Callable[[duckdb.DuckDBPyConnection, dict], int | None]:
+    """
+    Wraps a step runner so that each step's build statement is profiled.
+
+    Profiling settings belong to a single cursor, so concurrently running
+    steps each write their own file. The profiler rewrites the file after
+    every statement; as the build statement is always the last one a step
+    runs, that is the profile left behind. Cursors the step opens for its
+    sheets and its staging statements follow `profiling_output` and
+    `profiled_as` into files of their own.
+
+    Args:
+        run_step: The function that builds a single step on a cursor.
+        run_dir: The directory to write this run's profiles to.
+
+    Returns:
+        A function with the same signature that also saves a profile.
+    """
+    Path(run_dir).mkdir(parents=True, exist_ok=True)
+
+    def profiled(con: duckdb.DuckDBPyConnection, step: dict) -> int | None:
+        enable_profiling(con, (Path(run_dir) / f"{step['name']}.json").as_posix())
+        try:
+            return run_step(con, step)
+        finally:
+            con.sql("PRAGMA disable_profiling;")
+
+    return profiled
+
+
+def _operator_timings(node: dict, totals: dict[str, list[float]]) -> None:
+    """Adds the time and rows of every operator in a profile tree to `totals`."""
+    name = (node.get("operator_name") or node.get("operator_type") or "").strip()
+    if name:
+        totals[name][0] += node.get("operator_timing", 0.0)
+        totals[name][1] += node.get("operator_cardinality", 0)
+    for child in node.get("children", []):
+        _operator_timings(child, totals)
+
+
+def load_profiles(run_dir: str) -> dict[str, dict]:
+    """
+    Reads every profile saved for one run.
+
+    Args:
+        run_dir: A run's profile directory, or just its run id.
+
+    Returns:
+        A dictionary mapping profile name (the step name, or e.g.
+        '<step>.<sheet>' for a sheet it parsed) to a dictionary with the
+        statement's 'latency' and 'cpu_time' in seconds and its 'operators',
+        which map operator name to [seconds, rows] summed over its plan.
+    """
+    path = Path(run_dir)
+    if not path.is_dir():
+        path = Path(PROFILE_DIR) / run_dir
+    if not path.is_dir():
+        raise FileNotFoundError(f"No saved profiles found for run '{run_dir}'.")
+
+    profiles = {}
+    for file in sorted(path.glob("*.json")):
+        profile = json.loads(file.read_text())
+        operators: dict[str, list[float]] = defaultdict(lambda: [0.0, 0])
+        for child in profile.get("children", []):
+            _operator_timings(child, operators)
+        profiles[file.stem] = {
+            "latency": profile.get("latency", 0.0),
+            "cpu_time": profile.get("cpu_time", 0.0),
+            "operators": dict(operators),
+        }
+    return profiles
+
+
+def hot_operators(profiles: dict[str, dict], top: int = TOP_OPERATORS) -> list[dict]:
+    """
+    Ranks the operators that took the most time in a run.
+
+    Args:
+        profiles: A run's profiles as returned by `load_profiles`.
+        top: The number of operators to return.
+
+    Returns:
+        A list of dictionaries with the keys 'step', 'operator', 'seconds',
+        'rows' and 'share' (of the run's total operator time), slowest first.
+    """
+    rows = [
+        {"step": step, "operator": operator, "seconds": seconds, "rows": count}
+        for step, profile in profiles.items()
+        for operator, (seconds, count) in profile["operators"].items()
+    ]
+    total = sum(row["seconds"] for row in rows) or 1.0
+    for row in rows:
+        row["share"] = row["seconds"] / total
+    return sorted(rows, key=lambda row: row["seconds"], reverse=True)[:top]
+
+
+def diff_profiles(
+    before: dict[str, dict], after: dict[str, dict], top: int = TOP_OPERATORS
+) -> list[dict]:
+    """
+    Compares two runs operator by operator.
+
+    Operators are matched by step and operator name. An operator that only
+    appears in one run is compared against zero.
+
+    Args:
+        before: The baseline run's profiles as returned by `load_profiles`.
+        after: The run being compared, as returned by `load_profiles`.
+        top: The number of operators to return.
+
+    Returns:
+        A list of dictionaries with the keys 'step', 'operator', 'before',
+        'after' and 'change' (all in seconds), largest absolute change first.
+    """
+    rows = []
+    for step in sorted(before.keys() | after.keys()):
+        old = before.get(step, {}).get("operators", {})
+        new = after.get(step, {}).get("operators", {})
+        for operator in old.keys() | new.keys():
+            old_seconds = old.get(operator, [0.0, 0])[0]
+            new_seconds = new.get(operator, [0.0, 0])[0]
+            rows.append(
+                {
+                    "step": step,
+                    "operator": operator,
+                    "before": old_seconds,
+                    "after": new_seconds,
+                    "change": new_seconds - old_seconds,
+                }
+            )
+    return sorted(rows, key=lambda row: abs(row["change"]), reverse=True)[:top]
+
+
+def print_hot_operators(run_dir: str, top: int = TOP_OPERATORS) -> None:
+    """Prints the slowest operators of a profiled run."""
+    profiles = load_profiles(run_dir)
+    print(f"\n🔥 Hottest operators across {len(profiles)} profiled steps:")
+    for row in hot_operators(profiles, top):
+        print(
+            f"  - {row['seconds']:8.3f}s {row['share']:6.1%}  "
+            f"{row['operator']:<20} {row['rows']:>12,} rows  {row['step']}"
+        )
+    print(f"  Profiles saved in '{run_dir}'.")
+
+
+def print_profile_diff(run_a: str, run_b: str, top: int = TOP_OPERATORS) -> None:
+    """Prints the operators whose time changed most between two runs."""
+    before, after = load_profiles(run_a), load_profiles(run_b)
+    print(f"\n🔬 Profile changes from {run_a} to {run_b}:")
+    print("  Steps whose build time changed by more than 10%:")
+    for step in sorted(before.keys() & after.keys()):
+        change = after[step]["latency"] - before[step]["latency"]
+        if before[step]["latency"] and abs(change) / before[step]["latency"] > 0.1:
+            print(
+                f"  - {step}: {before[step]['latency']:.3f}s -> "
+                f"{after[step]['latency']:.3f}s"
+            )
+    print("\n  Largest operator changes:")
+    for row in diff_profiles(before, after, top):
+        print(
+            f"  - {row['change']:+8.3f}s ({row['before']:.3f}s -> "
+            f"{row['after']:.3f}s)  {row['operator']:<20} {row['step']}"
+        )
@@ -16,9 +16,53 @@ MACRO_DEFINITIONS = [
     },
 ]
 
+
+def vehicle_csv_read(path: str, categories: list[str]) -> dict:
+    """
+    Describes a staged read of a DfT vehicle licensing CSV holding only the
+    LSOA columns, the given category columns and the current quarter as an
+    integer, with suppressed counts such as '[c]' as NULL. Any other value that
+    is not an integer fails the read. The quarter column is named after the
+    time_period parameter, so steps using this read must list it in their
+    params.
+    """
+    columns = {name: name for name in ["lsoa11cd", "lsoa11nm", *categories]}
+    columns["{time_period}"] = (
+        'CASE WHEN "{time_period}"[1] = \'[\' THEN NULL '
+        'ELSE CAST("{time_period}" AS INTEGER) END'
+    )
+    return {
+        "reader": "read_csv",
+        "path": path,
+        "options": {"normalize_names": True, "strict_mode": False, "all_varchar": True},
+        "columns": columns,
+    }
+
+
+# Each vehicle CSV is scanned once per file version; every table reading it
+# shares the staged copy
+VEH0125_READ = vehicle_csv_read(
+    "data/df_VEH0125.csv", ["bodytype", "keepership", "licencestatus"]
+)
+VEH0135_READ = vehicle_csv_read("data/df_VEH0135.csv", ["fuel"])
+VEH0145_READ = vehicle_csv_read("data/df_VEH0145.csv", ["fuel"])
+
+# Each entry may also declare:
+#   inputs     - source files whose changes trigger a rebuild (see manifest.py)
+#   depends_on - tables or views that must be built before this entry
+#   params     - names of QUERY_PARAMETERS in main.py to format into the SQL
+#   sheets     - spreadsheet or CSV reads (reader, path, options and an
+#                optional column projection) formatted into the SQL as scans
+#                of their staged Parquet copies (see staging.py)
+#   remote     - remote spatial datasets formatted into the SQL as the paths
+#                of their locally cached copies (see spatial_cache.py)
+#   extensions - DuckDB extensions loaded before the SQL runs (see
+#                extensions.py); spreadsheet readers are loaded by staging.py
 TABLE_CREATION_QUERIES = [
     {
         "name": "repd_tbl",
+        "inputs": ["data/repd-q2-jul-2025.csv"],
+        "extensions": ["spatial"],
         "sql": """
             CREATE OR REPLACE TABLE repd_tbl AS
             SELECT *,
@@ -29,12 +73,26 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "ev_chargepoints_all_speeds_uk_la_tbl",
+        "inputs": [
+            "data/electric-vehicle-public-charging-infrastructure-statistics-april-2025.ods",
+        ],
+        "sheets": {
+            "chargepoints_1a": {
+                "reader": "read_sheet",
+                "path": "data/electric-vehicle-public-charging-infrastructure-statistics-april-2025.ods",
+                "options": {
+                    "sheet": "1a",
+                    "range": "A3:Y436",
+                    "analyze_rows": 400,
+                    "error_as_null": True,
+                },
+            },
+        },
         "sql": """
             CREATE OR REPLACE TABLE ev_chargepoints_all_speeds_uk_la_tbl AS
             WITH up_chargepoints_raw AS
             (UNPIVOT
-            (FROM read_sheet('data/electric-vehicle-public-charging-infrastructure-statistics-april-2025.ods',
-            sheet='1a', range = 'A3:Y436', analyze_rows = 400, error_as_null = true))
+            (FROM {chargepoints_1a})
             ON COLUMNS(* EXCLUDE ("Local authority / region code", "Local authority / region name"))
             INTO
             name q_y
@@ -49,13 +107,27 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "ev_chargepoints_all_speeds_uk_la_per_cap_tbl",
+        "inputs": [
+            "data/electric-vehicle-public-charging-infrastructure-statistics-april-2025.ods",
+        ],
+        "sheets": {
+            "chargepoints_2a": {
+                "reader": "read_sheet",
+                "path": "data/electric-vehicle-public-charging-infrastructure-statistics-april-2025.ods",
+                "options": {
+                    "sheet": "2a",
+                    "range": "A3:Y436",
+                    "analyze_rows": 400,
+                    "error_as_null": True,
+                },
+            },
+        },
         "sql": """
             CREATE OR REPLACE TABLE ev_chargepoints_all_speeds_uk_la_per_cap_tbl AS
             WITH up_chargepoints_raw AS
             (UNPIVOT
-            (FROM read_sheet('data/electric-vehicle-public-charging-infrastructure-statistics-april-2025.ods',
-            sheet='2a', range = 'A3:Y436', analyze_rows = 400, error_as_null = true))
-            ON COLUMNS('^[A-Z][a-z]{2}-[2-9]{2}.*')
+            (FROM {chargepoints_2a})
+            ON COLUMNS('^[A-Z][a-z]{{2}}-[2-9]{{2}}.*')
             INTO
             name q_y
             VALUE cp_100k)
@@ -70,55 +142,89 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "sw_la_tbl",
+        "inputs": [],
+        "extensions": ["spatial"],
+        "remote": {
+            "sw_la_boundaries": "https://opendata.westofengland-ca.gov.uk/api/explore/v2.1/catalog/datasets/local-authorities-districts-south-west-england/exports/geojson?lang=en&timezone=Europe%2FLondon",
+        },
         "sql": """
             CREATE OR REPLACE TABLE sw_la_tbl AS
-            FROM ST_Read('https://opendata.westofengland-ca.gov.uk/api/explore/v2.1/catalog/datasets/local-authorities-districts-south-west-england/exports/geojson?lang=en&timezone=Europe%2FLondon');
+            FROM ST_Read({sw_la_boundaries});
         """,
     },
     {
         "name": "ev_reg_lsoa11_all_tbl",
+        "inputs": ["data/df_VEH0135.csv"],
+        "params": ["time_period"],
+        "sheets": {"veh0135": VEH0135_READ},
         "sql": """
             CREATE OR REPLACE TABLE ev_reg_lsoa11_all_tbl AS
-            SELECT lsoa11cd, lsoa11nm, fuel, _2025_q1 AS _count
-            FROM read_csv('data/df_VEH0135.csv', normalize_names=true, ignore_errors=true)
-            WHERE _count != '[c]' AND (fuel = 'Battery electric' OR fuel LIKE 'Plug%');
+            SELECT lsoa11cd, lsoa11nm, fuel, "{time_period}" AS _count
+            FROM {veh0135}
+            WHERE _count IS NOT NULL
+            AND (fuel = 'Battery electric' OR fuel LIKE 'Plug%');
         """,
     },
     {
         "name": "fuel_poverty_2023_lsoa21_tbl",
+        "inputs": ["data/Sub-regional_fuel_poverty_statistics_2023.xlsx"],
+        "sheets": {
+            "fuel_poverty_table_4": {
+                "reader": "read_xlsx",
+                "path": "data/Sub-regional_fuel_poverty_statistics_2023.xlsx",
+                "options": {
+                    "range": "A3:H33758",
+                    "sheet": "Table 4",
+                    "normalize_names": True,
+                },
+            },
+        },
         "sql": """
             CREATE OR REPLACE TABLE fuel_poverty_2023_lsoa21_tbl AS
-            SELECT * FROM read_xlsx('data/Sub-regional_fuel_poverty_statistics_2023.xlsx',
-                            range = 'A3:H33758',
-                            sheet='Table 4',
-                            normalize_names=true);
+            SELECT * FROM {fuel_poverty_table_4};
         """,
     },
     {
         "name": "lsoa11_la_lookup_tbls",
+        "inputs": ["data/LSOA11_UTLA21_EW_LU.xlsx"],
+        "sheets": {
+            "lsoa11_utla21_lookup": {
+                "reader": "read_xlsx",
+                "path": "data/LSOA11_UTLA21_EW_LU.xlsx",
+                "options": {"normalize_names": True},
+            },
+        },
         "sql": """
             CREATE OR REPLACE TABLE lsoa11_la_lookup_tbls AS
             SELECT lsoa11cd, lsoa11nm, ctyua21cd AS lad_code, ctyua21nm AS lad_name
-            FROM read_xlsx('data/LSOA11_UTLA21_EW_LU.xlsx', normalize_names=true);
+            FROM {lsoa11_utla21_lookup};
         """,
     },
     # Note: External DB attachment is handled as a separate step in the main script
     {
         "name": "lep_boundary_tbl",
+        "inputs": [],
+        "extensions": ["spatial"],
+        "remote": {
+            "lep_boundary": "https://opendata.westofengland-ca.gov.uk/api/explore/v2.1/catalog/datasets/lep-boundary/exports/fgb?lang=en&timezone=Europe%2FLondon",
+        },
         "sql": """
             CREATE OR REPLACE TABLE lep_boundary_tbl AS
-            FROM ST_Read('https://opendata.westofengland-ca.gov.uk/api/explore/v2.1/catalog/datasets/lep-boundary/exports/fgb?lang=en&timezone=Europe%2FLondon');
+            FROM ST_Read({lep_boundary});
         """,
     },
     {
         "name": "uk_renewables_tbl",
+        # Written by regional-renewable-etl.py, the file's only producer
+        "inputs": ["data/all_renewables_tbl.parquet"],
         "sql": """
             CREATE OR REPLACE TABLE uk_renewables_tbl AS
-            FROM read_csv('data/all_renewables_tbl.csv');
+            FROM read_parquet('data/all_renewables_tbl.parquet');
         """,
     },
     {
         "name": "regional_carbon_intensity_tbl",
+        "inputs": ["data/regional_carbon_intensity.csv"],
         "sql": """
             CREATE OR REPLACE TABLE regional_carbon_intensity_tbl AS
             SELECT * FROM read_csv('data/regional_carbon_intensity.csv', normalize_names = true);
@@ -126,6 +232,7 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "carbon_intensity_categories_tbl",
+        "inputs": ["data/carbon_intensity_categories.csv"],
         "sql": """
             CREATE OR REPLACE TABLE carbon_intensity_categories_tbl AS
             SELECT * EXCLUDE(very_high_upper_limit)
@@ -134,33 +241,42 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "veh0135_latest_tbl",
+        "inputs": ["data/df_VEH0135.csv"],
+        "params": ["time_period"],
+        "sheets": {"veh0135": VEH0135_READ},
         "sql": """
             CREATE OR REPLACE TABLE veh0135_latest_tbl AS
-            SELECT LSOA11CD, LSOA11NM, Fuel, "{time_period}"::INTEGER AS "{time_period}"
-            FROM read_csv('data/df_VEH0135.csv', strict_mode=false, normalize_names=true)
-            WHERE "{time_period}"[0:1] != '['
+            SELECT LSOA11CD, LSOA11NM, Fuel, "{time_period}"
+            FROM {veh0135}
+            WHERE "{time_period}" IS NOT NULL
             AND fuel != 'Total'
             AND LSOA11CD[0:1] = 'E';
         """,
     },
     {
         "name": "veh0145_latest_tbl",
+        "inputs": ["data/df_VEH0145.csv"],
+        "params": ["time_period"],
+        "sheets": {"veh0145": VEH0145_READ},
         "sql": """
             CREATE OR REPLACE TABLE veh0145_latest_tbl AS
-            SELECT LSOA11CD, LSOA11NM, Fuel, "{time_period}"::INTEGER AS "{time_period}" 
-            FROM read_csv('data/df_VEH0145.csv', strict_mode=false, normalize_names=true)
-            WHERE "{time_period}"[0:1] != '['
+            SELECT LSOA11CD, LSOA11NM, Fuel, "{time_period}"
+            FROM {veh0145}
+            WHERE "{time_period}" IS NOT NULL
             AND fuel != 'Total'
             AND LSOA11CD[0:1] = 'E';
         """,
     },
     {
         "name": "veh0125_latest_tbl",
+        "inputs": ["data/df_VEH0125.csv"],
+        "params": ["time_period"],
+        "sheets": {"veh0125": VEH0125_READ},
         "sql": """
             CREATE OR REPLACE TABLE veh0125_latest_tbl AS
-            SELECT LSOA11CD, LSOA11NM, BodyType, Keepership, LicenceStatus, "{time_period}"::INTEGER AS "{time_period}"
-            FROM read_csv('data/df_VEH0125.csv', strict_mode=false, normalize_names=true)
-            WHERE "{time_period}"[0:1] != '[' 
+            SELECT LSOA11CD, LSOA11NM, BodyType, Keepership, LicenceStatus, "{time_period}"
+            FROM {veh0125}
+            WHERE "{time_period}" IS NOT NULL
             AND bodytype != 'Total'
             AND keepership != 'Total'
             AND licencestatus != 'Total'
@@ -169,6 +285,20 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "vehicle_mileage_la_tbl",
+        "inputs": ["data/tra8901-miles-by-local-authority.xlsx"],
+        "sheets": {
+            "tra8901": {
+                "reader": "read_xlsx",
+                "path": "data/tra8901-miles-by-local-authority.xlsx",
+                "options": {
+                    "sheet": "TRA8901",
+                    "range": "A5:AM240",
+                    "normalize_names": True,
+                    "all_varchar": True,
+                    "header": True,
+                },
+            },
+        },
         "sql": """
             CREATE OR REPLACE TABLE vehicle_mileage_la_tbl AS
             SELECT * REPLACE(year[2:5]::INTEGER AS year,
@@ -178,13 +308,7 @@ TABLE_CREATION_QUERIES = [
             FROM
             (UNPIVOT
             (SELECT * EXCLUDE(notes, units, _)
-            FROM read_xlsx('data/tra8901-miles-by-local-authority.xlsx',
-                            sheet='TRA8901',
-                            range='A5:AM240',
-                            normalize_names=true,
-                            all_varchar=true,
-                            header=true
-                            ) 
+            FROM {tra8901}
             WHERE local_authority_or_region_code[0:2] = 'E0')
             ON COLUMNS('\\d$')
             INTO
@@ -195,6 +319,7 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "fuel_sector_lookup_tbl",
+        "inputs": ["fuel_sector.csv"],
         "sql": """CREATE OR REPLACE TABLE fuel_sector_lookup_tbl AS
                 SELECT 
                     str_to_sentence(fuel) fuel,
@@ -204,6 +329,8 @@ TABLE_CREATION_QUERIES = [
     },
     {
         "name": "energy_la_year_fuel_sector_long_vw",
+        "inputs": [],
+        "depends_on": ["energy_la_long_tbl", "fuel_sector_lookup_tbl"],
         "sql": """
             CREATE OR REPLACE VIEW energy_la_year_fuel_sector_long_vw AS
             SELECT
@@ -218,13 +345,30 @@ TABLE_CREATION_QUERIES = [
             JOIN fuel_sector_lookup_tbl fl
             USING(fuel_sector);""",
     },
-    {"name": "seabank_tbl",
-     "sql": """
-            CREATE OR REPLACE TABLE seabank_tbl AS 
-            SELECT * 
-            EXCLUDE (dataset, psrtype, nationalgridbmunitid, settlementdate)
-            RENAME (quantity AS generation_mwh)
-            FROM read_csv('data/seabank_generation_2024.csv', normalize_names=true);
+    {
+        "name": "seabank_tbl",
+        # Parquet dataset written by seabank-generation.py; its manifest changes
+        # whenever the dataset does
+        "inputs": ["data/seabank_generation/_manifest.json"],
+        "sql": """
+            CREATE OR REPLACE TABLE seabank_tbl AS
+            SELECT
+                bmUnit AS bmunit,
+                settlementPeriod AS settlementperiod,
+                halfHourEndTime AS halfhourendtime,
+                quantity AS generation_mwh
+            FROM read_parquet(
+                'data/seabank_generation/*/*/*.parquet',
+                hive_partitioning = true, union_by_name = true, filename = true
+            )
+            -- A resumed download can write a period twice; keep the copy written
+            -- last, with the file name breaking ties so the choice is repeatable.
+            -- Files written before records carried writtenAt have it as NULL
+            QUALIFY row_number() OVER (
+                PARTITION BY bmUnit, settlementDate, settlementPeriod
+                ORDER BY writtenAt DESC NULLS LAST, filename DESC
+            ) = 1
+            ORDER BY settlementDate, settlementPeriod, bmUnit;
             """,
-    }
+    },
 ]
@@ -115,10 +115,10 @@ CREATE OR REPLACE TABLE lep_boundary_tbl AS
 FROM ST_Read('https://opendata.westofengland-ca.gov.uk/api/explore/v2.1/catalog/datasets/lep-boundary/exports/fgb?lang=en&timezone=Europe%2FLondon');
 
 -- get renewables data - generation, capacity sites by LA
--- pre built using the r script regional-renewables-etl.r
+-- pre built by regional-renewable-etl.py
 
 CREATE OR REPLACE TABLE uk_renewables_tbl AS
-FROM read_csv('data/all_renewables_tbl.csv');
+FROM read_parquet('data/all_renewables_tbl.parquet');
 
 FROM uk_renewables_tbl;
 
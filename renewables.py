@@ -0,0 +1,498 @@
+# renewables.py
+
+"""
+Renewable electricity by local authority, with one sheet spec, one output
+schema and two interchangeable execution backends.
+
+The DESNZ workbook has one sheet per measure and year ('LA - Generation,
+2024', 'LA - Capacity, 2024', 'LA - Sites 2024', ...), each with a title
+block above a wide table of energy sources. `renewable_sheets` lists the
+sheets to read together with their header rows, column names are cleaned by
+the shared `normalize_column_name`, and both backends turn the sheets into
+the same long table (OUTPUT_SCHEMA): one row per English local authority,
+energy source, year and measure.
+
+- "duckdb" describes each sheet as a utils.SheetSpec and reads the sheets
+  with the shared sheet engine (utils.read_sheet_family): parsed with the
+  excel extension through the staging cache and reshaped in SQL.
+- "polars" parses each sheet with fastexcel and reshapes it in one lazy
+  Polars query. `open_workbook` reads the workbook from disk once, and
+  `workbook_years` lists the complete years from its metadata.
+
+`pivot_renewables` turns the long table back into the wide
+all_renewables_tbl layout (one column per energy source) written by
+regional-renewable-etl.py. `python benchmark.py renewables` runs the
+backends head to head.
+"""
+
+import functools
+import io
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from xml.etree import ElementTree
+
+import duckdb
+import fastexcel
+import polars as pl
+
+from extensions import configure_extensions
+from utils import SheetSpec, Unpivot, read_sheet_family
+
+RENEWABLES_PATH = "data/Renewable_electricity_by_local_authority_2014_-_2024.xlsx"
+
+# Per sheet type: the separator before the year in the sheet name, the row
+# holding the column names (below the title block) and the measure's units
+RENEWABLE_TYPES = {
+    "Generation": {"separator": ", ", "header_row": 5, "units": "mwh"},
+    "Capacity": {"separator": ", ", "header_row": 4, "units": "mw"},
+    "Sites": {"separator": " ", "header_row": 4, "units": "number"},
+}
+LAST_COLUMN = "R"  # Five identifier columns and thirteen energy sources
+LAST_ROW = 500
+
+# Columns identifying a local authority; every other column is an energy source
+ID_COLUMNS = [
+    "local_authority_code",
+    "local_authority_name",
+    "estimated_number_of_households",
+    "region",
+    "country",
+]
+# The energy source columns of the wide all_renewables_tbl layout, in the
+# workbook's column order; the sheets also have a 'total' column
+ENERGY_SOURCES = [
+    "photovoltaics",
+    "onshore_wind",
+    "hydro",
+    "anaerobic_digestion",
+    "offshore_wind",
+    "wave_tidal",
+    "sewage_gas",
+    "landfill_gas",
+    "municipal_solid_waste",
+    "animal_biomass",
+    "plant_biomass",
+    "cofiring",
+]
+# The measure of each sheet type in the wide layout, e.g. 'capacity_mw'
+MEASURE_TYPE = pl.Enum(["sites_number", "capacity_mw", "generation_mwh"])
+# The columns of every sheet once `normalize_column_name` has cleaned them
+SHEET_SCHEMA = {name: pl.String for name in [*ID_COLUMNS, *ENERGY_SOURCES, "total"]}
+
+OUTPUT_SCHEMA = {
+    "local_authority_code": pl.String,
+    "local_authority_name": pl.String,
+    "estimated_number_of_households": pl.Int64,
+    "region": pl.String,
+    "country": pl.String,
+    "energy_source": pl.String,
+    "calendar_year": pl.Int32,
+    "type": pl.String,
+    "units": pl.String,
+    "value": pl.Float64,
+}
+
+# The output columns that identify a row, used to sort and compare outputs
+OUTPUT_KEY = ["type", "calendar_year", "local_authority_code", "energy_source"]
+
+BACKENDS = ["duckdb", "polars"]
+
+
+@dataclass(frozen=True)
+class RenewableSheet:
+    """
+    One measure/year sheet of the renewables workbook.
+
+    Attributes:
+        sheet: The sheet name.
+        type: The measure, one of RENEWABLE_TYPES.
+        year: The calendar year the sheet covers.
+        header_row: The one-based row holding the column names.
+    """
+
+    sheet: str
+    type: str
+    year: int
+    header_row: int
+
+    @property
+    def range(self) -> str:
+        """The cell range holding the header and data rows, e.g. 'A5:R500'."""
+        return f"A{self.header_row}:{LAST_COLUMN}{LAST_ROW}"
+
+    @property
+    def units(self) -> str:
+        """The units of the sheet's values."""
+        return RENEWABLE_TYPES[self.type]["units"]
+
+
+def renewable_sheets(yrs: list[int], types: list[str]) -> list[RenewableSheet]:
+    """
+    Lists the sheets holding the given measures and years.
+
+    Args:
+        yrs: A list of integers representing the years.
+        types: A list of strings representing the types
+               ('Generation', 'Capacity', 'Sites').
+
+    Returns:
+        One RenewableSheet per year and type, in that order.
+    """
+    sheets = []
+    for year in yrs:
+        for energy_type in types:
+            spec = RENEWABLE_TYPES[energy_type]
+            sheets.append(
+                RenewableSheet(
+                    sheet=f"LA - {energy_type}{spec['separator']}{year}",
+                    type=energy_type,
+                    year=year,
+                    header_row=spec["header_row"],
+                )
+            )
+    return sheets
+
+
+@dataclass(frozen=True)
+class RenewablesWorkbook:
+    """
+    The renewables workbook, read from disk once.
+
+    Attributes:
+        reader: The fastexcel reader that parses the sheets.
+        dimensions: The used range of each sheet (e.g. 'A1:R400'), keyed by
+                    sheet name in workbook order, or None where the
+                    workbook does not record it.
+    """
+
+    reader: fastexcel.ExcelReader
+    dimensions: dict[str, str | None]
+
+
+def open_workbook(path: str = RENEWABLES_PATH) -> RenewablesWorkbook:
+    """
+    Opens the renewables workbook, listing its sheets and their dimensions
+    from the workbook metadata without parsing any cells.
+
+    Args:
+        path: The file path to the Excel workbook.
+
+    Returns:
+        A RenewablesWorkbook to pass to `workbook_years` and
+        `read_renewables_polars`.
+    """
+    data = Path(path).read_bytes()
+    return RenewablesWorkbook(
+        reader=fastexcel.read_excel(data),
+        dimensions=sheet_dimensions(io.BytesIO(data)),
+    )
+
+
+def sheet_dimensions(source: str | io.BytesIO) -> dict[str, str | None]:
+    """
+    Reads the used range of every sheet of an XLSX workbook from the
+    <dimension> element at the top of each worksheet, stopping before the
+    cells.
+
+    Args:
+        source: The file path to, or the contents of, the workbook.
+
+    Returns:
+        The used ranges keyed by sheet name in workbook order, None for a
+        sheet without a <dimension> element.
+    """
+    main_ns = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    rel_ns = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    pkg_ns = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+    dimensions = {}
+    # The workbook is a local, trusted file
+    with zipfile.ZipFile(source) as zf:
+        workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))  # noqa: S314
+        rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))  # noqa: S314
+        targets = {
+            rel.get("Id"): rel.get("Target")
+            for rel in rels.iter(f"{pkg_ns}Relationship")
+        }
+        for sheet in workbook.iter(f"{main_ns}sheet"):
+            target = targets[sheet.get(f"{{{rel_ns}}}id")]
+            member = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+            name = sheet.get("name")
+            dimensions[name] = None
+            with zf.open(member) as f:
+                for _, element in ElementTree.iterparse(f, events=("start",)):  # noqa: S314
+                    if element.tag == f"{main_ns}dimension":
+                        dimensions[name] = element.get("ref")
+                    # The dimension, if any, precedes the cells
+                    if element.tag in (f"{main_ns}dimension", f"{main_ns}sheetData"):
+                        break
+    return dimensions
+
+
+def workbook_years(workbook: RenewablesWorkbook, types: list[str]) -> list[int]:
+    """
+    Lists the years for which the workbook has a sheet of every given type
+    with rows below its header, from the workbook metadata alone.
+
+    Args:
+        workbook: The workbook, from `open_workbook`.
+        types: A list of strings representing the types
+               ('Generation', 'Capacity', 'Sites').
+
+    Returns:
+        The years, in ascending order.
+    """
+
+    def has_rows(sheet: RenewableSheet) -> bool:
+        if sheet.sheet not in workbook.dimensions:
+            return False
+        dimension = workbook.dimensions[sheet.sheet]
+        # Without a recorded dimension the sheet has to be parsed to tell
+        if dimension is None:
+            return True
+        last_row = int(re.search(r"(\d+)$", dimension).group(1))
+        return last_row > sheet.header_row
+
+    names = workbook.dimensions
+    years = {int(m.group(1)) for name in names if (m := re.search(r"(\d{4})$", name))}
+    return sorted(
+        year
+        for year in years
+        if all(has_rows(sheet) for sheet in renewable_sheets([year], types))
+    )
+
+
+@functools.cache
+def normalize_column_name(name: str) -> str:
+    """
+    Cleans a column header into snake_case, dropping '[note N]' markers,
+    e.g. 'Municipal Solid Waste [note 3]' -> 'municipal_solid_waste'.
+    """
+    name = re.sub(r"\[note \d+\]", "", name, flags=re.IGNORECASE)
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+# --- DuckDB backend ---
+def renewable_sheet_spec(sheet: RenewableSheet) -> SheetSpec:
+    """
+    Describes one sheet for the shared sheet engine (utils.read_sheet_family):
+    column names cleaned by `normalize_column_name`, English local
+    authorities only, unpivoted to one row per energy source, with
+    suppressed values such as '[x]' kept as NULL.
+    """
+    return SheetSpec(
+        sheet=sheet.sheet,
+        range=sheet.range,
+        constants={
+            "calendar_year": sheet.year,
+            "type": sheet.type,
+            "units": sheet.units,
+        },
+        read_options={"all_varchar": True},
+        rename=normalize_column_name,
+        filter="local_authority_code LIKE 'E0%'",
+        unpivot=Unpivot(id_columns=ID_COLUMNS, name="energy_source", value="val"),
+        select="""
+            local_authority_code,
+            local_authority_name,
+            TRY_CAST(
+                TRY_CAST(estimated_number_of_households AS DOUBLE) AS BIGINT
+            ) AS estimated_number_of_households,
+            region,
+            country,
+            energy_source,
+            calendar_year::INTEGER AS calendar_year,
+            type,
+            units,
+            TRY_CAST(val AS DOUBLE) AS value
+        """,
+    )
+
+
+def concat_renewable_sheets(
+    yrs: list[int],
+    types: list[str],
+    path: str,
+    con: duckdb.DuckDBPyConnection,
+):
+    """
+    Creates a single DuckDB relation of renewable energy data from the
+    sheets of the renewables workbook, in the long OUTPUT_SCHEMA layout.
+
+    Args:
+        yrs: A list of integers representing the years.
+        types: A list of strings representing the types
+               ('Generation', 'Capacity', 'Sites').
+        path: The file path to the Excel workbook.
+        con: An active DuckDB connection object.
+
+    Returns:
+        A DuckDB relation object containing the combined renewable energy
+        data, or None if `types` is empty.
+    """
+    specs = [renewable_sheet_spec(sheet) for sheet in renewable_sheets(yrs, types)]
+    return read_sheet_family(specs, path, con)
+
+
+# --- Polars backend ---
+def _read_sheet_polars(
+    reader: fastexcel.ExcelReader, sheet: RenewableSheet
+) -> pl.LazyFrame:
+    """
+    Returns the reshaping of one sheet as a lazy query; fastexcel parses the
+    sheet only when the query runs.
+    """
+
+    def load() -> pl.DataFrame:
+        raw = reader.load_sheet(
+            sheet.sheet,
+            header_row=sheet.header_row - 1,
+            n_rows=LAST_ROW - sheet.header_row,
+            use_columns=f"A:{LAST_COLUMN}",
+            dtypes="string",
+        ).to_polars()
+        raw = raw.rename(normalize_column_name)
+        if set(raw.columns) != set(SHEET_SCHEMA):
+            raise ValueError(
+                f"Sheet '{sheet.sheet}' has columns {raw.columns}, "
+                f"expected {list(SHEET_SCHEMA)}"
+            )
+        return raw.select(list(SHEET_SCHEMA))
+
+    return (
+        pl.defer(load, schema=SHEET_SCHEMA)
+        .filter(pl.col("local_authority_code").str.starts_with("E0"))
+        .unpivot(index=ID_COLUMNS, variable_name="energy_source", value_name="val")
+        .with_columns(
+            pl.col("estimated_number_of_households")
+            .cast(pl.Float64, strict=False)
+            .round()
+            .cast(pl.Int64),
+            pl.lit(sheet.year, dtype=pl.Int32).alias("calendar_year"),
+            pl.lit(sheet.type).alias("type"),
+            pl.lit(sheet.units).alias("units"),
+            pl.col("val").cast(pl.Float64, strict=False).alias("value"),
+        )
+        .select(list(OUTPUT_SCHEMA))
+    )
+
+
+def read_renewables_polars(
+    yrs: list[int], types: list[str], workbook: RenewablesWorkbook
+) -> pl.DataFrame:
+    """
+    Reads the renewables workbook with fastexcel and Polars, producing the
+    same rows and schema as `concat_renewable_sheets`.
+
+    Each sheet is parsed once, and the reshaping of every sheet runs as one
+    lazy query collected at the end with the streaming engine.
+
+    Args:
+        yrs: A list of integers representing the years.
+        types: A list of strings representing the types
+               ('Generation', 'Capacity', 'Sites').
+        workbook: The workbook, from `open_workbook`.
+
+    Returns:
+        A Polars DataFrame with the OUTPUT_SCHEMA columns.
+    """
+    sheets = renewable_sheets(yrs, types)
+    if not sheets:
+        return pl.DataFrame(schema=OUTPUT_SCHEMA)
+
+    plans = [_read_sheet_polars(workbook.reader, sheet) for sheet in sheets]
+    return pl.concat(plans).collect(engine="streaming")
+
+
+def read_renewables(
+    yrs: list[int],
+    types: list[str],
+    path: str = RENEWABLES_PATH,
+    backend: str = "duckdb",
+) -> pl.DataFrame:
+    """
+    Reads the renewables workbook into a Polars DataFrame with either backend.
+
+    Args:
+        yrs: A list of integers representing the years.
+        types: A list of strings representing the types
+               ('Generation', 'Capacity', 'Sites').
+        path: The file path to the Excel workbook.
+        backend: One of BACKENDS.
+
+    Returns:
+        A Polars DataFrame with the OUTPUT_SCHEMA columns.
+    """
+    if backend == "polars":
+        return read_renewables_polars(yrs, types, open_workbook(path))
+    if backend != "duckdb":
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+
+    with duckdb.connect() as con:
+        configure_extensions(con)
+        relation = concat_renewable_sheets(yrs, types, path, con)
+        if relation is None:
+            return pl.DataFrame(schema=OUTPUT_SCHEMA)
+        return relation.pl().cast(OUTPUT_SCHEMA)
+
+
+def pivot_renewables(frame: pl.DataFrame) -> pl.DataFrame:
+    """
+    Pivots the long table into the wide all_renewables_tbl layout: one row
+    per local authority and sheet, one column per energy source (without
+    the total) in ENERGY_SOURCES order, and the sheet name ('source'), year
+    and measure (e.g. 'capacity_mw') the row came from, as a Categorical and
+    a MEASURE_TYPE Enum. Suppressed values are NULL.
+
+    Args:
+        frame: A DataFrame with the OUTPUT_SCHEMA columns.
+
+    Returns:
+        The wide Polars DataFrame.
+
+    Raises:
+        ValueError: If the frame has an energy source missing from
+                    ENERGY_SOURCES, e.g. after the workbook gains a column.
+    """
+    unknown = set(frame["energy_source"].unique()) - {*ENERGY_SOURCES, "total"}
+    if unknown:
+        raise ValueError(f"Unknown energy sources {sorted(unknown)}")
+
+    wide = frame.filter(pl.col("energy_source") != "total").pivot(
+        on="energy_source",
+        index=[*ID_COLUMNS, "type", "units", "calendar_year"],
+        values="value",
+    )
+    # Source and measure are derived once per sheet rather than per row
+    sheets = pl.DataFrame(
+        [
+            (sheet.type, sheet.year, sheet.sheet, f"{sheet.type.lower()}_{sheet.units}")
+            for energy_type, year in wide.select("type", "calendar_year")
+            .unique()
+            .iter_rows()
+            for sheet in renewable_sheets([year], [energy_type])
+        ],
+        schema={
+            "type": pl.String,
+            "calendar_year": pl.Int32,
+            "source": pl.Categorical,
+            "measure": MEASURE_TYPE,
+        },
+        orient="row",
+    )
+    return wide.join(
+        sheets, on=["type", "calendar_year"], how="left", maintain_order="left"
+    ).select(
+        *ID_COLUMNS,
+        # Every source gets a column, in a fixed order, whatever the rows hold
+        *(
+            pl.col(name)
+            if name in wide.columns
+            else pl.lit(None, pl.Float64).alias(name)
+            for name in ENERGY_SOURCES
+        ),
+        "source",
+        pl.col("calendar_year").alias("year"),
+        "measure",
+    )
@@ -0,0 +1,119 @@
+# scheduler.py
+
+"""
+Dependency-aware parallel execution of ETL build steps.
+
+Steps are dictionaries with at least a 'name' and a 'depends_on' list (see
+`main.build_steps`). Independent steps run concurrently, each on its own
+DuckDB cursor, while a step only starts once every step it depends on has
+finished. Wall-clock time therefore approaches the longest dependency chain
+rather than the sum of all steps.
+"""
+
+import os
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import duckdb
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _run_on_cursor(
+    cursor: duckdb.DuckDBPyConnection,
+    step: dict,
+    run_step: Callable[[duckdb.DuckDBPyConnection, dict], None],
+) -> None:
+    """Runs one step on its own cursor and closes the cursor afterwards."""
+    try:
+        run_step(cursor, step)
+    finally:
+        cursor.close()
+
+
+def check_dependencies(steps: list[dict]) -> None:
+    """
+    Validates that the dependency graph between steps has no cycles.
+
+    Dependencies on names that are not part of `steps` are ignored, as they
+    refer to tables that already exist and are not being rebuilt.
+
+    Args:
+        steps: The steps to validate.
+
+    Raises:
+        ValueError: If the steps contain a dependency cycle.
+    """
+    names = {step["name"] for step in steps}
+    remaining = {
+        step["name"]: set(step["depends_on"]).intersection(names) for step in steps
+    }
+    while remaining:
+        ready = {name for name, deps in remaining.items() if not deps}
+        if not ready:
+            raise ValueError(f"Dependency cycle between steps: {sorted(remaining)}")
+        remaining = {
+            name: deps - ready for name, deps in remaining.items() if name not in ready
+        }
+
+
+def run_steps(
+    con: duckdb.DuckDBPyConnection,
+    steps: list[dict],
+    run_step: Callable[[duckdb.DuckDBPyConnection, dict], None],
+    max_workers: int = DEFAULT_WORKERS,
+) -> None:
+    """
+    Runs steps concurrently on separate cursors while honouring `depends_on`.
+
+    Each step runs in auto-commit mode on a fresh cursor so that its result
+    is visible to the steps that depend on it. Callers wanting all-or-nothing
+    behaviour must therefore run this against a scratch database and only
+    publish it once this function returns without raising.
+
+    Args:
+        con: An active DuckDB connection object. Cursors are taken from it.
+        steps: The steps to run, in a valid dependency order.
+        run_step: The function that builds a single step on a cursor.
+        max_workers: The maximum number of steps to run at the same time.
+
+    Raises:
+        Exception: The first error raised by any step. Steps that are
+                   already running are allowed to finish; no new steps
+                   are started after a failure.
+    """
+    check_dependencies(steps)
+
+    names = {step["name"] for step in steps}
+    pending = {step["name"]: step for step in steps}
+    waiting_on = {
+        step["name"]: set(step["depends_on"]).intersection(names) for step in steps
+    }
+    running: dict[Future, str] = {}
+    error: BaseException | None = None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            if error is None:
+                ready = [name for name in pending if not waiting_on[name]]
+                for name in ready:
+                    step = pending.pop(name)
+                    future = executor.submit(
+                        _run_on_cursor, con.cursor(), step, run_step
+                    )
+                    running[future] = name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                for deps in waiting_on.values():
+                    deps.discard(name)
+
+    if error is not None:
+        raise error
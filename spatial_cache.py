@@ -0,0 +1,168 @@
+# spatial_cache.py
+
+"""
+Fetch-and-cache layer for remote spatial datasets.
+
+Boundary datasets are downloaded once, converted to FlatGeobuf and kept
+under `data/.cache/spatial/` together with a JSON sidecar recording where
+and when they were fetched. Table builds read the local copy, so a build
+only touches the network when a copy is missing, older than its TTL, or a
+refresh is explicitly requested. If the portal cannot be reached and a
+cached copy exists, the cached copy is used.
+"""
+
+import hashlib
+import json
+import os
+import uuid
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import duckdb
+import httpx
+
+from extensions import ensure_loaded
+from staging import sql_literal
+
+SPATIAL_CACHE_DIR = "data/.cache/spatial"
+DEFAULT_TTL = timedelta(days=30)
+FETCH_TIMEOUT = 60.0
+
+# FlatGeobuf files start with the bytes 'fgb' followed by the major version
+FLATGEOBUF_MAGIC = b"fgb\x03"
+
+
+def _read_metadata(meta_path: Path) -> dict | None:
+    """Returns the sidecar metadata for a cached dataset, if it is readable."""
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _is_fresh(metadata: dict, url: str, ttl: timedelta | None) -> bool:
+    """Checks whether a cached copy was fetched from `url` within `ttl`."""
+    if metadata.get("url") != url:
+        return False
+    if ttl is None:
+        return True
+    fetched_at = datetime.fromisoformat(metadata["fetched_at"])
+    return datetime.now(UTC) - fetched_at < ttl
+
+
+def _to_flatgeobuf(
+    con: duckdb.DuckDBPyConnection, download: Path, target: Path
+) -> None:
+    """Converts a downloaded vector file to FlatGeobuf via the spatial extension."""
+    ensure_loaded(con, ["spatial"])
+    partial = target.with_suffix(f".{uuid.uuid4().hex[:8]}.partial")
+    con.sql(
+        f"COPY (FROM ST_Read({sql_literal(download.as_posix())})) "  # noqa: S608
+        f"TO {sql_literal(partial.as_posix())} "
+        "WITH (FORMAT GDAL, DRIVER 'FlatGeobuf');"
+    )
+    os.replace(partial, target)
+
+
+def fetch_spatial(
+    con: duckdb.DuckDBPyConnection,
+    name: str,
+    url: str,
+    ttl: timedelta | None = DEFAULT_TTL,
+    refresh: bool = False,
+    cache_dir: str = SPATIAL_CACHE_DIR,
+    client: httpx.Client | None = None,
+) -> str:
+    """
+    Returns the path of a local FlatGeobuf copy of a remote spatial dataset,
+    downloading it first if needed.
+
+    The cached copy is reused while it is younger than `ttl`. Once it has
+    expired the server is asked for a new version with the validators
+    (ETag / Last-Modified) recorded on the previous fetch, so an unchanged
+    dataset is not downloaded again.
+
+    Args:
+        con: An active DuckDB connection object, used to convert GeoJSON
+             downloads to FlatGeobuf.
+        name: A short, file-name-safe identifier for the dataset.
+        url: The dataset's download URL (GeoJSON or FlatGeobuf).
+        ttl: How long a cached copy stays valid. None means forever.
+        refresh: Re-check the server even if the cached copy is still valid.
+        cache_dir: The directory holding cached datasets.
+        client: An optional HTTP client, e.g. one pointed at a local
+                stand-in server.
+
+    Returns:
+        The path of the cached FlatGeobuf file.
+
+    Raises:
+        httpx.HTTPError: If the download fails and there is no cached copy.
+    """
+    cache = Path(cache_dir)
+    target = cache / f"{name}.fgb"
+    meta_path = cache / f"{name}.json"
+    metadata = _read_metadata(meta_path) if target.exists() else None
+
+    if metadata and not refresh and _is_fresh(metadata, url, ttl):
+        return target.as_posix()
+
+    headers = {}
+    if metadata and metadata.get("url") == url:
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+
+    cache.mkdir(parents=True, exist_ok=True)
+    download = cache / f"{name}.{uuid.uuid4().hex[:8]}.download"
+    http = client or httpx.Client(timeout=FETCH_TIMEOUT, follow_redirects=True)
+    try:
+        with http.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and metadata:
+                print(f"  - {name} unchanged on server, keeping cached copy.")
+                metadata["fetched_at"] = datetime.now(UTC).isoformat()
+                meta_path.write_text(json.dumps(metadata, indent=2))
+                return target.as_posix()
+
+            response.raise_for_status()
+            digest = hashlib.sha256()
+            with open(download, "wb") as f:
+                for chunk in response.iter_bytes():
+                    digest.update(chunk)
+                    f.write(chunk)
+
+        with open(download, "rb") as f:
+            is_flatgeobuf = f.read(len(FLATGEOBUF_MAGIC)) == FLATGEOBUF_MAGIC
+        if is_flatgeobuf:
+            os.replace(download, target)
+        else:
+            _to_flatgeobuf(con, download, target)
+
+    except httpx.HTTPError as e:
+        if metadata:
+            print(f"  - ⚠️  Could not refresh {name} ({e}); using cached copy.")
+            return target.as_posix()
+        raise
+
+    finally:
+        download.unlink(missing_ok=True)
+        if client is None:
+            http.close()
+
+    meta_path.write_text(
+        json.dumps(
+            {
+                "url": url,
+                "fetched_at": datetime.now(UTC).isoformat(),
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "content_type": response.headers.get("content-type"),
+                "bytes": target.stat().st_size,
+                "download_sha256": digest.hexdigest(),
+            },
+            indent=2,
+        )
+    )
+    print(f"  - Fetched and cached spatial dataset: {name}")
+    return target.as_posix()
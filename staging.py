@@ -0,0 +1,182 @@
+# staging.py
+
+"""
+Columnar staging cache for spreadsheet and CSV sources.
+
+Parsing XLSX and ODS workbooks is by far the slowest I/O in the pipeline,
+yet most workbooks change at most a few times a year. Each
+(workbook, sheet, range, reader options) combination read by the ETL is
+converted once into a Parquet file under `data/.stage/`, keyed by the
+workbook's content hash. Later reads go straight to the Parquet copy for as
+long as the workbook's hash still matches.
+
+Large CSVs such as the DfT vehicle licensing files are staged the same way
+through `read_csv`, with a column projection so that the Parquet copy only
+holds the (typed) columns the tables use. Steps making the same read share
+one staged copy, and so one scan of the CSV.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+import duckdb
+
+from extensions import ensure_loaded
+from manifest import hash_file
+from profiling import profiled_as
+
+STAGE_DIR = "data/.stage"
+
+# Extensions providing each spreadsheet reader, loaded only on a cache miss
+READER_EXTENSIONS = {"read_xlsx": "excel", "read_sheet": "rusty_sheet"}
+
+_hash_cache: dict[tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+# One lock per staged file, so that concurrent steps making the same read
+# wait for a single copy instead of each parsing the source
+_stage_locks: dict[Path, threading.Lock] = {}
+
+
+def sql_literal(value: str | int | bool) -> str:
+    """Renders a Python constant as a SQL literal."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def reader_sql(reader: str, path: str, options: dict) -> str:
+    """
+    Renders a call to a table function such as read_xlsx or read_csv.
+
+    Args:
+        reader: The table function name, e.g. 'read_xlsx' or 'read_csv'.
+        path: The file path to the workbook.
+        options: Named arguments for the table function (sheet, range, ...).
+
+    Returns:
+        The table function call as SQL text.
+    """
+    args = [sql_literal(path)] + [
+        f"{key} = {sql_literal(value)}" for key, value in options.items()
+    ]
+    return f"{reader}({', '.join(args)})"
+
+
+def content_hash(path: str) -> str:
+    """
+    Returns the SHA-256 hash of a file, hashing each version only once per
+    process even when many sheets of the same workbook are staged.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _hash_cache:
+            return _hash_cache[key]
+    digest = hash_file(path)
+    with _hash_lock:
+        _hash_cache[key] = digest
+    return digest
+
+
+def _stage_lock(staged: Path) -> threading.Lock:
+    """Returns the lock guarding the writing of one staged file."""
+    with _hash_lock:
+        return _stage_locks.setdefault(staged, threading.Lock())
+
+
+def stage_sheet(
+    con: duckdb.DuckDBPyConnection,
+    reader: str,
+    path: str,
+    options: dict,
+    columns: dict[str, str] | None = None,
+    stage_dir: str = STAGE_DIR,
+) -> str:
+    """
+    Makes sure a Parquet copy of one sheet or file read exists and returns
+    its path.
+
+    The file name combines the source name, a digest of the reader, its
+    options and the column projection, and the source's content hash.
+    Copies made from an older version of the same source and read are
+    deleted when a new copy is written.
+
+    Args:
+        con: An active DuckDB connection object with the reader available.
+        reader: The table function name, e.g. 'read_xlsx' or 'read_csv'.
+        path: The file path to the workbook or CSV.
+        options: Named arguments for the table function (sheet, range, ...).
+        columns: Output column names mapped to the SQL expressions computing
+                 them from the read, e.g. {"count": 'TRY_CAST("2025 Q1" AS
+                 INTEGER)'}. Every column is kept when omitted.
+        stage_dir: The directory holding the staged Parquet files.
+
+    Returns:
+        The path of the staged Parquet file.
+    """
+    read_key = hashlib.sha256(
+        json.dumps([reader, path, options, columns], sort_keys=True).encode()
+    ).hexdigest()[:12]
+    prefix = f"{Path(path).stem}-{read_key}"
+    staged = Path(stage_dir) / f"{prefix}-{content_hash(path)[:16]}.parquet"
+
+    with _stage_lock(staged):
+        if staged.exists():
+            return staged.as_posix()
+
+        if reader in READER_EXTENSIONS:
+            ensure_loaded(con, [READER_EXTENSIONS[reader]])
+
+        select = "*"
+        if columns:
+            select = ", ".join(
+                f'{expression} AS "{name}"' for name, expression in columns.items()
+            )
+
+        staged.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a unique temporary name first so that a concurrent or
+        # interrupted build never sees a half-written Parquet file
+        partial = staged.with_suffix(f".{uuid.uuid4().hex[:8]}.partial")
+        with profiled_as(con, f"stage-{prefix}"):
+            con.sql(
+                f"COPY (SELECT {select} FROM {reader_sql(reader, path, options)}) "  # noqa: S608
+                f"TO {sql_literal(partial.as_posix())} "
+                "(FORMAT parquet, COMPRESSION zstd);"
+            )
+        os.replace(partial, staged)
+
+    for old in staged.parent.glob(f"{prefix}-*.parquet"):
+        if old != staged:
+            old.unlink(missing_ok=True)
+
+    return staged.as_posix()
+
+
+def staged_source(
+    con: duckdb.DuckDBPyConnection,
+    reader: str,
+    path: str,
+    options: dict,
+    columns: dict[str, str] | None = None,
+) -> str:
+    """
+    Stages one sheet or file read and returns SQL that scans the Parquet copy.
+
+    Args:
+        con: An active DuckDB connection object with the reader available.
+        reader: The table function name, e.g. 'read_xlsx' or 'read_csv'.
+        path: The file path to the workbook or CSV.
+        options: Named arguments for the table function (sheet, range, ...).
+        columns: An optional column projection (see `stage_sheet`).
+
+    Returns:
+        A read_parquet(...) call that can replace the original reader call.
+    """
+    staged = stage_sheet(con, reader, path, options, columns)
+    return f"read_parquet({sql_literal(staged)})"
@@ -0,0 +1,338 @@
+# telemetry.py
+
+"""
+Per-step telemetry for ETL runs.
+
+Every build step records its start and end time, wall and CPU time, the
+rows it produced, the size of its input files, the peak DuckDB memory seen
+while it ran and the on-disk size of the resulting table. Records are
+written to the `etl_run_log` table keyed by run id, so build times can be
+compared across runs as the source datasets grow.
+
+A run can also be saved as a performance baseline (`perf_baseline.json`)
+and later runs compared against it, so that a DuckDB or extension upgrade
+that slows a step down fails the build instead of going unnoticed. Step
+timings and memory peaks depend on which other steps run at the same time,
+so a baseline records its worker count and is only compared against runs
+with the same count.
+"""
+
+import json
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime
+
+import duckdb
+
+RUN_LOG_TABLE = "etl_run_log"
+MEMORY_SAMPLE_INTERVAL = 0.1  # seconds between duckdb_memory() samples
+
+BASELINE_FILE = "perf_baseline.json"
+DEFAULT_TOLERANCE = 0.25  # allowed fractional increase over the baseline
+# Changes smaller than these are timer and sampling noise, never regressions
+MIN_REGRESSION_SECONDS = 0.5
+MIN_REGRESSION_BYTES = 32 * 1024 * 1024
+
+
+def load_baseline(path: str, workers: int) -> dict:
+    """
+    Reads a performance baseline written by `RunLog.write_baseline`.
+
+    Args:
+        path: The baseline file.
+        workers: The number of workers the run being compared uses.
+
+    Returns:
+        The baseline, with its 'run_id', 'duckdb_version', 'workers' and
+        per-step 'steps'.
+
+    Raises:
+        ValueError: If the baseline was recorded with a different number of
+                    workers (or before the count was recorded), as its step
+                    timings are then not comparable.
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get("workers") != workers:
+        raise ValueError(
+            f"The baseline at '{path}' was recorded with "
+            f"workers={baseline.get('workers', 'unknown')}, but this run uses "
+            f"workers={workers}. Record it again with --write-baseline."
+        )
+    return baseline
+
+
+class RunLog:
+    """Collects timings and sizes for the steps of one ETL run."""
+
+    def __init__(self, con: duckdb.DuckDBPyConnection):
+        self.run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.records: list[dict] = []
+        self._lock = threading.Lock()
+        self._samples: list[tuple[float, int]] = []
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample_memory, args=(con.cursor(),), daemon=True
+        )
+
+    def _sample_memory(self, cursor: duckdb.DuckDBPyConnection) -> None:
+        """Samples DuckDB's total memory use until `stop` is called."""
+        try:
+            while not self._stop.is_set():
+                used = cursor.execute(
+                    "SELECT sum(memory_usage_bytes) FROM duckdb_memory()"
+                ).fetchone()[0]
+                with self._lock:
+                    self._samples.append((time.perf_counter(), int(used or 0)))
+                self._stop.wait(MEMORY_SAMPLE_INTERVAL)
+        finally:
+            cursor.close()
+
+    def start(self) -> None:
+        """Starts the background memory sampler."""
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stops the background memory sampler."""
+        self._stop.set()
+        if self._sampler.is_alive():
+            self._sampler.join()
+
+    def _peak_memory(self, start: float, end: float) -> int | None:
+        """
+        Returns the highest memory sample taken between two perf counters,
+        including the last sample before `start` so that steps shorter than
+        the sampling interval still get a reading.
+        """
+        with self._lock:
+            before = [used for t, used in self._samples if t < start][-1:]
+            window = [used for t, used in self._samples if start <= t <= end]
+        return max(before + window, default=None)
+
+    def measure(
+        self, run_step: Callable[[duckdb.DuckDBPyConnection, dict], int | None]
+    ) -> Callable[[duckdb.DuckDBPyConnection, dict], int | None]:
+        """
+        Wraps a step runner so that every call is timed and recorded.
+
+        The wrapped runner must return the number of rows the step produced
+        (as reported by the statement itself) or None for views.
+
+        Args:
+            run_step: The function that builds a single step on a cursor.
+
+        Returns:
+            A function with the same signature that also records telemetry.
+        """
+
+        def measured(con: duckdb.DuckDBPyConnection, step: dict) -> int | None:
+            started_at = datetime.now()
+            wall_start = time.perf_counter()
+            # Process-wide CPU time: DuckDB executes on its own thread pool,
+            # so this overlaps with any steps running at the same time
+            cpu_start = time.process_time()
+            status, rows = "failed", None
+            try:
+                rows = run_step(con, step)
+                status = "succeeded"
+                return rows
+            finally:
+                wall_end = time.perf_counter()
+                record = {
+                    "run_id": self.run_id,
+                    "step": step["name"],
+                    "status": status,
+                    "started_at": started_at,
+                    "ended_at": datetime.now(),
+                    "wall_seconds": wall_end - wall_start,
+                    "cpu_seconds": time.process_time() - cpu_start,
+                    "rows": rows,
+                    "input_bytes": sum(
+                        i["size"] for i in step.get("input_fingerprints", [])
+                    ),
+                    "peak_memory_bytes": self._peak_memory(wall_start, wall_end),
+                    "table_bytes": None,
+                }
+                with self._lock:
+                    self.records.append(record)
+
+        return measured
+
+    def measure_table_sizes(self, con: duckdb.DuckDBPyConnection) -> None:
+        """
+        Fills in the on-disk size of every table built in this run.
+
+        Must be called outside a transaction once all steps have finished,
+        as it checkpoints the database so that every table has been written
+        to blocks rather than the write-ahead log.
+        """
+        con.sql("CHECKPOINT;")
+        block_size = con.execute(
+            "SELECT block_size FROM pragma_database_size()"
+        ).fetchone()[0]
+        tables = {
+            row[0]
+            for row in con.execute(
+                "SELECT table_name FROM duckdb_tables() WHERE schema_name = 'main'"
+            ).fetchall()
+        }
+        for record in self.records:
+            if record["step"] not in tables:
+                continue
+            blocks = con.execute(
+                "SELECT count(DISTINCT block_id) "
+                "FROM pragma_storage_info(?) WHERE block_id >= 0",
+                [record["step"]],
+            ).fetchone()[0]
+            record["table_bytes"] = blocks * block_size
+
+    def summary(self, con: duckdb.DuckDBPyConnection) -> duckdb.DuckDBPyRelation:
+        """Returns this run's records from the run log, slowest step first."""
+        return con.sql(
+            f"""
+            SELECT step, status, round(wall_seconds, 2) AS wall_s,
+                round(cpu_seconds, 2) AS cpu_s, rows,
+                peak_memory_bytes // 1048576 AS peak_mem_mb,
+                table_bytes // 1048576 AS table_mb
+            FROM {RUN_LOG_TABLE}
+            WHERE run_id = $run_id
+            ORDER BY wall_seconds DESC
+            """,  # noqa: S608
+            params={"run_id": self.run_id},
+        )
+
+    def write(self, con: duckdb.DuckDBPyConnection) -> None:
+        """Appends this run's records to the run log table."""
+        if not self.records:
+            return
+        con.sql(f"""
+            CREATE TABLE IF NOT EXISTS {RUN_LOG_TABLE} (
+                run_id VARCHAR,
+                step VARCHAR,
+                status VARCHAR,
+                started_at TIMESTAMP,
+                ended_at TIMESTAMP,
+                wall_seconds DOUBLE,
+                cpu_seconds DOUBLE,
+                rows BIGINT,
+                input_bytes BIGINT,
+                peak_memory_bytes BIGINT,
+                table_bytes BIGINT
+            );
+        """)
+        con.executemany(
+            f"INSERT INTO {RUN_LOG_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",  # noqa: S608
+            [list(record.values()) for record in self.records],
+        )
+
+    def write_baseline(self, workers: int, path: str = BASELINE_FILE) -> None:
+        """
+        Saves this run's wall time and peak memory per step, and the number
+        of workers it ran with, as the performance baseline that later runs
+        are compared against.
+        """
+        steps = {
+            record["step"]: {
+                "wall_seconds": round(record["wall_seconds"], 3),
+                "peak_memory_bytes": record["peak_memory_bytes"],
+            }
+            for record in sorted(self.records, key=lambda r: r["step"])
+            if record["status"] == "succeeded"
+        }
+        baseline = {
+            "run_id": self.run_id,
+            "duckdb_version": duckdb.__version__,
+            "workers": workers,
+            "steps": steps,
+        }
+        with open(path, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+
+    def compare_to_baseline(
+        self,
+        workers: int,
+        path: str = BASELINE_FILE,
+        tolerance: float = DEFAULT_TOLERANCE,
+    ) -> list[dict]:
+        """
+        Compares this run's steps against a saved baseline.
+
+        A step regresses when its wall time or peak memory exceeds the
+        baseline by more than `tolerance` (as a fraction) and by more than
+        MIN_REGRESSION_SECONDS or MIN_REGRESSION_BYTES respectively. Steps
+        missing from either side are reported but never count as regressions.
+
+        Args:
+            workers: The number of workers this run used.
+            path: The baseline file written by `write_baseline`.
+            tolerance: The allowed fractional increase, e.g. 0.25 for 25%.
+
+        Returns:
+            A list of dictionaries, one per step and metric, with the keys
+            'step', 'metric', 'baseline', 'current', 'change' (a fraction,
+            None if it cannot be computed) and 'regressed'.
+
+        Raises:
+            ValueError: If the baseline was recorded with a different number
+                        of workers (see `load_baseline`).
+        """
+        baseline = load_baseline(path, workers)
+
+        current = {r["step"]: r for r in self.records if r["status"] == "succeeded"}
+        floors = {
+            "wall_seconds": MIN_REGRESSION_SECONDS,
+            "peak_memory_bytes": MIN_REGRESSION_BYTES,
+        }
+        rows = []
+        for step in sorted(baseline["steps"].keys() | current.keys()):
+            for metric, floor in floors.items():
+                before = baseline["steps"].get(step, {}).get(metric)
+                after = current.get(step, {}).get(metric)
+                measured = before is not None and after is not None
+                change = (after - before) / before if measured and before else None
+                rows.append(
+                    {
+                        "step": step,
+                        "metric": metric,
+                        "baseline": before,
+                        "current": after,
+                        "change": change,
+                        "regressed": measured
+                        and after > before * (1 + tolerance)
+                        and after - before > floor,
+                    }
+                )
+        return rows
+
+
+def print_comparison(rows: list[dict], tolerance: float) -> None:
+    """Prints the result of `RunLog.compare_to_baseline` as a table."""
+
+    def show(value: float | None, metric: str) -> str:
+        if value is None:
+            return "-"
+        if metric == "peak_memory_bytes":
+            return f"{value / 1048576:.0f} MB"
+        return f"{value:.2f} s"
+
+    print(f"\n📏 Comparison against baseline (tolerance {tolerance:.0%}):")
+    print(
+        f"  {'step':<36} {'metric':<8} {'baseline':>10} {'current':>10} {'change':>8}"
+    )
+    for row in rows:
+        metric = "time" if row["metric"] == "wall_seconds" else "memory"
+        if row["baseline"] is None or row["current"] is None:
+            change = "new/gone"
+        elif row["change"] is None:
+            change = "-"
+        else:
+            change = f"{row['change']:+.0%}"
+        flag = "  ❌ REGRESSED" if row["regressed"] else ""
+        print(
+            f"  {row['step']:<36} {metric:<8} "
+            f"{show(row['baseline'], row['metric']):>10} "
+            f"{show(row['current'], row['metric']):>10} {change:>8}{flag}"
+        )
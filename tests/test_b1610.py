@@ -0,0 +1,470 @@
+"""
+Tests for b1610.py's response decoding and shard merging, and for its adaptive
+rate limiting and resumable retrieval against a local stand-in for the B1610 API.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import UTC, date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+import polars as pl
+import pytest
+
+from b1610 import (
+    RECORD_SCHEMA,
+    B1610Retriever,
+    CompletionJournal,
+    backfill_written_at,
+    decode_records,
+    merge_shards,
+    settlement_period_count,
+    shard_dir,
+    split_span,
+)
+
+DAY = date(2024, 1, 1)
+UNITS = ["T_SEAB-1", "T_SEAB-2"]
+
+
+def record(unit: str, settlement_date: date, settlement_period: int) -> dict:
+    """The B1610 record the stand-in serves for one unit and period."""
+    end = datetime.combine(settlement_date, datetime.min.time())
+    end += timedelta(minutes=30 * settlement_period)
+    return {
+        "dataset": "B1610",
+        "psrType": "Generation",
+        "bmUnit": unit,
+        "nationalGridBmUnitId": unit.removeprefix("T_"),
+        "settlementDate": settlement_date.isoformat(),
+        "settlementPeriod": settlement_period,
+        "halfHourEndTime": f"{end:%Y-%m-%dT%H:%M:%S}Z",
+        "quantity": 100.0,
+    }
+
+
+class B1610Server(ThreadingHTTPServer):
+    """A local stand-in for the B1610 API that records the requests it gets."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lock = threading.Lock()
+        self.arrivals: list[float] = []
+        self.requests: list[dict[str, list[str]]] = []
+        # Headers of the 429 responses to send before anything else
+        self.throttle: list[dict[str, str]] = []
+        # (date, settlement period) pairs the API fails on
+        self.failing: set[tuple[date, int]] = set()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f"http://{host}:{port}/B1610"
+
+
+class B1610Handler(BaseHTTPRequestHandler):
+    """
+    Serves a record for every requested unit and period: all periods of a date
+    span from /stream, or a single period wrapped in {"data": [...]}.
+    """
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        with self.server.lock:
+            self.server.arrivals.append(time.monotonic())
+            self.server.requests.append(query)
+            headers = self.server.throttle.pop(0) if self.server.throttle else None
+        if headers is not None:
+            self.send_status(429, headers)
+            return
+
+        units = query["bmUnit"]
+        if url.path.endswith("/stream"):
+            first = date.fromisoformat(query["from"][0])
+            last = date.fromisoformat(query["to"][0])
+            keys = [
+                (first + timedelta(days=i), period)
+                for i in range((last - first).days + 1)
+                for period in range(
+                    1, settlement_period_count(first + timedelta(days=i)) + 1
+                )
+            ]
+            body = [
+                record(unit, *key)
+                for key in keys
+                if key not in self.server.failing
+                for unit in units
+            ]
+        else:
+            key = (
+                date.fromisoformat(query["settlementDate"][0]),
+                int(query["settlementPeriod"][0]),
+            )
+            if key in self.server.failing:
+                self.send_status(500)
+                return
+            body = {"data": [record(unit, *key) for unit in units]}
+
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_status(self, status: int, headers: dict[str, str] | None = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    """Starts a local B1610 stand-in; call it with the 429 headers to send first."""
+    servers = []
+
+    def start(throttle: list[dict[str, str]] = ()) -> B1610Server:
+        server = B1610Server(("127.0.0.1", 0), B1610Handler)
+        server.throttle = list(throttle)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def retriever_for(
+    server: B1610Server, start: date, end: date, **options
+) -> B1610Retriever:
+    return B1610Retriever(
+        UNITS, start, end, cache_dir=None, base_url=server.url, **options
+    )
+
+
+def fetch(server: B1610Server, requests: int) -> tuple[float, list, list[float]]:
+    """
+    Makes `requests` settlement period requests one after the other.
+
+    Returns the limiter's starting rate, then the records of each request and
+    the limiter's rate after each.
+    """
+    retriever = retriever_for(server, DAY, DAY)
+    initial_rate = retriever.limiter.rate
+
+    async def run():
+        results, rates = [], []
+        async with httpx.AsyncClient() as client:
+            retriever.client = client
+            for _ in range(requests):
+                results.append(await retriever.make_api_request(("T_SEAB-1",), DAY, 1))
+                rates.append(retriever.limiter.rate)
+        return results, rates
+
+    return initial_rate, *asyncio.run(run())
+
+
+def retrieve(
+    server: B1610Server, output_dir: Path, start: date = DAY, end: date = DAY
+) -> tuple[int, bool]:
+    """Runs a whole retrieval from start to end into output_dir."""
+    retriever = retriever_for(server, start, end, output_dir=str(output_dir))
+    retriever.max_retries = 1  # Fail fast instead of backing off
+    return asyncio.run(retriever.retrieve_all_data())
+
+
+def test_decode_records_accepts_both_response_shapes():
+    records = [record(unit, DAY, 1) for unit in UNITS]
+
+    wrapped = decode_records(json.dumps({"data": records}).encode())
+    bare = decode_records(json.dumps(records).encode())
+
+    assert wrapped.equals(bare)
+    assert dict(wrapped.schema) == RECORD_SCHEMA
+    assert wrapped.row(0, named=True)["settlementDate"] == DAY
+    end = wrapped.row(0, named=True)["halfHourEndTime"]
+    assert end == datetime(2024, 1, 1, 0, 30, tzinfo=UTC)
+
+
+def test_decode_records_ignores_unknown_fields():
+    frame = decode_records(
+        json.dumps([{**record("T_SEAB-1", DAY, 1), "x": 1}]).encode()
+    )
+
+    assert frame.columns == list(RECORD_SCHEMA)
+    assert decode_records(b'{"data": []}').height == 0
+
+
+def test_decode_records_rejects_invalid_json():
+    with pytest.raises(pl.exceptions.PolarsError):
+        decode_records(b'[{"bmUnit": ')
+
+
+def test_throttle_halves_rate(api):
+    server = api([{}])
+
+    initial_rate, [records], [rate] = fetch(server, 1)
+
+    assert records.height == 1
+    assert len(server.arrivals) == 2
+    # Halved by the 429, then nudged up by the successful retry
+    halved = initial_rate * 0.5
+    assert rate == pytest.approx(halved + 1 / halved)
+
+
+def test_successes_raise_rate_again(api):
+    server = api([{}])
+
+    initial_rate, results, rates = fetch(server, 6)
+
+    assert all(records.height == 1 for records in results)
+    assert rates[0] < initial_rate
+    assert rates == sorted(set(rates))
+
+
+def test_retry_after_is_honoured(api):
+    server = api([{"Retry-After": "1"}])
+
+    _, [records], _ = fetch(server, 1)
+
+    assert records.height == 1
+    first, retry = server.arrivals
+    assert retry - first >= 1.0
+
+
+def test_journal_keeps_keys_until_fetched(tmp_path):
+    path = str(tmp_path / "_journal.duckdb")
+    journal = CompletionJournal(path)
+    journal.append(
+        [("T_SEAB-1", DAY, 1, "failed", 0), ("T_SEAB-1", DAY, 2, "failed", 0)]
+    )
+    journal.append([("T_SEAB-1", DAY, 1, "done", 2)])
+    journal.close()
+
+    # Reopened, as by the next run
+    journal = CompletionJournal(path)
+
+    assert journal.done_keys(DAY) == {("T_SEAB-1", 1)}
+    assert journal.done_counts(["T_SEAB-1"], DAY, DAY) == {(DAY, "T_SEAB-1"): 1}
+    assert journal.outstanding_failures(["T_SEAB-1"]) == 1
+    journal.close()
+
+
+def test_resume_requests_only_missing_keys(tmp_path):
+    second = DAY + timedelta(days=1)
+    journal = CompletionJournal(str(tmp_path / "_journal.duckdb"))
+    journal.append(
+        [(unit, DAY, sp, "done", 1) for unit in UNITS for sp in range(1, 49) if sp != 7]
+        + [("T_SEAB-1", DAY, 7, "done", 1), ("T_SEAB-2", DAY, 7, "failed", 0)]
+    )
+    retriever = B1610Retriever(UNITS, DAY, second, cache_dir=None)
+    retriever.journal = journal
+
+    items = list(retriever.iter_work_items(journal.done_counts(UNITS, DAY, second)))
+
+    # Only the failed key of the partly fetched day, and all of the next one
+    assert items == [
+        ("period", ("T_SEAB-2",), DAY, 7),
+        ("window", tuple(UNITS), second, second),
+    ]
+    journal.close()
+
+
+def test_rerun_fetches_only_the_failed_periods(api, tmp_path):
+    server = api()
+    server.failing = {(DAY, 7)}
+
+    rows_written, succeeded = retrieve(server, tmp_path / "b1610")
+
+    assert not succeeded
+    assert rows_written == 2 * 47
+    # The window, then its missing period on its own
+    assert [query.get("settlementPeriod") for query in server.requests] == [None, ["7"]]
+
+    server.failing.clear()
+    server.requests.clear()
+    rows_written, succeeded = retrieve(server, tmp_path / "b1610")
+
+    assert succeeded
+    assert rows_written == 2
+    assert [
+        (query["settlementPeriod"], query["bmUnit"]) for query in server.requests
+    ] == [(["7"], UNITS)]
+    dataset = pl.scan_parquet(
+        tmp_path / "b1610" / "*/*/*.parquet", hive_partitioning=True
+    ).collect()
+    assert dataset.height == 2 * 48
+    assert dataset.select("bmUnit", "settlementPeriod").is_duplicated().sum() == 0
+
+
+def retrieve_shard(server: B1610Server, output_dir: Path, day: date) -> None:
+    """Retrieves one day as a shard of output_dir, as `run_shard` would."""
+    assert retrieve(server, Path(shard_dir(str(output_dir), day, day)), day, day)[1]
+
+
+def dataset(output_dir: Path) -> pl.DataFrame:
+    return pl.scan_parquet(
+        output_dir / "*/*/*.parquet", hive_partitioning=True
+    ).collect()
+
+
+def test_split_span_covers_every_day_once():
+    start, end = date(2024, 1, 1), date(2024, 1, 10)
+
+    spans = split_span(start, end, 3)
+
+    assert spans[0][0] == start
+    assert spans[-1][1] == end
+    for (_, last), (first, _) in zip(spans, spans[1:], strict=False):
+        assert first == last + timedelta(days=1)
+    assert sorted((last - first).days + 1 for first, last in spans) == [3, 3, 4]
+    # Never more shards than days
+    assert split_span(start, start + timedelta(days=1), 4) == [
+        (start, start),
+        (start + timedelta(days=1), start + timedelta(days=1)),
+    ]
+
+
+def test_merge_publishes_shards_and_removes_them(api, tmp_path):
+    server = api()
+    output = tmp_path / "b1610"
+    second = DAY + timedelta(days=1)
+    retrieve_shard(server, output, DAY)
+    retrieve_shard(server, output, second)
+
+    report = merge_shards(UNITS, DAY, second, str(output))
+
+    assert report["published"]
+    assert report["missing_keys"] == 0
+    assert report["records"] == 2 * 96
+    assert dataset(output).height == 2 * 96
+    assert (output / "_journal.duckdb").exists()
+    assert not (tmp_path / "b1610.shards").exists()
+
+
+def test_merge_keeps_the_newest_copy_of_a_key(api, tmp_path):
+    server = api()
+    output = tmp_path / "b1610"
+    retrieve_shard(server, output, DAY)
+    merge_shards(UNITS, DAY, DAY, str(output))
+
+    # The day is fetched again into a new shard and merged over the dataset
+    retrieve_shard(server, output, DAY)
+    report = merge_shards(UNITS, DAY, DAY, str(output))
+
+    assert report["sources"] == 2
+    assert report["duplicates_dropped"] == 96
+    assert dataset(output).height == 96
+
+
+def test_merge_backfills_files_written_before_written_at(api, tmp_path):
+    server = api()
+    output = tmp_path / "b1610"
+    retrieve_shard(server, output, DAY)
+    shard = Path(shard_dir(str(output), DAY, DAY))
+    # Rewrite the shard as it was before records carried writtenAt
+    for path in shard.glob("*/*/*.parquet"):
+        pl.read_parquet(path, hive_partitioning=False).drop("writtenAt").write_parquet(
+            path
+        )
+
+    report = merge_shards(UNITS, DAY, DAY, str(output))
+
+    assert report["published"]
+    merged = dataset(output)
+    assert merged.height == 96
+    assert merged["writtenAt"].null_count() == 96
+    # Files that already have writtenAt are left alone
+    assert backfill_written_at(output) == 0
+
+
+def test_merge_with_missing_keys_publishes_nothing(api, tmp_path):
+    server = api()
+    output = tmp_path / "b1610"
+    retrieve_shard(server, output, DAY)
+
+    report = merge_shards(UNITS, DAY, DAY + timedelta(days=1), str(output))
+
+    assert not report["published"]
+    assert report["missing_keys"] == 96
+    assert not output.exists()
+    assert (tmp_path / "b1610.shards").exists()
+
+
+def test_merge_refuses_an_output_without_a_journal(api, tmp_path):
+    server = api()
+    output = tmp_path / "b1610"
+    retrieve_shard(server, output, DAY)
+    output.mkdir()
+    (output / "notes.txt").write_text("not a retriever's dataset")
+
+    with pytest.raises(FileExistsError):
+        merge_shards(UNITS, DAY, DAY, str(output))
+
+    assert (output / "notes.txt").exists()
+
+
+def interrupt_swap(monkeypatch) -> None:
+    """Makes the next merge stop once it has moved the published dataset aside."""
+    replace = os.replace
+
+    def interrupted(src, dst):
+        if str(src).endswith(".merging"):
+            raise OSError("interrupted")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", interrupted)
+
+
+def test_merge_interrupted_mid_swap_can_be_run_again(api, tmp_path, monkeypatch):
+    server = api()
+    output = tmp_path / "b1610"
+    second = DAY + timedelta(days=1)
+    retrieve_shard(server, output, DAY)
+    merge_shards(UNITS, DAY, DAY, str(output))
+    retrieve_shard(server, output, second)
+
+    with monkeypatch.context() as patch:
+        interrupt_swap(patch)
+        with pytest.raises(OSError, match="interrupted"):
+            merge_shards(UNITS, DAY, second, str(output))
+    # Only the moved-aside copy holds the first day now
+    assert not output.exists()
+
+    report = merge_shards(UNITS, DAY, second, str(output))
+
+    assert report["published"]
+    assert dataset(output).height == 2 * 96
+    assert not (tmp_path / "b1610.replaced").exists()
+    assert not (tmp_path / "b1610.merging").exists()
+
+
+def test_merge_removes_a_stale_replaced_copy(api, tmp_path):
+    server = api()
+    output = tmp_path / "b1610"
+    retrieve_shard(server, output, DAY)
+    merge_shards(UNITS, DAY, DAY, str(output))
+    # Left by a merge interrupted after the merged dataset was moved into place
+    shutil.copytree(output, tmp_path / "b1610.replaced")
+    retrieve_shard(server, output, DAY)
+
+    report = merge_shards(UNITS, DAY, DAY, str(output))
+
+    assert report["published"]
+    assert dataset(output).height == 96
+    assert not (tmp_path / "b1610.replaced").exists()
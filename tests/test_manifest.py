@@ -0,0 +1,44 @@
+"""Tests for manifest.py's stale step detection."""
+
+from manifest import stale_steps
+
+# A chain a <- b <- c, and d on its own
+DEPENDENCIES = {"a": [], "b": ["a"], "c": ["b"], "d": []}
+FINGERPRINTS = {"a": "fa", "b": "fb", "c": "fc", "d": "fd"}
+
+
+def manifest_of(fingerprints: dict[str, str]) -> dict[str, dict]:
+    return {name: {"fingerprint": f, "inputs": []} for name, f in fingerprints.items()}
+
+
+def test_unchanged_steps_are_not_rebuilt():
+    manifest = manifest_of(FINGERPRINTS)
+
+    assert stale_steps(FINGERPRINTS, DEPENDENCIES, manifest, set(FINGERPRINTS)) == set()
+
+
+def test_changed_step_makes_its_dependants_stale_transitively():
+    manifest = manifest_of({**FINGERPRINTS, "a": "old"})
+
+    stale = stale_steps(FINGERPRINTS, DEPENDENCIES, manifest, set(FINGERPRINTS))
+
+    assert stale == {"a", "b", "c"}
+
+
+def test_dependants_are_found_whatever_the_order_of_steps():
+    # c is listed before the step it depends on, so one pass is not enough
+    dependencies = {"c": ["b"], "b": ["a"], "a": [], "d": []}
+    manifest = manifest_of({**FINGERPRINTS, "a": "old"})
+
+    stale = stale_steps(FINGERPRINTS, dependencies, manifest, set(FINGERPRINTS))
+
+    assert stale == {"a", "b", "c"}
+
+
+def test_missing_relation_or_manifest_entry_is_stale():
+    manifest = manifest_of({k: v for k, v in FINGERPRINTS.items() if k != "d"})
+
+    stale = stale_steps(FINGERPRINTS, DEPENDENCIES, manifest, {"a", "c", "d"})
+
+    # b was dropped from the database, d was never recorded
+    assert stale == {"b", "c", "d"}
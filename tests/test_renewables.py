@@ -0,0 +1,150 @@
+"""
+Tests for renewables.py's Polars backend, on small workbooks written by
+benchmark.write_xlsx, and its wide all_renewables_tbl layout.
+"""
+
+import polars as pl
+import pytest
+
+from benchmark import RENEWABLE_LAYOUT, write_xlsx
+from renewables import (
+    ENERGY_SOURCES,
+    ID_COLUMNS,
+    MEASURE_TYPE,
+    OUTPUT_SCHEMA,
+    RENEWABLE_TYPES,
+    open_workbook,
+    pivot_renewables,
+    read_renewables_polars,
+    workbook_years,
+)
+
+HEADER = RENEWABLE_LAYOUT["id_columns"] + RENEWABLE_LAYOUT["value_columns"]
+
+AUTHORITY = {
+    "local_authority_code": "E06000023",
+    "local_authority_name": "Bristol, City of",
+    "estimated_number_of_households": 210000,
+    "region": "South West",
+    "country": "England",
+}
+
+
+def sheet_rows(*codes: str, header: list[str] = HEADER) -> list[list]:
+    """A header and one row per local authority code, with hydro suppressed."""
+    values = [1.0] * (len(header) - len(RENEWABLE_LAYOUT["id_columns"]))
+    values[RENEWABLE_LAYOUT["value_columns"].index("Hydro")] = "[x]"
+    return [header] + [
+        [code, "Area", 1000, "Region", "Country", *values] for code in codes
+    ]
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """Writes a workbook with the given rows for every sheet of the given years."""
+
+    def write(rows: list[list], yrs: tuple[int, ...] = (2024,)) -> str:
+        path = tmp_path / "renewables.xlsx"
+        write_xlsx(
+            path,
+            [
+                (f"LA - {name}{spec['separator']}{year}", spec["header_row"], rows)
+                for year in yrs
+                for name, spec in RENEWABLE_TYPES.items()
+            ],
+        )
+        return str(path)
+
+    return write
+
+
+def test_workbook_lists_sheet_dimensions_from_metadata(workbook):
+    opened = open_workbook(workbook(sheet_rows("E06000023", "E06000024")))
+
+    assert opened.dimensions == {
+        "LA - Generation, 2024": "A1:R7",
+        "LA - Capacity, 2024": "A1:R6",
+        "LA - Sites 2024": "A1:R6",
+    }
+
+
+def test_workbook_years_need_every_type_with_rows(workbook):
+    path = workbook(sheet_rows("E06000023"), yrs=(2023, 2024))
+    opened = open_workbook(path)
+
+    assert workbook_years(opened, list(RENEWABLE_TYPES)) == [2023, 2024]
+
+    # A sheet with a header but no rows does not count
+    write_xlsx(
+        path,
+        [
+            ("LA - Sites 2023", 4, sheet_rows()),
+            ("LA - Sites 2024", 4, sheet_rows("E06000023")),
+        ],
+    )
+    assert workbook_years(open_workbook(path), ["Sites"]) == [2024]
+
+
+def test_polars_backend_reads_english_authorities(workbook):
+    path = workbook(sheet_rows("E06000023", "W06000015"))
+
+    frame = read_renewables_polars([2024], list(RENEWABLE_TYPES), open_workbook(path))
+
+    assert frame.schema == pl.Schema(OUTPUT_SCHEMA)
+    assert frame.height == len(RENEWABLE_TYPES) * len(HEADER[5:])
+    assert set(frame["local_authority_code"]) == {"E06000023"}
+    suppressed = frame.filter(pl.col("value").is_null())
+    assert set(suppressed["energy_source"]) == {"hydro"}
+
+
+def test_polars_backend_refuses_unexpected_columns(workbook):
+    path = workbook(sheet_rows("E06000023", header=[*HEADER[:-1], "Tidal Lagoon"]))
+
+    with pytest.raises(ValueError, match="tidal_lagoon"):
+        read_renewables_polars([2024], ["Sites"], open_workbook(path))
+
+
+def long_frame(*values: tuple[str, float | None]) -> pl.DataFrame:
+    """A long frame for one authority's 2024 capacity sheet."""
+    return pl.DataFrame(
+        [
+            {
+                **AUTHORITY,
+                "energy_source": source,
+                "type": "Capacity",
+                "units": "mw",
+                "calendar_year": 2024,
+                "value": value,
+            }
+            for source, value in values
+        ],
+        schema=OUTPUT_SCHEMA,
+    )
+
+
+def test_sources_are_in_workbook_order_whatever_the_row_order():
+    frame = long_frame(("hydro", 1.0), ("total", 3.0), ("photovoltaics", 2.0))
+
+    wide = pivot_renewables(frame)
+
+    assert wide.columns == [*ID_COLUMNS, *ENERGY_SOURCES, "source", "year", "measure"]
+    assert wide.select("photovoltaics", "hydro").row(0) == (2.0, 1.0)
+    assert wide["onshore_wind"].to_list() == [None]
+    assert wide.select("source", "measure").row(0) == (
+        "LA - Capacity, 2024",
+        "capacity_mw",
+    )
+    assert wide.schema["source"] == pl.Categorical
+    assert wide.schema["measure"] == MEASURE_TYPE
+
+
+def test_suppressed_values_stay_null():
+    wide = pivot_renewables(long_frame(("hydro", None), ("photovoltaics", 2.0)))
+
+    assert wide.height == 1
+    assert wide["hydro"].to_list() == [None]
+
+
+def test_unknown_source_is_refused():
+    with pytest.raises(ValueError, match="tidal_lagoon"):
+        pivot_renewables(long_frame(("tidal_lagoon", 1.0)))
@@ -0,0 +1,84 @@
+"""Tests for scheduler.py's dependency-aware step execution."""
+
+import threading
+import time
+
+import duckdb
+import pytest
+
+from scheduler import check_dependencies, run_steps
+
+
+def step(name: str, *depends_on: str) -> dict:
+    return {"name": name, "depends_on": list(depends_on)}
+
+
+class Recorder:
+    """A step runner that records when each step starts and finishes."""
+
+    def __init__(self, fail: str | None = None, delay: float = 0.05):
+        self.fail = fail
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.events: list[tuple[str, str]] = []
+
+    def __call__(self, con: duckdb.DuckDBPyConnection, step: dict) -> None:
+        with self.lock:
+            self.events.append(("start", step["name"]))
+        time.sleep(self.delay)
+        if step["name"] == self.fail:
+            raise RuntimeError(f"{step['name']} failed")
+        con.execute(f"CREATE TABLE {step['name']} AS SELECT 1 AS x")
+        with self.lock:
+            self.events.append(("end", step["name"]))
+
+    def position(self, event: str, name: str) -> int:
+        return self.events.index((event, name))
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    yield con
+    con.close()
+
+
+def test_steps_start_after_their_dependencies(con):
+    steps = [step("a"), step("b"), step("c", "a", "b"), step("d", "c")]
+    runner = Recorder()
+
+    run_steps(con, steps, runner, max_workers=4)
+
+    assert runner.position("start", "c") > runner.position("end", "a")
+    assert runner.position("start", "c") > runner.position("end", "b")
+    assert runner.position("start", "d") > runner.position("end", "c")
+    # Independent steps overlap
+    assert runner.position("start", "b") < runner.position("end", "a")
+    # Each step's table is visible to the steps after it
+    assert con.sql("SELECT count(*) FROM d").fetchone()[0] == 1
+
+
+def test_dependencies_outside_the_run_are_ignored(con):
+    runner = Recorder()
+
+    run_steps(con, [step("a", "already_built")], runner, max_workers=2)
+
+    assert runner.events == [("start", "a"), ("end", "a")]
+
+
+def test_failure_is_raised_and_stops_dependants(con):
+    steps = [step("a"), step("b", "a"), step("c")]
+    runner = Recorder(fail="a")
+
+    with pytest.raises(RuntimeError, match="a failed"):
+        run_steps(con, steps, runner, max_workers=2)
+
+    started = {name for event, name in runner.events if event == "start"}
+    assert "b" not in started
+    # c was already running alongside a and is allowed to finish
+    assert ("end", "c") in runner.events
+
+
+def test_cycle_is_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        check_dependencies([step("a", "c"), step("b", "a"), step("c", "b")])
@@ -0,0 +1,121 @@
+"""Tests for spatial_cache.py's fetch_spatial, against an httpx.MockTransport."""
+
+import json
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+import duckdb
+import httpx
+import pytest
+
+from spatial_cache import FLATGEOBUF_MAGIC, fetch_spatial
+
+URL = "https://example.test/boundaries.fgb"
+# Served as FlatGeobuf, so no conversion through the spatial extension is needed
+VERSION_1 = FLATGEOBUF_MAGIC + b"version 1"
+VERSION_2 = FLATGEOBUF_MAGIC + b"version 2"
+
+
+class Portal:
+    """A stand-in for a spatial data portal serving one versioned dataset."""
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+        self.offline = False
+        self.requests: list[httpx.Request] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.offline:
+            raise httpx.ConnectError("portal unreachable", request=request)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304)
+        return httpx.Response(200, content=self.body, headers={"ETag": self.etag})
+
+
+@pytest.fixture
+def portal():
+    return Portal(VERSION_1, '"v1"')
+
+
+@pytest.fixture
+def fetch(portal, tmp_path):
+    """Calls fetch_spatial with the portal's client and a temporary cache."""
+    con = duckdb.connect()
+    client = httpx.Client(transport=httpx.MockTransport(portal.handle))
+
+    def fetch(**kwargs) -> str:
+        return fetch_spatial(
+            con, "boundaries", URL, cache_dir=str(tmp_path), client=client, **kwargs
+        )
+
+    yield fetch
+    client.close()
+    con.close()
+
+
+def expire(cache_dir: Path) -> None:
+    """Backdates the cached copy's fetch time past the default TTL."""
+    meta_path = cache_dir / "boundaries.json"
+    metadata = json.loads(meta_path.read_text())
+    metadata["fetched_at"] = (datetime.now(UTC) - timedelta(days=365)).isoformat()
+    meta_path.write_text(json.dumps(metadata))
+
+
+def test_fresh_fetch_is_cached(fetch, portal, tmp_path):
+    path = fetch()
+
+    assert Path(path).read_bytes() == VERSION_1
+    metadata = json.loads((tmp_path / "boundaries.json").read_text())
+    assert metadata["url"] == URL
+    assert metadata["etag"] == '"v1"'
+
+    # Within the TTL the cached copy is used without asking the portal
+    assert fetch() == path
+    assert len(portal.requests) == 1
+
+
+def test_expired_copy_is_downloaded_again(fetch, portal, tmp_path):
+    fetch()
+    portal.body, portal.etag = VERSION_2, '"v2"'
+
+    expire(tmp_path)
+    path = fetch()
+
+    assert len(portal.requests) == 2
+    assert portal.requests[1].headers["If-None-Match"] == '"v1"'
+    assert Path(path).read_bytes() == VERSION_2
+    metadata = json.loads((tmp_path / "boundaries.json").read_text())
+    assert metadata["etag"] == '"v2"'
+
+
+def test_unchanged_dataset_is_revalidated(fetch, portal, tmp_path):
+    fetch()
+
+    expire(tmp_path)
+    path = fetch()
+
+    assert len(portal.requests) == 2
+    assert Path(path).read_bytes() == VERSION_1
+    # The 304 renews the copy, so the next build does not ask again
+    fetch()
+    assert len(portal.requests) == 2
+
+
+def test_offline_falls_back_to_cached_copy(fetch, portal, tmp_path):
+    fetch()
+    portal.offline = True
+
+    path = fetch(refresh=True)
+
+    assert len(portal.requests) == 2
+    assert Path(path).read_bytes() == VERSION_1
+    assert [p.name for p in tmp_path.iterdir() if p.suffix == ".download"] == []
+
+
+def test_offline_without_cached_copy_raises(fetch, portal):
+    portal.offline = True
+
+    with pytest.raises(httpx.ConnectError):
+        fetch()
@@ -0,0 +1,67 @@
+"""Tests for staging.py's Parquet staging cache, using read_csv as the reader."""
+
+import os
+from pathlib import Path
+
+import duckdb
+import pytest
+
+from staging import stage_sheet
+
+
+@pytest.fixture
+def con():
+    con = duckdb.connect()
+    yield con
+    con.close()
+
+
+@pytest.fixture
+def source(tmp_path) -> Path:
+    path = tmp_path / "licensing.csv"
+    path.write_text("area,count\nBristol,1\nBath,2\n")
+    return path
+
+
+def stage(con, source: Path, stage_dir: Path, **options) -> str:
+    return stage_sheet(
+        con,
+        "read_csv",
+        str(source),
+        {"header": True, **options},
+        stage_dir=str(stage_dir),
+    )
+
+
+def rows(con, staged: str) -> list[tuple]:
+    return con.execute("SELECT * FROM read_parquet(?) ORDER BY 1", [staged]).fetchall()
+
+
+def test_unchanged_source_is_read_from_the_staged_copy(con, source, tmp_path):
+    staged = stage(con, source, tmp_path / "stage")
+    written = os.stat(staged).st_mtime_ns
+
+    assert stage(con, source, tmp_path / "stage") == staged
+    assert os.stat(staged).st_mtime_ns == written
+    assert rows(con, staged) == [("Bath", 2), ("Bristol", 1)]
+
+
+def test_changed_source_is_staged_again(con, source, tmp_path):
+    staged = stage(con, source, tmp_path / "stage")
+
+    source.write_text("area,count\nBristol,1\nBath,2\nFrome,3\n")
+    restaged = stage(con, source, tmp_path / "stage")
+
+    assert restaged != staged
+    assert rows(con, restaged)[-1] == ("Frome", 3)
+    # The copy of the old version is removed
+    assert list((tmp_path / "stage").iterdir()) == [Path(restaged)]
+
+
+def test_each_read_of_a_source_has_its_own_copy(con, source, tmp_path):
+    everything = stage(con, source, tmp_path / "stage")
+    skipped = stage(con, source, tmp_path / "stage", skip=1)
+
+    assert skipped != everything
+    assert Path(everything).exists()
+    assert len(rows(con, skipped)) == 1
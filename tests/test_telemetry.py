@@ -0,0 +1,89 @@
+"""Tests for telemetry.py's comparison of a run against a saved baseline."""
+
+import json
+
+import duckdb
+import pytest
+
+from telemetry import MIN_REGRESSION_BYTES, RunLog
+
+MB = 1024 * 1024
+
+
+def run_log(*records: tuple[str, float, int | None, str]) -> RunLog:
+    """A RunLog holding (step, wall seconds, peak memory, status) records."""
+    log = RunLog(duckdb.connect())
+    log.records = [
+        {
+            "step": step,
+            "status": status,
+            "wall_seconds": wall_seconds,
+            "peak_memory_bytes": peak_memory,
+        }
+        for step, wall_seconds, peak_memory, status in records
+    ]
+    return log
+
+
+def compare(baseline: RunLog, current: RunLog, path) -> dict[tuple[str, str], dict]:
+    baseline.write_baseline(1, str(path))
+    rows = current.compare_to_baseline(1, str(path))
+    return {(row["step"], row["metric"]): row for row in rows}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "perf_baseline.json"
+
+
+def test_same_run_does_not_regress(path):
+    log = run_log(("a", 10.0, 100 * MB, "succeeded"))
+
+    rows = compare(log, log, path)
+
+    assert not any(row["regressed"] for row in rows.values())
+    assert rows["a", "wall_seconds"]["change"] == 0
+
+
+def test_regression_must_exceed_tolerance_and_noise_floor(path):
+    baseline = run_log(
+        ("slow", 10.0, 100 * MB, "succeeded"),
+        ("quick", 1.0, 100 * MB, "succeeded"),
+    )
+    current = run_log(
+        ("slow", 13.0, 110 * MB, "succeeded"),
+        # 40% slower, but by less than MIN_REGRESSION_SECONDS
+        ("quick", 1.4, 100 * MB + MIN_REGRESSION_BYTES + 1, "succeeded"),
+    )
+
+    rows = compare(baseline, current, path)
+
+    assert rows["slow", "wall_seconds"]["regressed"]
+    assert rows["slow", "wall_seconds"]["change"] == pytest.approx(0.3)
+    assert not rows["slow", "peak_memory_bytes"]["regressed"]
+    assert not rows["quick", "wall_seconds"]["regressed"]
+    assert rows["quick", "peak_memory_bytes"]["regressed"]
+
+
+def test_missing_and_failed_steps_are_reported_without_regressing(path):
+    baseline = run_log(
+        ("dropped", 1.0, None, "succeeded"),
+        ("broken", 1.0, 100 * MB, "failed"),
+    )
+    current = run_log(("added", 1.0, 100 * MB, "succeeded"))
+
+    rows = compare(baseline, current, path)
+
+    assert "broken" not in json.loads(path.read_text())["steps"]
+    assert {step for step, _ in rows} == {"added", "dropped"}
+    assert rows["added", "wall_seconds"]["baseline"] is None
+    assert rows["dropped", "wall_seconds"]["current"] is None
+    assert not any(row["regressed"] for row in rows.values())
+
+
+def test_baseline_from_another_worker_count_is_refused(path):
+    log = run_log(("a", 10.0, 100 * MB, "succeeded"))
+    log.write_baseline(1, str(path))
+
+    with pytest.raises(ValueError, match="workers=1"):
+        log.compare_to_baseline(4, str(path))
@@ -0,0 +1,26 @@
+"""Tests for utils.py's sheet engine, with sheets parsed by a stand-in reader."""
+
+import duckdb
+import pyarrow as pa
+
+import utils
+from utils import SheetSpec, read_sheet_family
+
+
+def test_sheet_family_is_unioned_by_name_and_releases_the_sheets(monkeypatch):
+    def read_sheet(cursor, path, spec):
+        columns = {"sheet": [spec.sheet], "value": [1]}
+        if spec.sheet == "2024":
+            columns["note"] = ["new column"]
+        return pa.table(columns)
+
+    monkeypatch.setattr(utils, "_read_sheet", read_sheet)
+    con = duckdb.connect()
+    specs = [SheetSpec(sheet=sheet, range="A1:C2") for sheet in ["2023", "2024"]]
+
+    relation = read_sheet_family(specs, "workbook.xlsx", con)
+
+    assert sorted(relation.fetchall()) == [("2023", 1, None), ("2024", 1, "new column")]
+    tables = con.execute("SELECT table_type FROM information_schema.tables").fetchall()
+    # Only the combined temporary table is left, not the per-sheet views
+    assert tables == [("LOCAL TEMPORARY",)]
@@ -1,10 +1,218 @@
 # utils.py
 
-import functools
 import os
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 
 import duckdb
 
+from profiling import enable_profiling, part_output, profiling_output
+from staging import sql_literal, staged_source
+
+# Sheets are parsed on separate cursors; the excel readers are single-threaded
+# per call, so one worker per core keeps every core busy
+SHEET_WORKERS = os.cpu_count() or 1
+
+# One pool for every sheet family, so that families built by concurrently
+# running steps share SHEET_WORKERS threads instead of each starting their own
+_SHEET_EXECUTOR = ThreadPoolExecutor(
+    max_workers=SHEET_WORKERS, thread_name_prefix="sheet"
+)
+
+
+@dataclass
+class Unpivot:
+    """
+    Describes how to turn the wide columns of a sheet into name/value rows.
+
+    Attributes:
+        id_columns: Columns kept as identifiers; every other column (apart
+                    from the sheet's constant columns) is unpivoted.
+        name: The name of the column that receives the unpivoted column names.
+        value: The name of the column that receives the unpivoted values.
+    """
+
+    id_columns: list[str]
+    name: str
+    value: str
+
+
+@dataclass
+class SheetSpec:
+    """
+    Describes how to read one sheet of a workbook as part of a sheet family.
+
+    Attributes:
+        sheet: The sheet name.
+        range: The cell range to read, e.g. 'A5:X374'.
+        constants: Columns added to every row of the sheet, such as the year
+                   the sheet represents. Strings are added as VARCHAR literals.
+        read_options: Extra named arguments passed to read_xlsx.
+        rename: An optional function cleaning each raw column name, applied
+                before `columns`, e.g. renewables.normalize_column_name.
+        columns: The projection applied to the raw sheet.
+        filter: A SQL predicate applied to the raw sheet.
+        unpivot: An optional wide-to-long reshaping of the sheet.
+        select: The final projection over the (unpivoted) rows.
+        where: An optional SQL predicate applied to the final rows.
+    """
+
+    sheet: str
+    range: str
+    constants: dict[str, str | int] = field(default_factory=dict)
+    read_options: dict[str, bool] = field(default_factory=dict)
+    rename: Callable[[str], str] | None = None
+    columns: str = "*"
+    filter: str | None = None
+    unpivot: Unpivot | None = None
+    select: str = "*"
+    where: str | None = None
+
+
+def sheet_read_options(spec: SheetSpec) -> dict:
+    """Returns the read_xlsx named arguments for a sheet spec."""
+    return {"sheet": spec.sheet, "range": spec.range, **spec.read_options}
+
+
+def _quote(identifier: str) -> str:
+    """Quotes a column name for use in SQL."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def renamed_source(
+    cursor: duckdb.DuckDBPyConnection, source: str, rename: Callable[[str], str]
+) -> str:
+    """
+    Wraps a table expression in a subquery that renames its columns.
+
+    Args:
+        cursor: An active DuckDB cursor.
+        source: The table expression producing the raw sheet.
+        rename: The function turning a raw column name into its new name.
+
+    Returns:
+        A parenthesised SELECT that can replace `source`.
+    """
+    raw_columns = cursor.sql(f"SELECT * FROM {source} LIMIT 0").columns  # noqa: S608
+    renamed = ", ".join(f"{_quote(c)} AS {_quote(rename(c))}" for c in raw_columns)
+    return f"(SELECT {renamed} FROM {source})"  # noqa: S608
+
+
+def sheet_query(source: str, spec: SheetSpec) -> str:
+    """
+    Renders the SQL that reshapes a single sheet.
+
+    Args:
+        source: The table expression producing the raw sheet, either a
+                read_xlsx(...) call or a scan of its staged Parquet copy.
+        spec: The sheet to read.
+
+    Returns:
+        A SELECT statement producing the sheet's rows.
+    """
+    constants = "".join(f", {sql_literal(v)} AS {k}" for k, v in spec.constants.items())
+    raw_filter = f"WHERE {spec.filter}" if spec.filter else ""
+
+    if spec.unpivot:
+        kept = ", ".join(spec.unpivot.id_columns + list(spec.constants))
+        shaped = f"""
+            UNPIVOT raw_sheet
+            ON COLUMNS(* EXCLUDE ({kept}))
+            INTO
+                NAME {spec.unpivot.name}
+                VALUE {spec.unpivot.value}
+        """
+    else:
+        shaped = "SELECT * FROM raw_sheet"
+
+    final_filter = f"WHERE {spec.where}" if spec.where else ""
+
+    return f"""
+        WITH raw_sheet AS (
+            SELECT {spec.columns}{constants}
+            FROM {source}
+            {raw_filter}
+        ),
+        shaped_sheet AS ({shaped})
+        SELECT {spec.select}
+        FROM shaped_sheet
+        {final_filter}
+    """  # noqa: S608
+
+
+def _read_sheet(cursor: duckdb.DuckDBPyConnection, path: str, spec: SheetSpec):
+    """
+    Parses one sheet on its own cursor and returns it as an Arrow table.
+    The raw sheet is read from its staged Parquet copy, which is created
+    first if the workbook has changed since it was last staged.
+    """
+    try:
+        source = staged_source(cursor, "read_xlsx", path, sheet_read_options(spec))
+        if spec.rename:
+            source = renamed_source(cursor, source, spec.rename)
+        return cursor.sql(sheet_query(source, spec)).to_arrow_table()
+    finally:
+        cursor.close()
+
+
+def read_sheet_family(
+    specs: list[SheetSpec],
+    path: str,
+    con: duckdb.DuckDBPyConnection,
+):
+    """
+    Reads a family of similarly shaped sheets from one workbook in parallel
+    and combines them into a single relation.
+
+    Each sheet is parsed on its own cursor in the shared sheet pool and
+    materialised as an Arrow table. The tables are then combined with one
+    flat UNION ALL BY NAME, so sheets whose columns differ slightly still
+    line up, into a temporary table on `con`.
+
+    Args:
+        specs: The sheets to read.
+        path: The file path to the Excel workbook.
+        con: An active DuckDB connection object.
+
+    Returns:
+        A DuckDB relation object containing the rows of every sheet, or None
+        if `specs` is empty.
+    """
+    if not specs:
+        return None
+
+    # When the step is profiled, each sheet's cursor is profiled into its own file
+    output = profiling_output(con)
+
+    def read(spec: SheetSpec):
+        cursor = con.cursor()
+        if output:
+            enable_profiling(cursor, part_output(output, spec.sheet))
+        return _read_sheet(cursor, path, spec)
+
+    tables = list(_SHEET_EXECUTOR.map(read, specs))
+
+    # Register each parsed sheet under a unique name so that families built
+    # concurrently on the same connection cannot collide
+    prefix = f"sheet_{uuid.uuid4().hex[:8]}"
+    names = [f"{prefix}_{i}" for i in range(len(tables))]
+    for name, table in zip(names, tables, strict=True):
+        con.register(name, table)
+    try:
+        union = " UNION ALL BY NAME ".join(
+            f"SELECT * FROM {name}"  # noqa: S608
+            for name in names
+        )
+        con.execute(f"CREATE TEMP TABLE {prefix} AS {union}")
+    finally:
+        # The union holds its own copy, so the parsed sheets can be released
+        for name in names:
+            con.unregister(name)
+
+    return con.table(prefix)
+
 
 def check_source_data(files: list[str]) -> bool:
     """
@@ -45,24 +253,18 @@ def concat_electricity_sheets(
     Returns:
         A DuckDB relation object containing the combined data.
     """
-    if not yrs:
-        return None
-    relations_list = []
-
-    relations_list = [
-        con.sql(f"""
-            SELECT *, {yr} AS calendar_year
-            FROM read_xlsx('{path}',
-            header=true,
-            normalize_names=true,
-            sheet='{yr}',
-            range='A5:X374')
-            WHERE code LIKE 'E0%';
-        """)
+    specs = [
+        SheetSpec(
+            sheet=str(yr),
+            range="A5:X374",
+            constants={"calendar_year": yr},
+            read_options={"header": True, "normalize_names": True},
+            filter="code LIKE 'E0%'",
+        )
         for yr in yrs
     ]
 
-    return functools.reduce(lambda r1, r2: r1.union(r2), relations_list)
+    return read_sheet_family(specs, path, con)
 
 
 def concat_energy_sheets(yrs: list[int], path: str, con: duckdb.DuckDBPyConnection):
@@ -81,133 +283,33 @@ def concat_energy_sheets(yrs: list[int], path: str, con: duckdb.DuckDBPyConnecti
     Returns:
         A DuckDB relation object containing the combined and transformed energy data.
     """
-    if not yrs:
-        return None
-
-    # Create individual relations for each year
-    relations_list = []
-
-    for year in yrs:
-        # Process each year's data with UNPIVOT operation
-        year_relation = con.sql(f"""
-            WITH raw_energy_la_tbl AS (
-                SELECT COLUMNS(* EXCLUDE(Notes))
-                FROM read_xlsx('{path}',
-                    normalize_names=true,
-                    range='A6:AJ391',
-                    sheet = '{year}',
-                    header=true,
-                    all_varchar=true)
-                WHERE code LIKE 'E0%'
+    specs = [
+        SheetSpec(
+            sheet=str(year),
+            range="A6:AJ391",
+            constants={"calendar_year": year},
+            read_options={
+                "normalize_names": True,
+                "header": True,
+                "all_varchar": True,
+            },
+            columns="COLUMNS(* EXCLUDE(Notes))",
+            filter="code LIKE 'E0%'",
+            unpivot=Unpivot(
+                id_columns=["country_or_region", "local_authority", "code"],
+                name="fuel_sector",
+                value="GTOE",
             ),
-            unpivoted_data AS (
-                UNPIVOT raw_energy_la_tbl
-                ON COLUMNS(* EXCLUDE(country_or_region, local_authority, code))
-                INTO
-                    NAME fuel_sector
-                    VALUE GTOE
-            )
-            SELECT
+            select="""
                 country_or_region,
                 local_authority,
                 code,
-                {year} AS calendar_year,
+                calendar_year,
                 regexp_replace(fuel_sector, '_note.*', '') AS fuel_sector,
                 if(GTOE[1] = '[', NULL, GTOE)::FLOAT GTOE
-            FROM unpivoted_data
-        """)
-        relations_list.append(year_relation)
-
-    # Union all years together
-    combined_relation = functools.reduce(lambda r1, r2: r1.union(r2), relations_list)
-
-    return combined_relation
-
-
-def concat_renewable_sheets(
-    yrs: list[int], types: list[str], path: str, con: duckdb.DuckDBPyConnection
-):
-    """
-    Creates a single DuckDB relation by unioning renewable energy data
-    from multiple sheets in an Excel file. Each sheet represents a
-    combination of type (Generation, Capacity, Sites) and year. The
-    function handles the inconsistent naming convention where some types
-    use comma separators and others don't, removes note columns, and
-    unpivots the data from wide to long format.
-
-    Args:
-        yrs: A list of integers representing the years.
-        types: A list of strings representing the types
-               ('Generation', 'Capacity', 'Sites').
-        path: The file path to the Excel workbook.
-        con: An active DuckDB connection object.
-
-    Returns:
-        A DuckDB relation object containing the combined and transformed
-        renewable energy data.
-    """
-    if not yrs or not types:
-        return None
+            """,
+        )
+        for year in yrs
+    ]
 
-    relations_list = []
-
-    for year in yrs:
-        for energy_type in types:
-            # Determine separator based on type
-            # (Sites uses space, others use comma+space)
-            separator = " " if energy_type == "Sites" else ", "
-            range = "A5:R500" if energy_type == "Generation" else "A4:R500"
-            sheet_name = f"LA - {energy_type}{separator}{year}"
-
-            # Process each sheet's data and UNPIVOT
-            sheet_relation = con.sql(rf"""
-                WITH raw_renewable_tbl AS (
-                    SELECT 
-                    COLUMNS('^(.*?)((?:_?note_\d+)+)$') AS '\1',
-                    COLUMNS(c -> NOT REGEXP_MATCHES(c, '_note.*$')),
-                    '{year}' AS "calendar_year",
-                    '{energy_type}' AS "type"
-                    FROM read_xlsx('{path}',
-                         sheet = '{sheet_name}',
-                         range = '{range}',
-                         all_varchar = true,
-                         normalize_names = true)
-                    WHERE local_authority_code LIKE 'E0%'
-                ),
-                unpivoted_data AS (
-                    UNPIVOT raw_renewable_tbl
-                    ON * EXCLUDE (local_authority_code,
-                                  local_authority_name,
-                                  estimated_number_of_households,
-                                  region,
-                                  country,
-                                  calendar_year,
-                                  type)
-                    INTO
-                        NAME energy_source
-                        VALUE val
-                )
-                SELECT
-                    local_authority_code,
-                    local_authority_name,
-                    estimated_number_of_households,
-                    region,
-                    country,
-                    energy_source,
-                    '{year}' AS calendar_year,
-                    '{energy_type}' AS type,
-                    CASE
-                    WHEN type = 'Sites' THEN 'number'
-                    WHEN type = 'Capacity' THEN 'mw'
-                    WHEN type = 'Generation' THEN 'mwh'
-                    END as units,
-                    if(val[1] = '[', NULL, val)::INTEGER AS value
-                FROM unpivoted_data
-                WHERE if(val[1] = '[', NULL, val)::INTEGER IS NOT NULL
-            """)  # noqa: S608
-            relations_list.append(sheet_relation)
-
-    # Union all sheets together
-    combined_relation = functools.reduce(lambda r1, r2: r1.union(r2), relations_list)
-
-    return combined_relation
+    return read_sheet_family(specs, path, con)